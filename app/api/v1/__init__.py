@@ -3,6 +3,7 @@ from fastapi import APIRouter
 from app.core.config import settings
 
 from .auth import auth_route
+from .internal import internal_route
 from .mock_auth import mock_auth_route
 from .user import user_route
 
@@ -14,3 +15,4 @@ if settings.debug:
 
 router.include_router(auth_route, prefix=settings.api.v1.auth)
 router.include_router(user_route, prefix=settings.api.v1.user)
+router.include_router(internal_route, prefix=settings.api.v1.internal)
@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from typing import Any
+
+from fastapi import APIRouter, Response
 
 from app.core.exceptions.auth import (
     UserDoesNotExistException,
@@ -11,6 +13,7 @@ from app.schemas.token import AccessRefreshToken
 from app.services.user import user_service
 
 auth_route = APIRouter(tags=["Auth"])
+jwks_route = APIRouter(tags=["Auth"])
 
 
 @auth_route.post(
@@ -30,3 +33,10 @@ async def sign_in(user_auth_data: SignIn) -> AccessRefreshToken:
         access_token=JWTHelper.access_token(user.email),
         refresh_token=JWTHelper.refresh_token(user.email),
     )
+
+
+@jwks_route.get("/.well-known/jwks.json", summary="Token Verification Keys")
+async def jwks(response: Response) -> dict[str, Any]:
+    # Verifiers refetch on an unknown kid, new keys are published before use
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return JWTHelper.keyring.jwks
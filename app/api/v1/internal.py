@@ -0,0 +1,50 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.db.pool import pool_stats
+from app.core.db.slow_query import slow_query_log
+from app.core.db.statements import statement_cache_stats
+from app.core.dependencies.internal import InternalAccess
+from app.core.metrics import registry
+
+internal_route = APIRouter(
+    tags=["Internal"],
+    dependencies=[Depends(InternalAccess)],
+    include_in_schema=False,
+)
+
+
+@internal_route.get(
+    "/metrics/",
+    response_class=PlainTextResponse,
+    summary="Prometheus Metrics",
+)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@internal_route.get("/pool/", summary="Connection Pool Stats")
+async def pool() -> dict[str, dict[str, int]]:
+    return pool_stats()
+
+
+@internal_route.get("/statement_cache/", summary="Statement Cache Hit Rates")
+async def statement_cache() -> dict[str, dict[str, float]]:
+    return statement_cache_stats()
+
+
+@internal_route.get("/slow_queries/", summary="Slowest Statements By Total Time")
+async def slow_queries(
+    limit: int = Query(20, ge=1, le=500),
+) -> list[dict[str, Any]]:
+    return slow_query_log.top(limit)
+
+
+@internal_route.delete("/slow_queries/", summary="Reset Slow Query Stats")
+async def reset_slow_queries() -> None:
+    slow_query_log.reset()
@@ -1,10 +1,41 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
+from app.core.dependencies.auth import AuthService
+from app.core.dependencies.internal import InternalAccess
 from app.core.exceptions.token import WrongTokenScopeException
+from app.core.responses import (
+    CachedRoute,
+    ExportFormat,
+    cache_response,
+    stream_response,
+)
 from app.core.security.jwt import JWTHelper
+from app.models import User
 from app.schemas.token import AccessRefreshToken
+from app.schemas.user import Principal, UserSchema
+from app.services.token import token_service
+from app.services.user import user_service
+
+user_route = APIRouter(tags=["User"], route_class=CachedRoute)
+
+EXPORT_FIELDS = (
+    "id",
+    "name",
+    "email",
+    "avatar",
+    "timezone",
+    "is_deleted",
+    "created_date",
+    "event_date",
+)
+EXPORT_COLUMNS = [getattr(User, field) for field in EXPORT_FIELDS]
 
-user_route = APIRouter(tags=["User"])
+
+@user_route.get("/me/", response_model=UserSchema, summary="Current User")
+@cache_response(ttl=30, tags=[User.__tablename__], per_principal=True)
+async def user_me(user: User = Depends(AuthService.get_current_active_user)) -> User:
+    return user
 
 
 @user_route.post(
@@ -16,7 +47,39 @@ async def user_refresh_token(refresh_token: str) -> AccessRefreshToken:
     token_data = JWTHelper.decode(refresh_token)
     if token_data["scope"] != "refresh":
         raise WrongTokenScopeException
-    return AccessRefreshToken(
-        access_token=JWTHelper.access_token(token_data["email"]),
-        refresh_token=refresh_token,
+    return await token_service.refresh(refresh_token, token_data)
+
+
+@user_route.post(
+    "/revoke_token/",
+    status_code=204,
+    summary="Revoke Refresh Token",
+)
+async def user_revoke_token(refresh_token: str) -> None:
+    token_data = JWTHelper.decode(refresh_token)
+    if token_data["scope"] != "refresh":
+        raise WrongTokenScopeException
+    await token_service.revoke(
+        token_service.token_id(refresh_token, token_data),
+        token_data["sub"],
+        int(token_data["exp"]),
+    )
+
+
+@user_route.get(
+    "/export/",
+    response_class=StreamingResponse,
+    summary="Export Users",
+    # Personal data of every user, back office only
+    dependencies=[Depends(InternalAccess)],
+)
+async def user_export(
+    export_format: ExportFormat = ExportFormat.NDJSON,
+    _: Principal = Depends(AuthService.get_current_principal),
+) -> StreamingResponse:
+    return stream_response(
+        user_service.stream(order_by=[User.id], target=EXPORT_COLUMNS),
+        EXPORT_FIELDS,
+        export_format,
+        filename=f"users.{export_format}",
     )
@@ -0,0 +1,11 @@
+__all__ = (
+    "AccessLogPipeline",
+    "AccessLogSink",
+    "AccessRecord",
+    "access_log",
+    "access_record_context",
+)
+
+from .pipeline import AccessLogPipeline, access_log
+from .record import AccessRecord, access_record_context
+from .sinks import AccessLogSink
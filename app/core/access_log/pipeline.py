@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import logging
+from collections import deque
+from collections.abc import Sequence
+from contextvars import Context
+
+from app.core.access_log.record import AccessRecord
+from app.core.access_log.sinks import (
+    AccessLogSink,
+    NDJSONFileSink,
+    PostgresSink,
+    StdoutSink,
+)
+from app.core.config import AccessLogConfig, AccessLogSinkType, settings
+from app.core.metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+ACCESS_LOG_DROPPED = registry.register(
+    Counter(
+        "access_log_dropped",
+        "Access log records dropped because the buffer was full",
+    ),
+)
+ACCESS_LOG_FAILED = registry.register(
+    Counter(
+        "access_log_sink_failures",
+        "Access log batches a sink failed to write",
+        ("sink",),
+    ),
+)
+
+
+class AccessLogPipeline:
+    """
+    Requests push records into a bounded ring buffer, the oldest records
+    are dropped when it is full. A single background task drains the buffer
+    every flush interval in batches and writes them to the sinks.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence[AccessLogSink],
+        buffer_size: int = 10_000,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.sinks = sinks
+        self.enabled = bool(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        self._buffer: deque[AccessRecord] = deque(maxlen=buffer_size)
+        self._flusher: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def push(self, record: AccessRecord) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(record)
+        if self._flusher is None:
+            self.start()
+
+    def start(self) -> None:
+        if self.enabled and self._flusher is None:
+            # Empty context, the flusher must not inherit the request state
+            self._flusher = asyncio.get_running_loop().create_task(
+                self._run(),
+                context=Context(),
+            )
+
+    async def close(self) -> None:
+        """Stop the flusher, write the buffered records and close the sinks"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        await self.flush()
+        for sink in self.sinks:
+            await sink.close()
+
+    async def flush(self) -> None:
+        if self.dropped:
+            ACCESS_LOG_DROPPED.inc(self.dropped)
+            self.dropped = 0
+
+        buffer = self._buffer
+        while buffer:
+            batch = [buffer.popleft() for _ in range(min(self.batch_size, len(buffer)))]
+            for sink in self.sinks:
+                try:
+                    await sink.write(batch)
+                except Exception:
+                    ACCESS_LOG_FAILED.inc(sink=type(sink).__name__)
+                    logger.exception("%s failed to write access log", sink)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+def build_sinks(config: AccessLogConfig) -> list[AccessLogSink]:
+    sinks: list[AccessLogSink] = []
+    for sink_type in config.sinks:
+        if sink_type == AccessLogSinkType.STDOUT:
+            sinks.append(StdoutSink())
+        elif sink_type == AccessLogSinkType.FILE:
+            sinks.append(NDJSONFileSink(config.file_path))
+        elif sink_type == AccessLogSinkType.POSTGRES:
+            sinks.append(PostgresSink(config.table))
+    return sinks
+
+
+access_log = AccessLogPipeline(
+    build_sinks(settings.access_log),
+    buffer_size=settings.access_log.buffer_size,
+    batch_size=settings.access_log.batch_size,
+    flush_interval=settings.access_log.flush_interval,
+)
+
+registry.register(
+    Gauge(
+        "access_log_buffered",
+        "Access log records waiting for the flusher",
+        callback=lambda: [((), len(access_log))],
+    ),
+)
@@ -0,0 +1,28 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(slots=True)
+class AccessRecord:
+    method: str
+    # Route template (e.g. /api/v1/user/{id}/), the raw path if unrouted
+    path: str
+    ts: float = field(default_factory=time.time)
+    # 500 unless a response was started
+    status: int = 500
+    duration_ms: float = 0.0
+    user_id: int | None = None
+    queries: int = 0
+    db_ms: float = 0.0
+    # Audit event of the request, e.g. "user.delete"
+    action: str | None = None
+    details: dict[str, Any] | None = None
+
+
+# Record of the current request, set by AccessLogMiddleware
+access_record_context: ContextVar[AccessRecord | None] = ContextVar(
+    "access_record_context",
+    default=None,
+)
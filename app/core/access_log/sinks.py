@@ -0,0 +1,108 @@
+import asyncio
+import datetime
+import sys
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Sequence
+from pathlib import Path
+from typing import IO, Any
+
+import orjson
+
+from app.core.access_log.record import AccessRecord
+from app.core.db import db_helper
+
+COPY_COLUMNS = (
+    "created_at",
+    "method",
+    "path",
+    "status",
+    "duration_ms",
+    "user_id",
+    "queries",
+    "db_ms",
+    "action",
+    "details",
+)
+
+
+def _ndjson(records: Sequence[AccessRecord]) -> bytes:
+    return b"".join(
+        orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE) for record in records
+    )
+
+
+class AccessLogSink(ABC):
+    @abstractmethod
+    async def write(self, records: Sequence[AccessRecord]) -> None: ...
+
+    async def close(self) -> None:  # noqa: B027
+        pass
+
+
+class StdoutSink(AccessLogSink):
+    """
+    Writes records to stdout, one JSON document per line, in a thread:
+    a slow log collector must not block the event loop.
+    """
+
+    async def write(self, records: Sequence[AccessRecord]) -> None:
+        await asyncio.to_thread(self._write, _ndjson(records))
+
+    @staticmethod
+    def _write(data: bytes) -> None:
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+
+class NDJSONFileSink(AccessLogSink):
+    """Appends records to a file, one JSON document per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._file: IO[bytes] | None = None
+
+    async def write(self, records: Sequence[AccessRecord]) -> None:
+        await asyncio.to_thread(self._write, _ndjson(records))
+
+    async def close(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+    def _write(self, data: bytes) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("ab")
+        self._file.write(data)
+        self._file.flush()
+
+
+class PostgresSink(AccessLogSink):
+    """COPYs records into the access log table (AccessLogEntry)."""
+
+    def __init__(self, table: str) -> None:
+        self.table = table
+
+    async def write(self, records: Sequence[AccessRecord]) -> None:
+        await db_helper.copy_records(
+            self.table,
+            COPY_COLUMNS,
+            self._rows(records),
+            chunk_size=len(records),
+        )
+
+    @staticmethod
+    async def _rows(records: Sequence[AccessRecord]) -> AsyncIterator[tuple[Any, ...]]:
+        for record in records:
+            yield (
+                datetime.datetime.fromtimestamp(record.ts, datetime.UTC),
+                record.method,
+                record.path,
+                record.status,
+                record.duration_ms,
+                record.user_id,
+                record.queries,
+                record.db_ms,
+                record.action,
+                orjson.dumps(record.details).decode() if record.details else None,
+            )
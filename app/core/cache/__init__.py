@@ -0,0 +1,19 @@
+__all__ = (
+    "BloomFilter",
+    "CacheBackend",
+    "CachedResponse",
+    "ResponseCache",
+    "SharedCache",
+    "SingleFlight",
+    "TTLCache",
+    "TieredCache",
+    "response_cache",
+    "shared_cache",
+)
+
+from .bloom import BloomFilter
+from .response import CacheBackend, CachedResponse, ResponseCache, response_cache
+from .shared import SharedCache, shared_cache
+from .single_flight import SingleFlight
+from .tiered import TieredCache
+from .ttl import TTLCache
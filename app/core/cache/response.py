@@ -0,0 +1,168 @@
+import hashlib
+import os
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Protocol
+
+from app.core.cache.shared import shared_cache
+from app.core.cache.tiered import CACHE_REQUESTS
+from app.core.cache.ttl import TTLCache
+from app.core.config import settings
+from app.core.utils.background import run_soon
+
+# Tag versions outlive every entry stored under them
+TAG_TTL = 86400.0
+
+
+class CacheBackend(Protocol):
+    """Shared tier of the response cache, SharedCache or e.g. a Redis adapter"""
+
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: float,
+        *,
+        required: bool = False,
+    ) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+
+@dataclass(slots=True, frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    media_type: str
+
+    @classmethod
+    def build(cls, body: bytes, media_type: str) -> "CachedResponse":
+        # Strong validator, byte-identical bodies share it across workers
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        return cls(body=body, etag=f'"{digest}"', media_type=media_type)
+
+    def encode(self) -> bytes:
+        return b"\n".join((self.etag.encode(), self.media_type.encode(), self.body))
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CachedResponse":
+        etag, media_type, body = data.split(b"\n", 2)
+        return cls(body=body, etag=etag.decode(), media_type=media_type.decode())
+
+
+class ResponseCache:
+    """
+    Serialized response bodies in an in-process LRU in front of an optional
+    shared backend. Entries are never deleted on invalidation: every tag has
+    a random version that is part of the keys, invalidate replaces it, so
+    the old entries can't be found anymore and expire. Other workers see a
+    new version after at most tag_check_interval seconds.
+    Tag versions are shared through the shared backend only: without it an
+    invalidation reaches this worker alone and the others serve their
+    entries until the ttl of the route.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        shared: CacheBackend | None = None,
+        tag_check_interval: float = 1.0,
+    ) -> None:
+        self.shared = shared
+        self.tag_check_interval = tag_check_interval
+        self._local: TTLCache[str, CachedResponse] = TTLCache(maxsize=maxsize)
+        # Tag -> (version, monotonic time it was read)
+        self._tags: dict[str, tuple[bytes, float]] = {}
+
+    async def key(
+        self,
+        path: str,
+        query: str,
+        principal: str | None,
+        tags: Sequence[str],
+    ) -> str:
+        """
+        Cache key of a request
+        :param path: request path
+        :param query: normalized query string
+        :param principal: user the response is cached for, None - shared
+        :param tags: tags of the route, their versions are part of the key
+        :return: Hex digest
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (path, query, principal or ""):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        for tag in tags:
+            digest.update(await self._tag_version(tag))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def get(self, key: str, ttl: float) -> CachedResponse | None:
+        response = self._local.get(key)
+        if response is not None:
+            CACHE_REQUESTS.inc(cache="response", result="local")
+            return response
+
+        if self.shared is not None:
+            data = await self.shared.get(f"response:{key}")
+            if data is not None:
+                CACHE_REQUESTS.inc(cache="response", result="shared")
+                response = CachedResponse.decode(data)
+                self._local.set(key, response, ttl)
+                return response
+
+        CACHE_REQUESTS.inc(cache="response", result="miss")
+        return None
+
+    async def set(self, key: str, response: CachedResponse, ttl: float) -> None:
+        self._local.set(key, response, ttl)
+        if self.shared is not None:
+            await self.shared.set(f"response:{key}", response.encode(), ttl)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """Replace the tag versions, callable from sync code such as session events"""
+        now = time.monotonic()
+        for tag in tags:
+            # Random, concurrent invalidations never end on an old version
+            version = os.urandom(8).hex().encode()
+            self._tags[tag] = (version, now)
+            if self.shared is not None:
+                # A skipped write would let the other workers serve stale entries
+                run_soon(
+                    self.shared.set(
+                        f"response-tag:{tag}",
+                        version,
+                        TAG_TTL,
+                        required=True,
+                    ),
+                )
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    async def _tag_version(self, tag: str) -> bytes:
+        now = time.monotonic()
+        cached = self._tags.get(tag)
+        if cached is not None and (
+            self.shared is None or now - cached[1] < self.tag_check_interval
+        ):
+            return cached[0]
+        if self.shared is None:
+            return b"0"
+
+        version = await self.shared.get(f"response-tag:{tag}") or b"0"
+        # Not kept if the tag was invalidated here while it was read
+        if self._tags.get(tag) is cached:
+            self._tags[tag] = (version, now)
+        return version
+
+
+response_cache = ResponseCache(
+    maxsize=settings.cache.response_size,
+    shared=shared_cache,
+    tag_check_interval=settings.cache.response_tag_check_interval,
+)
@@ -0,0 +1,181 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+from app.core.metrics import Counter, registry
+from app.core.utils.executor import BoundedExecutor, ExecutorOverloadedError
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 60.0
+
+SHARED_CACHE_REJECTED = registry.register(
+    Counter(
+        "shared_cache_rejected",
+        "Shared cache calls skipped because its thread was busy",
+        ("operation",),
+    ),
+)
+
+
+class SharedCache:
+    """
+    Cache shared by the worker processes of a host, stored in a SQLite file.
+    Put the file on tmpfs (e.g. /dev/shm) so reads never touch the disk.
+    The file is readable only by the user of the workers.
+    SQLite calls run in a thread of their own, never on the event loop.
+    When max_pending calls are waiting for it, reads are misses and writes
+    are skipped. Deletes and required writes always run.
+    Errors are logged and treated as misses, the cache never fails a request.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        timeout: float = 0.1,
+        max_pending: int = 64,
+    ) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        # Connections must not be shared with forked workers
+        self._pid = 0
+        self._purged_at = 0.0
+        # One thread, the calls are serialized by the connection lock anyway
+        self._executor = BoundedExecutor(
+            max_workers=1,
+            max_pending=max_pending,
+            name="shared-cache",
+        )
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self._executor.run(self._get, key)
+        except ExecutorOverloadedError:
+            SHARED_CACHE_REJECTED.inc(operation="get")
+            return None
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: float,
+        *,
+        required: bool = False,
+    ) -> None:
+        """
+        Store a value
+        :param key: cache key
+        :param value: value bytes
+        :param ttl: time to live in seconds
+        :param required: never skipped, e.g. invalidation markers: run
+            inline when the thread is overloaded, as deletes are
+        """
+        try:
+            await self._executor.run(self._set, key, value, ttl)
+        except ExecutorOverloadedError:
+            if required:
+                self._set(key, value, ttl)
+                return
+            SHARED_CACHE_REJECTED.inc(operation="set")
+
+    async def delete(self, *keys: str) -> None:
+        try:
+            await self._executor.run(self._delete, keys)
+        except ExecutorOverloadedError:
+            # A skipped delete would leave stale entries, block instead
+            self._delete(keys)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        """Delete the keys starting with prefix, e.g. the keys of a cache"""
+        try:
+            await self._executor.run(self._delete_prefix, prefix)
+        except ExecutorOverloadedError:
+            self._delete_prefix(prefix)
+
+    def _get(self, key: str) -> bytes | None:
+        try:
+            with self._lock:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                        (key, time.time()),
+                    )
+                    .fetchone()
+                )
+        except sqlite3.Error:
+            logger.exception("Shared cache read failed")
+            return None
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, now + ttl),
+                )
+                if now - self._purged_at > PURGE_INTERVAL:
+                    connection.execute(
+                        "DELETE FROM cache WHERE expires_at <= ?", (now,)
+                    )
+                    self._purged_at = now
+        except sqlite3.Error:
+            logger.exception("Shared cache write failed")
+
+    def _delete(self, keys: tuple[str, ...]) -> None:
+        try:
+            with self._lock:
+                self._connect().executemany(
+                    "DELETE FROM cache WHERE key = ?",
+                    ((key,) for key in keys),
+                )
+        except sqlite3.Error:
+            logger.exception("Shared cache delete failed")
+
+    def _delete_prefix(self, prefix: str) -> None:
+        try:
+            with self._lock:
+                # Keys sort after the prefix and before the prefix + U+10FFFF
+                self._connect().execute(
+                    "DELETE FROM cache WHERE key >= ? AND key < ?",
+                    (prefix, f"{prefix}\U0010ffff"),
+                )
+        except sqlite3.Error:
+            logger.exception("Shared cache delete failed")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        # Cached rows may be personal data, only the owner can read them.
+        # SQLite creates the -wal and -shm files with the same mode
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)",
+        )
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+
+shared_cache = (
+    SharedCache(settings.cache.shared_path) if settings.cache.shared_path else None
+)
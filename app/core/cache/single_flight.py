@@ -0,0 +1,53 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+
+class SingleFlight(Generic[KeyType, ValueType]):
+    """
+    Coalesces concurrent calls for the same key, the first caller runs
+    the function and the others wait for its result (or exception).
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[KeyType, asyncio.Future[ValueType]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(
+        self,
+        key: KeyType,
+        function: Callable[[], Awaitable[ValueType]],
+    ) -> ValueType:
+        """
+        Run function once for all concurrent callers of key
+        :param key: call key
+        :param function: coroutine function producing the value
+        :return: Value produced by the leading call
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            # A cancelled follower must not cancel the leader's call
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await function()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Nobody may be waiting, don't log it as never retrieved
+                future.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+        future.set_result(result)
+        return result
@@ -0,0 +1,111 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import orjson
+
+from app.core.cache.shared import SharedCache
+from app.core.cache.single_flight import SingleFlight
+from app.core.cache.ttl import TTLCache
+from app.core.metrics import Counter, registry
+from app.core.utils.background import run_soon
+
+CACHE_REQUESTS = registry.register(
+    Counter(
+        "cache_requests",
+        "Cache lookups by the tier that answered them",
+        ("cache", "result"),
+    ),
+)
+
+JSONType = dict[str, Any]
+
+
+class TieredCache:
+    """
+    Two level cache of JSON documents: an in-process LRU in front of an
+    optional SharedCache, concurrent misses of a key share one load.
+    Invalidation clears both tiers of this worker, the local tier of
+    the other workers expires after its (short) ttl: that ttl bounds how
+    long another worker may serve a value after it changed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1024,
+        ttl: float = 10.0,
+        shared: SharedCache | None = None,
+        shared_ttl: float = 300.0,
+    ) -> None:
+        self.name = name
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._local: TTLCache[str, JSONType] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loads: SingleFlight[str, JSONType] = SingleFlight()
+        # Bumped by invalidate, loads started before it aren't stored
+        self._version = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[JSONType]],
+    ) -> JSONType:
+        """
+        Get a cached value or load and cache it
+        :param key: cache key
+        :param loader: coroutine function loading the value on a miss
+        :return: Cached or loaded value
+        """
+        value = self._local.get(key)
+        if value is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result="local")
+            return value
+
+        if self.shared is not None:
+            version = self._version
+            data = await self.shared.get(self._shared_key(key))
+            if data is not None:
+                CACHE_REQUESTS.inc(cache=self.name, result="shared")
+                value = orjson.loads(data)
+                # Not kept if it was invalidated while it was read
+                if version == self._version:
+                    self._local.set(key, value)
+                return value
+
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        return await self._loads.do(key, lambda: self._load(key, loader))
+
+    def invalidate(self, *keys: str) -> None:
+        """Forget the keys, callable from sync code such as session events"""
+        self._version += 1
+        for key in keys:
+            self._local.pop(key)
+        if self.shared is not None and keys:
+            run_soon(self.shared.delete(*(self._shared_key(key) for key in keys)))
+
+    def clear(self) -> None:
+        """Forget every key, e.g. after a bulk write of unknown rows"""
+        self._version += 1
+        self._local.clear()
+        if self.shared is not None:
+            run_soon(self.shared.delete_prefix(self._shared_key("")))
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[JSONType]],
+    ) -> JSONType:
+        version = self._version
+        value = await loader()
+        if version == self._version:
+            self._local.set(key, value)
+            if self.shared is not None:
+                await self.shared.set(
+                    self._shared_key(key),
+                    orjson.dumps(value),
+                    self.shared_ttl,
+                )
+        return value
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
@@ -1,4 +1,5 @@
 import os
+from enum import StrEnum
 from typing import ClassVar
 
 from pydantic import BaseModel, PostgresDsn
@@ -17,12 +18,15 @@ class InfoConfig(BaseModel):
 class RunConfig(BaseModel):
     host: str = "0.0.0.0"  # noqa: S104
     port: int = 8000
+    # Time to finish in-flight requests (uvicorn) and log flushes on shutdown
+    shutdown_timeout: int = 25
 
 
 class ApiV1Prefix(BaseModel):
     prefix: str = "/v1"
     auth: str = "/auth"
     user: str = "/user"
+    internal: str = "/internal"
 
 
 class ApiPrefix(BaseModel):
@@ -30,6 +34,18 @@ class ApiPrefix(BaseModel):
     v1: ApiV1Prefix = ApiV1Prefix()
 
 
+class ReplicaStrategy(StrEnum):
+    ROUND_ROBIN = "round_robin"
+    LEAST_CONNECTIONS = "least_connections"
+
+
+class StatementNames(StrEnum):
+    # asyncpg numbers the statements of a connection
+    SEQUENTIAL = "sequential"
+    # Random names, never taken on a server connection shared through a proxy
+    UNIQUE = "unique"
+
+
 class DatabaseConfig(BaseModel):
     url: PostgresDsn
     echo: bool = False
@@ -37,6 +53,34 @@ class DatabaseConfig(BaseModel):
     pool_size: int = 50
     max_overflow: int = 10
 
+    # Connections opened per engine on startup
+    warm_up_connections: int = 5
+    warm_up_statements: list[str] = ["SELECT 1"]
+    warm_up_timeout: float = 10.0
+
+    # Default RetryPolicy of Transactional for serialization failures
+    retry_max_attempts: int = 5
+    retry_base_delay: float = 0.01
+    retry_max_delay: float = 0.5
+    retry_deadline: float = 3.0
+
+    # asyncpg prepared statements cached per connection, 0 disables the cache
+    prepared_statement_cache_size: int = 100
+    prepared_statement_names: StatementNames = StatementNames.SEQUENTIAL
+    # PgBouncer in transaction mode hands a client a different server
+    # connection per transaction: no cached statements and unique names
+    pgbouncer_transaction_mode: bool = False
+    # Compiled SQL per engine and statement templates of the repositories
+    compiled_cache_size: int = 500
+    statement_cache_size: int = 1000
+
+    # Read replicas
+    replicas: list[PostgresDsn] = []
+    replica_strategy: ReplicaStrategy = ReplicaStrategy.ROUND_ROBIN
+    replica_max_lag: float = 5.0
+    replica_health_check_interval: float = 10.0
+    read_your_writes_window: float = 5.0
+
     naming_convention: dict[str, str] = {
         "ix": "ix_%(column_0_label)s",
         "uq": "uq_%(table_name)s_%(column_0_N_name)s",
@@ -46,12 +90,45 @@ class DatabaseConfig(BaseModel):
     }
 
 
+class PasswordScheme(StrEnum):
+    BCRYPT = "bcrypt"
+    ARGON2 = "argon2"
+
+
 class AuthConfig(BaseModel):
     access_token_time: int = 900
     refresh_token_time: int = 15_000_000
     secret_key: str = "YOUR_SECRET_KEY"
+    # HS256 signs with secret_key, EdDSA/ES256 with the keys of keys_dir
     algorithm: str = "HS256"
+    # <kid>.pem private keys and <kid>.pub public (verification only) keys
+    keys_dir: str | None = None
+    # kid signing new tokens, by default the last private key by name
+    signing_kid: str | None = None
     debug_password: str = "123456"
+    # New hashes use password_scheme, hashes of the other scheme or
+    # with other costs are rehashed on the next successful login
+    password_scheme: PasswordScheme = PasswordScheme.BCRYPT
+    bcrypt_rounds: int = 12
+    # argon2id memory cost in KiB, time cost in iterations
+    argon2_memory_cost: int = 65536
+    argon2_time_cost: int = 3
+    argon2_parallelism: int = 2
+    # Hashing threads per worker and calls allowed to wait for them,
+    # calls beyond that are rejected with 503
+    hash_workers: int = 2
+    hash_max_pending: int = 16
+    # A refresh issues a new refresh token and revokes the presented one
+    rotate_refresh_tokens: bool = True
+    # Per worker Bloom filter of the revoked refresh tokens, synced with
+    # the revoked_token table every sync interval and rebuilt (dropping
+    # the expired tokens) every rebuild interval
+    revocation_filter_capacity: int = 100_000
+    revocation_filter_error_rate: float = 0.001
+    revocation_sync_interval: float = 5.0
+    revocation_rebuild_interval: float = 3600.0
+    # Verified tokens kept in memory until they expire
+    token_cache_size: int = 10_000
 
 
 class SentryConfig(BaseModel):
@@ -60,8 +137,69 @@ class SentryConfig(BaseModel):
     profiles_sample_rate: float = 1.0
 
 
+class AccessLogSinkType(StrEnum):
+    STDOUT = "stdout"
+    FILE = "file"
+    POSTGRES = "postgres"
+
+
+class AccessLogConfig(BaseModel):
+    # No sinks - records aren't collected at all
+    sinks: list[AccessLogSinkType] = []
+    file_path: str = "logs/access.ndjson"
+    table: str = "access_log"
+    # Ring buffer size, the oldest records are dropped when it's full
+    buffer_size: int = 10_000
+    batch_size: int = 1000
+    flush_interval: float = 1.0
+
+
+class CacheConfig(BaseModel):
+    # SQLite file shared by the workers of a host, preferably on tmpfs
+    # (e.g. /dev/shm/app-cache.sqlite3), without it caches are per worker
+    shared_path: str | None = None
+    principal_size: int = 10_000
+    # Bounds how long other workers may serve a principal after a change
+    principal_ttl: float = 10.0
+    principal_shared_ttl: float = 300.0
+    response_size: int = 10_000
+    # Bounds how long other workers may serve a response after invalidation,
+    # without shared_path they serve it until the ttl of the route
+    response_tag_check_interval: float = 1.0
+
+
+class CountStrategy(StrEnum):
+    EXACT = "exact"
+    NONE = "none"
+    ESTIMATED = "estimated"
+    CACHED = "cached"
+
+
+class MonitoringConfig(BaseModel):
+    # Token required in X-Internal-Token by the internal endpoints,
+    # without it they are only available in debug mode
+    internal_token: str | None = None
+    # Per-request query instrumentation
+    server_timing: bool = True
+    query_count_warning: int = 20
+    query_time_warning_ms: float = 500.0
+    # Identical statements repeated this many times are reported as N+1
+    n_plus_one_threshold: int = 5
+    # Slow query log, EXPLAIN is captured for the sampled share of slow
+    # SELECT statements (0 disables it). ANALYZE runs them once more,
+    # in a rolled back read-only transaction
+    slow_query_threshold_ms: float = 200.0
+    slow_query_explain_sample_rate: float = 0.0
+    slow_query_explain_analyze: bool = False
+    slow_query_window: int = 1000
+    slow_query_max_fingerprints: int = 1000
+
+
 class PaginationConfig(BaseModel):
     requests_count: int = 10
+    count_strategy: CountStrategy = CountStrategy.EXACT
+    count_cache_ttl: int = 60
+    count_cache_size: int = 1024
 
 
 class Settings(BaseSettings):
@@ -83,6 +221,9 @@ class Settings(BaseSettings):
     db: DatabaseConfig
     auth: AuthConfig = AuthConfig()
     sentry: SentryConfig = SentryConfig()
+    access_log: AccessLogConfig = AccessLogConfig()
+    cache: CacheConfig = CacheConfig()
+    monitoring: MonitoringConfig = MonitoringConfig()
     pagination: PaginationConfig = PaginationConfig()
 
 
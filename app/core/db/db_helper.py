@@ -1,81 +1,148 @@
-from collections.abc import AsyncGenerator
+import asyncio
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    Callable,
+    Mapping,
+    Sequence,
+)
+from contextlib import AsyncExitStack
 from contextvars import ContextVar, Token
+from typing import Any
+from uuid import uuid4
 
+from pydantic import BaseModel
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
     AsyncEngine,
     AsyncSession,
     async_scoped_session,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
 from sqlalchemy.pool import NullPool, Pool
 
-from app.core.config import settings
+from app.core.config import ReplicaStrategy, StatementNames, settings
+from app.core.db.pool import InstrumentedQueuePool, instrument_engine
+from app.core.db.query_counter import instrument_queries
+from app.core.db.routing import ReplicaRouter, RoutingSession, route_key_context
+from app.core.db.statements import instrument_compiled_cache
+
+session_context: ContextVar[int] = ContextVar("session_context")
 
-session_context: ContextVar[str] = ContextVar("session_context")
+# Staging table column numbering the copied rows, the last duplicate wins
+COPY_ORDINAL_COLUMN = "_copy_ordinal"
 
 
-def get_session_id() -> str:
+def get_session_id() -> int:
     return session_context.get()
 
 
+def _unique_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
 class DatabaseHelper:
     def __init__(
         self,
         url: str,
+        name: str = "primary",
         echo: bool = False,
         echo_pool: bool = False,
         pool_size: int = 5,
         max_overflow: int = 10,
         pool_recycle: int = 3600,
-        pool_class: Pool | None = None,
+        pool_class: type[Pool] | None = None,
+        replica_urls: Sequence[str] = (),
+        replica_strategy: ReplicaStrategy = ReplicaStrategy.ROUND_ROBIN,
+        replica_max_lag: float = 5.0,
+        replica_health_check_interval: float = 10.0,
+        read_your_writes_window: float = 5.0,
+        prepared_statement_cache_size: int = 100,
+        prepared_statement_names: StatementNames = StatementNames.SEQUENTIAL,
+        pgbouncer_transaction_mode: bool = False,
+        compiled_cache_size: int = 500,
     ) -> None:
         self.url = url
+        self.name = name
         self.echo = echo
         self.echo_pool = echo_pool
         self.pool_size = pool_size
         self.max_overflow = max_overflow
         self.pool_recycle = pool_recycle
         self.pool_class = pool_class
+        self.replica_urls = replica_urls
+        self.replica_strategy = replica_strategy
+        self.replica_max_lag = replica_max_lag
+        self.replica_health_check_interval = replica_health_check_interval
+        self.read_your_writes_window = read_your_writes_window
+        self.prepared_statement_cache_size = prepared_statement_cache_size
+        self.prepared_statement_names = prepared_statement_names
+        self.pgbouncer_transaction_mode = pgbouncer_transaction_mode
+        self.compiled_cache_size = compiled_cache_size
 
         self._engine: AsyncEngine | None = None
+        self._router: ReplicaRouter | None = None
         self._session_factory: async_sessionmaker[AsyncSession] | None = None
-        self._scoped_session: AsyncSession | async_scoped_session | None = None
+        self._scoped_session: async_scoped_session[AsyncSession] | None = None
+        # Called with the table name after copy_records committed, COPY
+        # bypasses the session events (e.g. to invalidate caches)
+        self.copy_listeners: list[Callable[[str], None]] = []
 
     @property
     def engine(self) -> AsyncEngine:
+        """Primary engine"""
         if self._engine is None:
-            engine_kwargs = {
-                "url": self.url,
-                "echo": self.echo,
-                "echo_pool": self.echo_pool,
-                "pool_size": self.pool_size,
-                "max_overflow": self.max_overflow,
-                "pool_recycle": self.pool_recycle,
-                "poolclass": self.pool_class,
-            }
-
-            # Remove pool_recycle, if pool_class isNullPool
-            if self.pool_class is NullPool:
-                engine_kwargs.pop("pool_size", None)
-                engine_kwargs.pop("max_overflow", None)
-
-            self._engine = create_async_engine(**engine_kwargs)
+            self._engine = self._create_engine(self.url, self.name)
         return self._engine
 
+    @property
+    def router(self) -> ReplicaRouter | None:
+        """Replica router, None without replicas"""
+        if self._router is None and self.replica_urls:
+            self._router = ReplicaRouter(
+                replicas=[
+                    self._create_engine(url, f"replica-{index}")
+                    for index, url in enumerate(self.replica_urls)
+                ],
+                strategy=self.replica_strategy,
+                max_lag=self.replica_max_lag,
+                health_check_interval=self.replica_health_check_interval,
+                read_your_writes_window=self.read_your_writes_window,
+            )
+        return self._router
+
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        """Primary and replica engines"""
+        engines = [self.engine]
+        if self.router is not None:
+            engines.extend(node.engine for node in self.router.nodes)
+        return engines
+
     @property
     def session_factory(self) -> async_sessionmaker[AsyncSession]:
         if self._session_factory is None:
+            sync_session_class: type[Session] = Session
+            if self.router is not None:
+                sync_session_class = type(
+                    "RoutingSession",
+                    (RoutingSession,),
+                    {"router": self.router},
+                )
             self._session_factory = async_sessionmaker(
                 bind=self.engine,
                 autoflush=False,
                 autocommit=False,
                 expire_on_commit=False,
+                sync_session_class=sync_session_class,
             )
         return self._session_factory
 
     @property
-    def session(self) -> AsyncSession | async_scoped_session:
+    def session(self) -> AsyncSession | async_scoped_session[AsyncSession]:
         if self._scoped_session is None:
             self._scoped_session = async_scoped_session(
                 session_factory=self.session_factory,
@@ -83,20 +150,295 @@ class DatabaseHelper:
             )
         return self._scoped_session
 
+    def in_transaction(self) -> bool:
+        """Whether the session of the current context has begun a transaction"""
+        session = self.session
+        # The scoped session doesn't proxy in_transaction
+        current = session() if isinstance(session, async_scoped_session) else session
+        return current.in_transaction()
+
+    async def remove_session(self) -> None:
+        """Close the scoped session of the current context if it was created"""
+        if self._scoped_session is not None and self._scoped_session.registry.has():
+            await self._scoped_session.remove()
+
+    async def warm_up(
+        self,
+        connections: int,
+        statements: Sequence[str] = ("SELECT 1",),
+    ) -> None:
+        """
+        Open pooled connections ahead of the first requests, so they don't pay
+        for the TCP, TLS and auth handshakes. Connections are held together,
+        otherwise the pool hands out the same one again, and returned idle.
+        :param connections: connections per engine, capped by the pool size
+        :param statements: SQL run on every connection, e.g. to load catalogs
+        """
+        if self.pool_class is NullPool or connections <= 0:
+            return
+
+        async def warm(engine: AsyncEngine, count: int) -> None:
+            async with AsyncExitStack() as stack:
+                # Every attempt finishes before the stack closes, even if one fails
+                opened = await asyncio.gather(
+                    *(
+                        stack.enter_async_context(engine.connect())
+                        for _ in range(count)
+                    ),
+                    return_exceptions=True,
+                )
+                for result in opened:
+                    if isinstance(result, BaseException):
+                        raise result
+                await asyncio.gather(
+                    *(
+                        run(connection)
+                        for connection in opened
+                        if not isinstance(connection, BaseException)
+                    ),
+                )
+
+        async def run(connection: AsyncConnection) -> None:
+            for statement in statements:
+                await connection.exec_driver_sql(statement)
+            await connection.rollback()
+
+        await asyncio.gather(
+            *(
+                warm(engine, min(connections, self.pool_size))
+                for engine in self.engines
+            ),
+        )
+
     async def dispose(self) -> None:
         if self._engine is not None:
             await self._engine.dispose()
+        if self._router is not None:
+            for node in self._router.nodes:
+                await node.engine.dispose()
 
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
         async with self.session_factory() as session:
             yield session
 
-    def set_session_context(self, session_id: str) -> Token:  # type: ignore
+    async def copy_records(
+        self,
+        table: str,
+        columns: Sequence[str],
+        records: AsyncIterable[Sequence[Any] | Mapping[str, Any] | BaseModel],
+        *,
+        schema: str | None = None,
+        chunk_size: int = 10_000,
+        max_pending_chunks: int = 2,
+        conflict_columns: Sequence[str] | None = None,
+        update_columns: Sequence[str] | None = None,
+    ) -> int:
+        """
+        Bulk load records with COPY FROM STDIN in a single transaction.
+        Records are read in chunks of chunk_size, at most max_pending_chunks
+        are buffered while the previous one is copied, so memory stays flat
+        and a slow database slows down the producer.
+        With conflict_columns rows are copied into a temporary staging table
+        and merged with INSERT ... ON CONFLICT (upsert), of the duplicates
+        the last row wins, as with bulk_upsert.
+        The copy_listeners are called with the table after the commit.
+        :param table: target table name, e.g. User.__tablename__
+        :param columns: columns of the records, in order
+        :param records: tuples, mappings or pydantic models
+        :param schema: target table schema, default search_path
+        :param chunk_size: rows per COPY
+        :param max_pending_chunks: chunks buffered ahead of COPY
+        :param conflict_columns: unique columns for upsert
+        :param update_columns: columns to update on conflict, default all the
+            columns except the conflict ones. Empty - DO NOTHING
+        :return: Number of copied rows
+        """
+        queue: asyncio.Queue[list[tuple[Any, ...]] | None] = asyncio.Queue(
+            maxsize=max_pending_chunks,
+        )
+
+        async def produce() -> None:
+            chunk: list[tuple[Any, ...]] = []
+            try:
+                async for record in records:
+                    chunk.append(self._record_values(record, columns))
+                    if len(chunk) >= chunk_size:
+                        await queue.put(chunk)
+                        chunk = []
+                if chunk:
+                    await queue.put(chunk)
+            finally:
+                # Cancelled when the copy failed, nothing reads the queue anymore
+                # and a full queue would block the sentinel forever
+                if not producer.cancelling():
+                    await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            async with self.engine.connect() as connection:
+                raw_connection = await connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection
+                async with driver_connection.transaction():  # type: ignore[union-attr]
+                    copied = await self._copy_chunks(
+                        driver_connection,
+                        queue,
+                        table,
+                        columns,
+                        schema=schema,
+                        conflict_columns=conflict_columns,
+                        update_columns=update_columns,
+                    )
+                    # Re-raise producer errors before the transaction commits
+                    await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+        for listener in self.copy_listeners:
+            listener(table)
+        return copied
+
+    async def _copy_chunks(
+        self,
+        driver_connection: Any,
+        queue: asyncio.Queue[list[tuple[Any, ...]] | None],
+        table: str,
+        columns: Sequence[str],
+        *,
+        schema: str | None,
+        conflict_columns: Sequence[str] | None,
+        update_columns: Sequence[str] | None,
+    ) -> int:
+        quote = self.engine.dialect.identifier_preparer.quote
+        target = f"{quote(schema)}.{quote(table)}" if schema else quote(table)
+        column_list = ", ".join(quote(column) for column in columns)
+
+        merge_query = None
+        copy_table, copy_schema = table, schema
+        if conflict_columns:
+            copy_table, copy_schema = f"_copy_stage_{table}", None
+            await driver_connection.execute(
+                f"CREATE TEMPORARY TABLE {quote(copy_table)} ON COMMIT DROP AS "  # noqa: S608
+                f"SELECT {column_list} FROM {target} WITH NO DATA",
+            )
+            # Filled by COPY in the order of the records
+            await driver_connection.execute(
+                f"ALTER TABLE {quote(copy_table)} "
+                f"ADD COLUMN {quote(COPY_ORDINAL_COLUMN)} bigserial",
+            )
+            merge_query = self._merge_query(
+                target,
+                quote(copy_table),
+                columns,
+                conflict_columns,
+                update_columns,
+            )
+
+        copied = 0
+        while (chunk := await queue.get()) is not None:
+            await driver_connection.copy_records_to_table(
+                copy_table,
+                records=chunk,
+                columns=list(columns),
+                schema_name=copy_schema,
+            )
+            if merge_query:
+                await driver_connection.execute(merge_query)
+                await driver_connection.execute(f"TRUNCATE {quote(copy_table)}")
+            copied += len(chunk)
+        return copied
+
+    def _merge_query(
+        self,
+        target: str,
+        stage: str,
+        columns: Sequence[str],
+        conflict_columns: Sequence[str],
+        update_columns: Sequence[str] | None,
+    ) -> str:
+        quote = self.engine.dialect.identifier_preparer.quote
+        column_list = ", ".join(quote(column) for column in columns)
+        conflict_list = ", ".join(quote(column) for column in conflict_columns)
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in conflict_columns]
+        if update_columns:
+            action = "DO UPDATE SET " + ", ".join(
+                f"{quote(column)} = EXCLUDED.{quote(column)}"
+                for column in update_columns
+            )
+        else:
+            action = "DO NOTHING"
+        return (
+            f"INSERT INTO {target} ({column_list}) "  # noqa: S608
+            f"SELECT DISTINCT ON ({conflict_list}) {column_list} FROM {stage} "
+            f"ORDER BY {conflict_list}, {quote(COPY_ORDINAL_COLUMN)} DESC "
+            f"ON CONFLICT ({conflict_list}) {action}"
+        )
+
+    @staticmethod
+    def _record_values(
+        record: Sequence[Any] | Mapping[str, Any] | BaseModel,
+        columns: Sequence[str],
+    ) -> tuple[Any, ...]:
+        if isinstance(record, BaseModel):
+            return tuple(getattr(record, column) for column in columns)
+        if isinstance(record, Mapping):
+            return tuple(record[column] for column in columns)
+        return tuple(record)
+
+    def set_session_context(self, session_id: int) -> Token:  # type: ignore
         return session_context.set(session_id)
 
     def reset_session_context(self, context: Token) -> None:  # type: ignore
         session_context.reset(context)
 
+    def set_route_key(self, key: str) -> Token:  # type: ignore
+        """Set the key reads are pinned by after a write, e.g. the user email"""
+        return route_key_context.set(key)
+
+    def _create_engine(self, url: str, name: str) -> AsyncEngine:
+        engine_kwargs = {
+            "url": url,
+            "echo": self.echo,
+            "echo_pool": self.echo_pool,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_recycle": self.pool_recycle,
+            "poolclass": self.pool_class or InstrumentedQueuePool,
+            "pool_logging_name": name,
+            "query_cache_size": self.compiled_cache_size,
+        }
+        if make_url(url).get_driver_name() == "asyncpg":
+            engine_kwargs["connect_args"] = self._asyncpg_connect_args()
+
+        # Remove pool_recycle, if pool_class isNullPool
+        if self.pool_class is NullPool:
+            engine_kwargs.pop("pool_size", None)
+            engine_kwargs.pop("max_overflow", None)
+
+        engine = create_async_engine(**engine_kwargs)
+        instrument_engine(engine, name)
+        instrument_queries(engine)
+        instrument_compiled_cache(engine, name)
+        return engine
+
+    def _asyncpg_connect_args(self) -> dict[str, Any]:
+        cache_size = self.prepared_statement_cache_size
+        names = self.prepared_statement_names
+        if self.pgbouncer_transaction_mode:
+            # A statement prepared in one transaction may be missing, or taken
+            # by another client, on the server connection of the next one
+            cache_size, names = 0, StatementNames.UNIQUE
+
+        connect_args: dict[str, Any] = {
+            # Statements prepared by SQLAlchemy
+            "prepared_statement_cache_size": cache_size,
+            # Statements of asyncpg itself, e.g. type introspection
+            "statement_cache_size": cache_size,
+        }
+        if names == StatementNames.UNIQUE:
+            connect_args["prepared_statement_name_func"] = _unique_statement_name
+        return connect_args
+
 
 db_helper = DatabaseHelper(
     url=str(settings.db.url),
@@ -104,11 +446,25 @@ db_helper = DatabaseHelper(
     echo_pool=settings.db.echo_pool,
     pool_size=settings.db.pool_size,
     max_overflow=settings.db.max_overflow,
+    replica_urls=[str(url) for url in settings.db.replicas],
+    replica_strategy=settings.db.replica_strategy,
+    replica_max_lag=settings.db.replica_max_lag,
+    replica_health_check_interval=settings.db.replica_health_check_interval,
+    read_your_writes_window=settings.db.read_your_writes_window,
+    prepared_statement_cache_size=settings.db.prepared_statement_cache_size,
+    prepared_statement_names=settings.db.prepared_statement_names,
+    pgbouncer_transaction_mode=settings.db.pgbouncer_transaction_mode,
+    compiled_cache_size=settings.db.compiled_cache_size,
 )
 
 celery_db_helper = DatabaseHelper(
     url=str(settings.db.url),
+    name="celery",
     echo=settings.db.echo,
     echo_pool=settings.db.echo_pool,
     pool_class=NullPool,
+    prepared_statement_cache_size=settings.db.prepared_statement_cache_size,
+    prepared_statement_names=settings.db.prepared_statement_names,
+    pgbouncer_transaction_mode=settings.db.pgbouncer_transaction_mode,
+    compiled_cache_size=settings.db.compiled_cache_size,
 )
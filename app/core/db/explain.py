@@ -0,0 +1,24 @@
+from typing import Any
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import ClauseElement, Executable
+from sqlalchemy.sql.compiler import SQLCompiler
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN of a statement, e.g. session.execute(Explain(stmt))."""
+
+    inherit_cache = False
+
+    def __init__(
+        self, statement: ClauseElement, explain_options: str = "FORMAT JSON"
+    ) -> None:
+        self.statement = statement
+        # Executable.options() is the ORM options method, not the EXPLAIN ones
+        self.explain_options = explain_options
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler: SQLCompiler, **kwargs: Any) -> str:
+    statement = compiler.process(element.statement, **kwargs)
+    return f"EXPLAIN ({element.explain_options}) {statement}"
@@ -0,0 +1,172 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Iterable, Mapping
+from itertools import batched
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.db import db_helper
+from app.core.metrics import Counter, Histogram, registry
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+BatchLoad = Callable[[list[KeyType]], Awaitable[Mapping[KeyType, ValueType]]]
+
+# Loader registry of a scoped session, i.e. of a request
+LOADERS_INFO_KEY = "data_loaders"
+
+LOADER_BATCH_SIZE = registry.register(
+    Histogram(
+        "db_loader_batch_size",
+        "Keys loaded by one query of a data loader",
+        ("loader",),
+        buckets=(1, 2, 5, 10, 20, 50, 100, 500, 1000),
+    ),
+)
+LOADER_CACHE_HITS = registry.register(
+    Counter(
+        "db_loader_cache_hits",
+        "Keys found in the request cache of a data loader",
+        ("loader",),
+    ),
+)
+
+
+class DataLoader(Generic[KeyType, ValueType]):
+    """
+    Batches the loads of one event loop iteration: keys requested by
+    coroutines run together, e.g. with asyncio.gather, are loaded by one
+    batch_load call. Results are cached for the lifetime of the loader,
+    failures are not. Keys missing from the mapping load as None.
+    """
+
+    def __init__(
+        self,
+        batch_load: BatchLoad[KeyType, ValueType],
+        name: str = "loader",
+        max_batch_size: int = 1000,
+        lock: asyncio.Lock | None = None,
+    ) -> None:
+        self.batch_load = batch_load
+        self.name = name
+        self.max_batch_size = max_batch_size
+        # Serializes the batches of loaders sharing a session
+        self.lock = lock or asyncio.Lock()
+        self._cache: dict[KeyType, asyncio.Future[ValueType | None]] = {}
+        self._queue: list[KeyType] = []
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def load(self, key: KeyType) -> ValueType | None:
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._cache[key] = loop.create_future()
+            if not self._queue:
+                # Runs after the coroutines ready in this iteration queued theirs
+                loop.call_soon(self._dispatch)
+            self._queue.append(key)
+        elif future.done():
+            LOADER_CACHE_HITS.inc(loader=self.name)
+        # A cancelled caller must not cancel the load of the others
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[KeyType]) -> list[ValueType | None]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: KeyType, value: ValueType) -> None:
+        """Cache a value loaded elsewhere"""
+        if key not in self._cache:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._cache[key] = future
+
+    def clear(self) -> None:
+        """Forget the loaded values, the pending loads still complete"""
+        self._cache = {
+            key: future for key, future in self._cache.items() if not future.done()
+        }
+
+    def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        for batch in batched(keys, self.max_batch_size):
+            task = asyncio.create_task(self._load_batch(list(batch)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, keys: list[KeyType]) -> None:
+        futures = [self._cache[key] for key in keys]
+        LOADER_BATCH_SIZE.observe(len(keys), loader=self.name)
+        try:
+            async with self.lock:
+                values = await self.batch_load(keys)
+        except BaseException as e:
+            for key, future in zip(keys, futures, strict=True):
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+                if future.done():
+                    continue
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                else:
+                    future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key, future in zip(keys, futures, strict=True):
+            if not future.done():
+                future.set_result(values.get(key))
+
+
+class LoaderRegistry:
+    """Data loaders of a scoped session, created on first use by their key"""
+
+    def __init__(self) -> None:
+        # One query at a time on the session of the request
+        self.lock = asyncio.Lock()
+        self._loaders: dict[Hashable, DataLoader[Any, Any]] = {}
+
+    def get(
+        self,
+        key: Hashable,
+        batch_load: BatchLoad[Any, Any],
+        name: str = "loader",
+    ) -> DataLoader[Any, Any]:
+        """
+        Loader of the key, batch_load is used only when it is created
+        :param key: identifies the loader, e.g. (model, field, loads)
+        :param batch_load: loads the values of a list of keys
+        :param name: metrics label
+        :return: Loader
+        """
+        loader = self._loaders.get(key)
+        if loader is None:
+            loader = self._loaders[key] = DataLoader(
+                batch_load,
+                name=name,
+                lock=self.lock,
+            )
+        return loader
+
+    def clear(self) -> None:
+        for loader in self._loaders.values():
+            loader.clear()
+
+
+def loaders() -> LoaderRegistry:
+    """Loader registry of the current session context (request)"""
+    info = db_helper.session.info
+    loader_registry = info.get(LOADERS_INFO_KEY)
+    if loader_registry is None:
+        loader_registry = info[LOADERS_INFO_KEY] = LoaderRegistry()
+    return loader_registry  # type: ignore[no-any-return]
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_loaders(session: Session) -> None:
+    # Values loaded before may have been changed or deleted
+    loader_registry = session.info.get(LOADERS_INFO_KEY)
+    if loader_registry is not None:
+        loader_registry.clear()
@@ -0,0 +1,111 @@
+from collections.abc import Callable, Sequence
+from enum import StrEnum
+from typing import Any
+
+from sqlalchemy.orm import (
+    QueryableAttribute,
+    joinedload,
+    selectinload,
+    subqueryload,
+)
+from sqlalchemy.orm.strategy_options import _AbstractLoad
+
+
+class LoadStrategy(StrEnum):
+    # SELECT ... WHERE parent_id IN (...) after the parents, the default
+    SELECTIN = "selectin"
+    # LEFT OUTER JOIN in the same statement, for many-to-one and small sets
+    JOINED = "joined"
+    # The parent query as a subquery joined to the related table
+    SUBQUERY = "subquery"
+
+
+_STRATEGIES: dict[LoadStrategy, Callable[[Any], _AbstractLoad]] = {
+    LoadStrategy.SELECTIN: selectinload,
+    LoadStrategy.JOINED: joinedload,
+    LoadStrategy.SUBQUERY: subqueryload,
+}
+
+
+class Load:
+    """
+    Eager load of a relationship, and of the relationships of the loaded
+    objects to any depth, with a strategy per level, e.g.
+        Load(
+            User.posts,
+            Load(Post.comments, Load(Comment.author, strategy=LoadStrategy.JOINED)),
+            Post.tags,
+        )
+    Attributes given as children are loaded with selectin.
+    """
+
+    __slots__ = ("attribute", "children", "strategy")
+
+    def __init__(
+        self,
+        attribute: QueryableAttribute[Any],
+        *children: "Load | QueryableAttribute[Any]",
+        strategy: LoadStrategy = LoadStrategy.SELECTIN,
+    ) -> None:
+        self.attribute = attribute
+        self.children = tuple(to_load(child) for child in children)
+        self.strategy = strategy
+
+    def option(self) -> _AbstractLoad:
+        """Loader option of the statement"""
+        option = _STRATEGIES[self.strategy](self.attribute)
+        if self.children:
+            option = option.options(*(child.option() for child in self.children))
+        return option
+
+    @property
+    def key(self) -> tuple[Any, ...] | None:
+        """Hashable description, None if the attribute has criteria or a type"""
+        attribute = self.attribute
+        # and_() and of_type() aren't part of the description
+        if getattr(attribute, "_extra_criteria", ()) or getattr(
+            attribute, "_of_type", None
+        ):
+            return None
+        children = tuple(child.key for child in self.children)
+        if any(child is None for child in children):
+            return None
+        return attribute.parent, attribute.key, self.strategy, children
+
+    @property
+    def joins_collection(self) -> bool:
+        """A collection is joined, rows of the result must be made unique"""
+        if self.strategy == LoadStrategy.JOINED and getattr(
+            self.attribute.property, "uselist", False
+        ):
+            return True
+        return any(child.joins_collection for child in self.children)
+
+
+# A relationship (selectin), a Load or {"related": ..., "sub_related": ...}
+LoadSpec = QueryableAttribute[Any] | Load | dict[str, Any]
+
+
+def to_load(spec: LoadSpec) -> Load:
+    if isinstance(spec, Load):
+        return spec
+    if isinstance(spec, dict):
+        # Former two-level form, sub_related is loaded from related
+        return Load(spec["related"], spec["sub_related"])
+    return Load(spec)
+
+
+def load_options(select_load: Sequence[LoadSpec]) -> list[_AbstractLoad]:
+    return [to_load(spec).option() for spec in select_load]
+
+
+def load_key(select_load: Sequence[LoadSpec] | None) -> tuple[Any, ...] | None:
+    """Hashable description of the loads, None if one can't be described"""
+    keys = tuple(to_load(spec).key for spec in select_load or ())
+    if any(key is None for key in keys):
+        return None
+    return keys
+
+
+def joins_collection(select_load: Sequence[LoadSpec] | None) -> bool:
+    return any(to_load(spec).joins_collection for spec in select_load or ())
@@ -0,0 +1,128 @@
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
+
+from app.core.metrics import Counter, Gauge, Histogram, registry
+
+CONNECTED_AT = "connected_at"
+CHECKED_OUT_AT = "checked_out_at"
+
+CONNECTION_AGE_BUCKETS = (1, 10, 60, 300, 900, 1800, 3600, 7200)
+
+POOL_WAIT = registry.register(
+    Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled connection",
+        ("pool",),
+    ),
+)
+POOL_HOLD = registry.register(
+    Histogram(
+        "db_pool_checkout_hold_seconds",
+        "Time a connection stays checked out",
+        ("pool",),
+    ),
+)
+POOL_CONNECTION_AGE = registry.register(
+    Histogram(
+        "db_pool_connection_age_seconds",
+        "Age of connections at checkout",
+        ("pool",),
+        buckets=CONNECTION_AGE_BUCKETS,
+    ),
+)
+POOL_CHECKOUTS = registry.register(
+    Counter("db_pool_checkouts", "Connection checkouts", ("pool",)),
+)
+POOL_CONNECTS = registry.register(
+    Counter("db_pool_connects", "New database connections", ("pool",)),
+)
+POOL_INVALIDATIONS = registry.register(
+    Counter("db_pool_invalidations", "Invalidated connections", ("pool",)),
+)
+
+_pools: dict[str, AsyncEngine] = {}
+
+
+def _pool_gauge(name: str, documentation: str, attribute: str) -> Gauge:
+    def collect() -> Iterable[tuple[tuple[str, ...], float]]:
+        for pool_name, engine in _pools.items():
+            pool = engine.sync_engine.pool
+            if isinstance(pool, QueuePool):
+                value = getattr(pool, attribute)()
+                # overflow() is negative while the pool is not full
+                yield (pool_name,), max(value, 0)
+
+    return registry.register(Gauge(name, documentation, ("pool",), collect))
+
+
+_pool_gauge("db_pool_size", "Configured pool size", "size")
+_pool_gauge("db_pool_checked_out", "Connections checked out", "checkedout")
+_pool_gauge("db_pool_idle", "Idle connections in the pool", "checkedin")
+_pool_gauge("db_pool_overflow", "Connections open beyond the pool size", "overflow")
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool measuring how long checkouts wait for a connection."""
+
+    def connect(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start, pool=self.logging_name or "")
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """
+    Attach pool event listeners and expose pool gauges of the engine
+    :param engine: engine to instrument
+    :param name: pool label, e.g. primary or replica-0
+    """
+    _pools[name] = engine
+    target = engine.sync_engine
+
+    @event.listens_for(target, "connect")
+    def on_connect(_: Any, record: ConnectionPoolEntry) -> None:
+        record.info[CONNECTED_AT] = time.monotonic()
+        POOL_CONNECTS.inc(pool=name)
+
+    @event.listens_for(target, "checkout")
+    def on_checkout(_: Any, record: ConnectionPoolEntry, __: Any) -> None:
+        now = time.monotonic()
+        record.info[CHECKED_OUT_AT] = now
+        POOL_CHECKOUTS.inc(pool=name)
+        POOL_CONNECTION_AGE.observe(
+            now - record.info.get(CONNECTED_AT, now),
+            pool=name,
+        )
+
+    @event.listens_for(target, "checkin")
+    def on_checkin(_: Any, record: ConnectionPoolEntry) -> None:
+        checked_out_at = record.info.pop(CHECKED_OUT_AT, None)
+        if checked_out_at is not None:
+            POOL_HOLD.observe(time.monotonic() - checked_out_at, pool=name)
+
+    @event.listens_for(target, "invalidate")
+    def on_invalidate(_: Any, __: ConnectionPoolEntry, ___: Any) -> None:
+        POOL_INVALIDATIONS.inc(pool=name)
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    """Current state of the instrumented pools"""
+    stats = {}
+    for name, engine in _pools.items():
+        pool = engine.sync_engine.pool
+        if isinstance(pool, QueuePool):
+            stats[name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,  # noqa: SLF001
+            }
+    return stats
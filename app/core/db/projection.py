@@ -0,0 +1,112 @@
+import dataclasses
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, make_dataclass
+from typing import Any, Generic, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import Column, inspect
+from sqlalchemy.orm import ColumnProperty, QueryableAttribute
+
+RowType = TypeVar("RowType")
+
+# Mapped column attributes, a dataclass or a pydantic model
+# with fields named after the columns of the model
+ProjectionTarget = Sequence[QueryableAttribute[Any]] | type[Any]
+
+
+@dataclass(slots=True, frozen=True, eq=False)
+class Projection(Generic[RowType]):
+    """Columns selected instead of the entity and the rows built from them"""
+
+    names: tuple[str, ...]
+    columns: tuple[Column[Any], ...]
+    # Called with the values in the order of the columns
+    factory: Callable[..., RowType]
+
+    def rows(self, result: Any) -> list[RowType]:
+        factory = self.factory
+        return [factory(*row) for row in result]
+
+
+_projections: dict[tuple[Any, ...], Projection[Any]] = {}
+_row_classes: dict[tuple[Any, ...], type[Any]] = {}
+
+
+def projection(model: type[Any], target: ProjectionTarget) -> Projection[Any]:
+    """
+    Projection of the model, built once per target. Columns give slotted row
+    objects with attributes named after them, e.g.
+        projection(User, [User.id, User.email]).factory(1, "a@b.c").email
+    Dataclasses are built with positional arguments, pydantic models with
+    model_construct: values come from the database, they aren't validated.
+    :param model: mapped class the rows are selected from
+    :param target: columns, a dataclass or a pydantic model
+    :return: Projection
+    """
+    if isinstance(target, type):
+        key: tuple[Any, ...] = (model, target)
+    else:
+        key = (model, *((attribute.parent, attribute.key) for attribute in target))
+    cached = _projections.get(key)
+    if cached is not None:
+        return cached
+
+    factory: Callable[..., Any]
+
+    if isinstance(target, type) and issubclass(target, BaseModel):
+        names = tuple(target.model_fields)
+        columns = _model_columns(model, names)
+        factory = _pydantic_factory(target, names)
+    elif isinstance(target, type) and dataclasses.is_dataclass(target):
+        names = tuple(field.name for field in dataclasses.fields(target) if field.init)
+        columns = _model_columns(model, names)
+        factory = target
+    elif isinstance(target, type):
+        raise TypeError(f"{target.__name__} is not a dataclass or a pydantic model")
+    else:
+        names = tuple(attribute.key for attribute in target)
+        columns = tuple(_attribute_column(attribute) for attribute in target)
+        factory = _row_class(model, names)
+
+    _projections[key] = result = Projection(
+        names=names,
+        columns=columns,
+        factory=factory,
+    )
+    return result
+
+
+def _model_columns(model: type[Any], names: Sequence[str]) -> tuple[Column[Any], ...]:
+    mapper_columns = inspect(model).columns
+    missing = [name for name in names if name not in mapper_columns]
+    if missing:
+        raise ValueError(f"{model.__name__} has no columns {', '.join(missing)}")
+    return tuple(mapper_columns[name] for name in names)
+
+
+def _attribute_column(attribute: QueryableAttribute[Any]) -> Column[Any]:
+    prop = attribute.property
+    if not isinstance(prop, ColumnProperty):
+        raise TypeError(f"{attribute} is not a column")
+    return prop.columns[0]  # type: ignore[return-value]
+
+
+def _row_class(model: type[Any], names: tuple[str, ...]) -> type[Any]:
+    row_class = _row_classes.get((model, names))
+    if row_class is None:
+        # Slots, no __dict__ and no instrumentation, only the values
+        row_class = make_dataclass(f"{model.__name__}Row", names, slots=True)
+        _row_classes[model, names] = row_class
+    return row_class
+
+
+def _pydantic_factory(
+    target: type[BaseModel],
+    names: tuple[str, ...],
+) -> Callable[..., BaseModel]:
+    construct = target.model_construct
+
+    def build(*values: Any) -> BaseModel:
+        return construct(**dict(zip(names, values, strict=True)))
+
+    return build
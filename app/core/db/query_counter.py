@@ -0,0 +1,135 @@
+import logging
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.db.slow_query import slow_query_log
+from app.core.metrics import Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+QUERY_START_TIME = "query_start_time"
+
+QUERIES_PER_REQUEST = registry.register(
+    Histogram(
+        "db_queries_per_request",
+        "Statements executed per request",
+        buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+)
+
+
+@dataclass(slots=True)
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+    statements: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements executed at least threshold times (N+1 suspects)"""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self) -> bytes:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'.encode()
+
+
+# Statistics of the current request, set next to the session context
+query_stats_context: ContextVar[QueryStats | None] = ContextVar(
+    "query_stats_context",
+    default=None,
+)
+
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    """
+    Count statements and database time of the current request
+    and feed the slow query log
+    """
+    target = engine.sync_engine
+
+    @event.listens_for(target, "before_cursor_execute")
+    def before_cursor_execute(connection: Any, *_: Any) -> None:
+        connection.info.setdefault(QUERY_START_TIME, []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def after_cursor_execute(
+        connection: Any,
+        _: Any,
+        statement: str,
+        parameters: Any,
+        __: Any,
+        executemany: bool,
+    ) -> None:
+        duration = time.perf_counter() - connection.info[QUERY_START_TIME].pop()
+        stats = query_stats_context.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        slow_query_log.record(engine, statement, parameters, duration, executemany)
+
+
+def report_query_stats(stats: QueryStats, method: str, path: str) -> None:
+    """Log requests past the configured query count and time thresholds"""
+    monitoring = settings.monitoring
+    QUERIES_PER_REQUEST.observe(stats.count)
+
+    if (
+        stats.count > monitoring.query_count_warning
+        or stats.duration * 1000 > monitoring.query_time_warning_ms
+    ):
+        logger.warning(
+            "%s %s executed %d statements in %.1f ms",
+            method,
+            path,
+            stats.count,
+            stats.duration * 1000,
+        )
+    for statement, count in stats.repeated(monitoring.n_plus_one_threshold):
+        logger.warning(
+            "Possible N+1 in %s %s, statement executed %d times: %s",
+            method,
+            path,
+            count,
+            statement,
+        )
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    Fail if the block executes more than limit statements, e.g.
+        with assert_max_queries(3):
+            await user_service.get(id=1)
+    :param limit: allowed number of statements
+    :return: Statistics of the block
+    """
+    stats = QueryStats()
+    token = query_stats_context.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats_context.reset(token)
+
+    if stats.count > limit:
+        statements = "\n".join(
+            f"{count}x {statement}" for statement, count in stats.statements.items()
+        )
+        raise AssertionError(
+            f"Expected at most {limit} queries, {stats.count} executed:\n{statements}",
+        )
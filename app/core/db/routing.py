@@ -0,0 +1,204 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import StrEnum
+from typing import Any
+
+from sqlalchemy import Engine, Select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import ReplicaStrategy
+
+logger = logging.getLogger(__name__)
+
+
+class Route(StrEnum):
+    PRIMARY = "primary"
+    REPLICA = "replica"
+
+
+# Routing intent of the current call stack, set by Transactional
+route_context: ContextVar[Route | None] = ContextVar("route_context", default=None)
+# Key (e.g. the user) whose reads are pinned to the primary after a write
+route_key_context: ContextVar[str | None] = ContextVar(
+    "route_key_context",
+    default=None,
+)
+
+PINNED_INFO_KEY = "pinned_to_primary"
+# Replica the reads of the session go to
+REPLICA_INFO_KEY = "replica"
+
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE("
+    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END",
+)
+
+
+@contextmanager
+def use_route(route: Route) -> Iterator[None]:
+    token = route_context.set(route)
+    try:
+        yield
+    finally:
+        route_context.reset(token)
+
+
+class ReplicaNode:
+    def __init__(self, name: str, engine: AsyncEngine) -> None:
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self.checking = False
+
+    @property
+    def checked_out(self) -> int:
+        pool = self.engine.sync_engine.pool
+        return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+
+class ReplicaRouter:
+    """
+    Chooses a replica for reads and keeps track of the replicas health.
+    Route keys pinned after a write are kept in the memory of the worker:
+    a read served by another worker within the window can still go to a
+    replica. Reads that must see a write of another request have to be
+    routed to the primary, e.g. with Transactional(Propagation.REQUIRED).
+    """
+
+    def __init__(
+        self,
+        replicas: Sequence[AsyncEngine],
+        strategy: ReplicaStrategy = ReplicaStrategy.ROUND_ROBIN,
+        max_lag: float = 5.0,
+        health_check_interval: float = 10.0,
+        read_your_writes_window: float = 5.0,
+    ) -> None:
+        self.nodes = [
+            ReplicaNode(f"replica-{index}", engine)
+            for index, engine in enumerate(replicas)
+        ]
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.health_check_interval = health_check_interval
+        self.read_your_writes_window = read_your_writes_window
+
+        self._counter = itertools.count()
+        self._pinned: TTLCache[str, bool] = TTLCache(
+            maxsize=100_000,
+            ttl=read_your_writes_window,
+        )
+        self._checks: set[asyncio.Task[None]] = set()
+
+    def choose(self) -> ReplicaNode | None:
+        self._schedule_health_checks()
+        healthy = [node for node in self.nodes if node.healthy]
+        if not healthy:
+            return None
+        if self.strategy == ReplicaStrategy.LEAST_CONNECTIONS:
+            return min(healthy, key=lambda node: node.checked_out)
+        return healthy[next(self._counter) % len(healthy)]
+
+    def pin(self, key: str | None) -> None:
+        if key is not None and self.read_your_writes_window > 0:
+            self._pinned.set(key, True)
+
+    def is_pinned(self, key: str | None) -> bool:
+        return key is not None and self._pinned.get(key) is not None
+
+    async def check(self, node: ReplicaNode) -> None:
+        node.checking = True
+        try:
+            async with node.engine.connect() as connection:
+                node.lag = float(
+                    (await connection.execute(REPLICA_LAG_QUERY)).scalar_one()
+                )
+            healthy = node.lag <= self.max_lag
+        except Exception:
+            logger.exception("Health check of %s failed", node.name)
+            healthy = False
+        finally:
+            node.checked_at = time.monotonic()
+            node.checking = False
+
+        if healthy != node.healthy:
+            logger.warning(
+                "%s is %s (lag %.2fs)",
+                node.name,
+                "back in rotation" if healthy else "ejected",
+                node.lag,
+            )
+        node.healthy = healthy
+
+    def _schedule_health_checks(self) -> None:
+        now = time.monotonic()
+        for node in self.nodes:
+            if node.checking or now - node.checked_at < self.health_check_interval:
+                continue
+            try:
+                task = asyncio.get_running_loop().create_task(self.check(node))
+            except RuntimeError:
+                # No running loop, e.g. a sync script
+                return
+            node.checking = True
+            self._checks.add(task)
+            task.add_done_callback(self._checks.discard)
+
+
+class RoutingSession(Session):
+    """
+    Session sending reads to a replica and everything else to the primary.
+    The replica is chosen once per session and kept while it is healthy.
+    Flushes and DML statements always go to the primary and pin the session
+    (and the current route key for the read-your-writes window) to it.
+    """
+
+    router: ReplicaRouter
+
+    def get_bind(
+        self,
+        mapper: Any = None,
+        *,
+        clause: Any = None,
+        **kwargs: Any,
+    ) -> Engine:
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info[PINNED_INFO_KEY] = True
+            self.router.pin(route_key_context.get())
+            return primary  # type: ignore[return-value]
+
+        route = route_context.get()
+        if (
+            route == Route.PRIMARY
+            or self.info.get(PINNED_INFO_KEY)
+            or self.router.is_pinned(route_key_context.get())
+        ):
+            return primary  # type: ignore[return-value]
+
+        is_read = isinstance(clause, Select) and clause._for_update_arg is None  # noqa: SLF001
+        if route == Route.REPLICA or is_read:
+            node = self._replica()
+            if node is not None:
+                return node.engine.sync_engine
+        return primary  # type: ignore[return-value]
+
+    def _replica(self) -> ReplicaNode | None:
+        # One replica per session: the reads of a request share a connection
+        # and a snapshot instead of mixing the states of several replicas
+        node: ReplicaNode | None = self.info.get(REPLICA_INFO_KEY)
+        if node is None or not node.healthy:
+            node = self.info[REPLICA_INFO_KEY] = self.router.choose()
+        return node
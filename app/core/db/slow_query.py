@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import random
+import re
+from collections import deque
+from contextvars import Context, ContextVar
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_OPTIONS = "FORMAT JSON"
+# Executes the statement a second time
+ANALYZE_OPTIONS = "ANALYZE, BUFFERS, FORMAT JSON"
+PERCENTILES = (50, 95, 99)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|:\w+\b|\?")
+_CAST = re.compile(r"::\w+(?:\[\])?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_FOR_UPDATE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE)\b", re.IGNORECASE)
+
+# Set while a sampled EXPLAIN runs, so it isn't recorded itself
+_explaining: ContextVar[bool] = ContextVar("explaining", default=False)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a statement, literals and bind parameters are replaced by ?
+    and IN/VALUES lists are collapsed, e.g.
+        SELECT * FROM users WHERE id IN ($1::INTEGER, $2::INTEGER) LIMIT 15
+        -> SELECT * FROM users WHERE id IN (...) LIMIT ?
+    :param statement: SQL sent to the driver
+    :return: Fingerprint of the statement
+    """
+    normalized = _STRING.sub("?", statement)
+    normalized = _CAST.sub("", normalized)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    normalized = _VALUES_LIST.sub(r"\1, ...", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class FingerprintStats:
+    __slots__ = ("calls", "durations", "fingerprint", "max", "plan", "slow", "total")
+
+    def __init__(self, fingerprint: str, window: int) -> None:
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.slow = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Rolling window for the percentiles
+        self.durations: deque[float] = deque(maxlen=window)
+        self.plan: Any = None
+
+    def record(self, duration: float, is_slow: bool) -> None:
+        self.calls += 1
+        self.slow += is_slow
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.durations.append(duration)
+
+    def percentiles(self) -> dict[str, float]:
+        durations = sorted(self.durations)
+        return {
+            f"p{percentile}_ms": round(
+                durations[min(len(durations) * percentile // 100, len(durations) - 1)]
+                * 1000,
+                3,
+            )
+            for percentile in PERCENTILES
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "calls": self.calls,
+            "slow_calls": self.slow,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.calls * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            **self.percentiles(),
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    """
+    In-memory per-fingerprint latency statistics of the worker.
+    Statements over the threshold are logged and, for the sampled part of them,
+    the EXPLAIN plan is captured on a separate connection. With explain_analyze
+    it is EXPLAIN (ANALYZE, BUFFERS), run in a read-only transaction that is
+    rolled back, so functions called by the statement can't write.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = 200.0,
+        explain_sample_rate: float = 0.0,
+        explain_analyze: bool = False,
+        window: int = 1000,
+        max_fingerprints: int = 1000,
+    ) -> None:
+        self.threshold = threshold_ms / 1000
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_options = ANALYZE_OPTIONS if explain_analyze else EXPLAIN_OPTIONS
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+
+        self._stats: dict[str, FingerprintStats] = {}
+        self._explains: set[asyncio.Task[None]] = set()
+
+    def record(
+        self,
+        engine: AsyncEngine,
+        statement: str,
+        parameters: Any,
+        duration: float,
+        executemany: bool = False,
+    ) -> None:
+        if _explaining.get():
+            return
+
+        key = fingerprint(statement)
+        stats = self._stats.get(key)
+        if stats is None:
+            if len(self._stats) >= self.max_fingerprints:
+                self._evict()
+            stats = self._stats[key] = FingerprintStats(key, self.window)
+
+        is_slow = duration >= self.threshold
+        stats.record(duration, is_slow)
+        if not is_slow:
+            return
+
+        logger.warning("Slow query (%.1f ms): %s", duration * 1000, key)
+        if (
+            not executemany
+            and engine.dialect.name == "postgresql"
+            and self._is_select(statement)
+            and random.random() < self.explain_sample_rate  # noqa: S311
+        ):
+            self._schedule_explain(engine, stats, statement, parameters)
+
+    def top(self, limit: int = 20) -> list[dict[str, Any]]:
+        """Fingerprints with the highest total time"""
+        stats = sorted(self._stats.values(), key=lambda item: item.total, reverse=True)
+        return [item.to_dict() for item in stats[:limit]]
+
+    def reset(self) -> None:
+        self._stats.clear()
+
+    def _evict(self) -> None:
+        cheapest = min(self._stats.values(), key=lambda item: item.total)
+        del self._stats[cheapest.fingerprint]
+
+    @staticmethod
+    def _is_select(statement: str) -> bool:
+        # EXPLAIN ANALYZE executes the statement, never replay writes or locks
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        return is_select and _FOR_UPDATE.search(statement) is None
+
+    def _schedule_explain(
+        self,
+        engine: AsyncEngine,
+        stats: FingerprintStats,
+        statement: str,
+        parameters: Any,
+    ) -> None:
+        try:
+            # Empty context, the EXPLAIN isn't counted to the current request
+            task = asyncio.get_running_loop().create_task(
+                self._explain(engine, stats, statement, parameters),
+                context=Context(),
+            )
+        except RuntimeError:
+            return
+        self._explains.add(task)
+        task.add_done_callback(self._explains.discard)
+
+    async def _explain(
+        self,
+        engine: AsyncEngine,
+        stats: FingerprintStats,
+        statement: str,
+        parameters: Any,
+    ) -> None:
+        _explaining.set(True)
+        try:
+            async with engine.connect() as connection:
+                await connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN ({self.explain_options}) {statement}",
+                    parameters,
+                )
+                stats.plan = result.scalar()
+                await connection.rollback()
+        except Exception:
+            logger.exception("EXPLAIN of %s failed", stats.fingerprint)
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.monitoring.slow_query_threshold_ms,
+    explain_sample_rate=settings.monitoring.slow_query_explain_sample_rate,
+    explain_analyze=settings.monitoring.slow_query_explain_analyze,
+    window=settings.monitoring.slow_query_window,
+    max_fingerprints=settings.monitoring.slow_query_max_fingerprints,
+)
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, registry
+
+StatementType = TypeVar("StatementType")
+
+STATEMENT_CACHE = registry.register(
+    Counter(
+        "db_statement_cache",
+        "Lookups of repository statement templates and compiled statements",
+        ("cache", "result"),
+    ),
+)
+
+_COMPILED_RESULTS = {
+    CacheStats.CACHE_HIT: "hit",
+    CacheStats.CACHE_MISS: "miss",
+}
+
+
+@dataclass(slots=True)
+class HitRate:
+    hits: int = 0
+    misses: int = 0
+
+    def record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    @property
+    def ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class StatementCache:
+    """
+    Statements of the repositories by their shape: the model, the filtered
+    columns, the load options, the ordering. Values are bound parameters
+    passed on execution, so a cached statement is reused as is: SQLAlchemy
+    doesn't build the construct nor its cache key again (the key is memoized
+    on the statement) and finds the SQL in the compiled cache of the engine.
+    """
+
+    def __init__(self, maxsize: int = 1000) -> None:
+        self.maxsize = maxsize
+        self.stats = HitRate()
+        self._statements: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def get(
+        self,
+        key: Hashable,
+        build: Callable[[], StatementType],
+    ) -> StatementType:
+        """
+        Cached statement of the shape, built on the first call
+        :param key: shape of the statement, must not include the values
+        :param build: builds the statement with bindparam() for the values
+        :return: Statement
+        """
+        statement = self._statements.get(key)
+        if statement is not None:
+            self._statements.move_to_end(key)
+            self.stats.record(hit=True)
+            STATEMENT_CACHE.inc(cache="template", result="hit")
+            return statement  # type: ignore[no-any-return]
+
+        self.stats.record(hit=False)
+        STATEMENT_CACHE.inc(cache="template", result="miss")
+        statement = build()
+        self._statements[key] = statement
+        if len(self._statements) > self.maxsize:
+            self._statements.popitem(last=False)
+        return statement
+
+    def clear(self) -> None:
+        self._statements.clear()
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+
+statement_cache = StatementCache(maxsize=settings.db.statement_cache_size)
+
+# Engine name -> engine and hits of its compiled cache
+_compiled: dict[str, tuple[AsyncEngine, HitRate]] = {}
+
+
+def _hit_ratios() -> Iterable[tuple[tuple[str, ...], float]]:
+    yield ("template",), statement_cache.stats.ratio
+    for name, (_, stats) in _compiled.items():
+        yield (f"compiled-{name}",), stats.ratio
+
+
+registry.register(
+    Gauge(
+        "db_statement_cache_hit_ratio",
+        "Hit ratio of the statement template and compiled caches",
+        ("cache",),
+        _hit_ratios,
+    ),
+)
+
+
+def instrument_compiled_cache(engine: AsyncEngine, name: str) -> None:
+    """
+    Count hits of the SQLAlchemy compiled cache of the engine
+    :param engine: engine to instrument
+    :param name: pool label, e.g. primary or replica-0
+    """
+    stats = HitRate()
+    _compiled[name] = (engine, stats)
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(
+        _: Any,
+        __: Any,
+        ___: str,
+        ____: Any,
+        context: Any,
+        _____: bool,
+    ) -> None:
+        if context is None or context.compiled is None:
+            return
+        # Constructs without a cache key or with caching disabled aren't looked up
+        result = _COMPILED_RESULTS.get(context.cache_hit)
+        if result is None:
+            return
+        stats.record(hit=result == "hit")
+        STATEMENT_CACHE.inc(cache="compiled", result=result)
+
+
+def statement_cache_stats() -> dict[str, dict[str, float]]:
+    """Hits, misses and sizes of the statement template and compiled caches"""
+    stats = {
+        "template": {
+            "hits": statement_cache.stats.hits,
+            "misses": statement_cache.stats.misses,
+            "hit_ratio": statement_cache.stats.ratio,
+            "size": len(statement_cache),
+        },
+    }
+    for name, (engine, hits) in _compiled.items():
+        compiled_cache = engine.sync_engine._compiled_cache  # noqa: SLF001
+        stats[f"compiled-{name}"] = {
+            "hits": hits.hits,
+            "misses": hits.misses,
+            "hit_ratio": hits.ratio,
+            "size": len(compiled_cache) if compiled_cache is not None else 0,
+        }
+    return stats
@@ -1,52 +1,147 @@
-from enum import Enum
+import asyncio
+import logging
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import Enum, StrEnum
 from functools import wraps
+from itertools import count
 from typing import Any, Callable, Coroutine, ParamSpec, TypeVar
 
+from sqlalchemy import Connection, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.core.config import settings
 from app.core.db import db_helper
+from app.core.db.routing import Route, route_context, use_route
+from app.core.metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
 
 
 class Propagation(Enum):
     REQUIRED = "required"
-    REQUIRED_NEW = "required_new"
+    NESTED = "nested"
+    REQUIRES_NEW = "requires_new"
+    READ_ONLY = "read_only"
+    # Former name of REQUIRES_NEW
+    REQUIRED_NEW = "requires_new"  # noqa: PIE796
+
+
+class IsolationLevel(StrEnum):
+    READ_COMMITTED = "READ COMMITTED"
+    REPEATABLE_READ = "REPEATABLE READ"
+    SERIALIZABLE = "SERIALIZABLE"
+
+
+# serialization_failure, deadlock_detected
+RETRYABLE_SQLSTATES = frozenset(("40001", "40P01"))
+
+TRANSACTION_RETRIES = registry.register(
+    Counter(
+        "db_transaction_retries",
+        "Transactions re-run after a serialization failure or deadlock",
+        ("operation", "sqlstate"),
+    ),
+)
+TRANSACTION_RETRIES_EXHAUSTED = registry.register(
+    Counter(
+        "db_transaction_retries_exhausted",
+        "Transactions that failed after the last attempt or the deadline",
+        ("operation", "sqlstate"),
+    ),
+)
+
+
+@dataclass(slots=True, frozen=True)
+class RetryPolicy:
+    max_attempts: int = settings.db.retry_max_attempts
+    base_delay: float = settings.db.retry_base_delay
+    max_delay: float = settings.db.retry_max_delay
+    # Seconds all the attempts and delays may take
+    deadline: float = settings.db.retry_deadline
+
+    def delay(self, attempt: int) -> float:
+        """Full jitter exponential backoff, spreads out the conflicting retries"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))  # noqa: S311
 
 
 P = ParamSpec("P")
 R = TypeVar("R")
 
+# Propagation of the outermost transaction of the current session
+transaction_context: ContextVar[Propagation | None] = ContextVar(
+    "transaction_context",
+    default=None,
+)
+
+# SET TRANSACTION characteristics of the read-only transaction opened by
+# READ_ONLY, applied to every connection it uses (primary and replica)
+READ_ONLY_INFO_KEY = "read_only_transaction"
+
+# Scoped session ids of REQUIRES_NEW, negative - never used by requests
+_session_ids = count(-1, -1)
+
 
 class Transactional:
-    def __init__(self, propagation: Propagation = Propagation.REQUIRED) -> None:
+    """
+    Runs a service method in a transaction of the scoped session.
+    REQUIRED - joins the current transaction, the outermost call commits
+        (or rolls back on an exception) once for all of them.
+    NESTED - a SAVEPOINT inside the current transaction, an exception rolls
+        back only the changes of the method. REQUIRED without a transaction.
+    REQUIRES_NEW - an independent transaction on its own session and pooled
+        connection, committed when the method returns.
+    READ_ONLY - SET TRANSACTION READ ONLY on every connection of the
+        transaction, reads go to a replica. The outermost call ends the
+        transaction on return (nothing to write) or rolls it back on an
+        exception. Joins the current transaction if there is one: inside
+        a writable transaction it neither sets READ ONLY nor moves to the
+        replica (a warning is logged), its reads see the pending writes.
+
+    With an isolation level or a retry policy the transaction that doesn't
+    join another one runs on a fresh session, as REQUIRES_NEW. With a retry
+    policy it is re-run on a new session after a serialization failure or
+    a deadlock, so the method must not depend on objects loaded outside of
+    it (pass ids) and its side effects must be safe to repeat, e.g.
+        @Transactional(isolation_level=IsolationLevel.SERIALIZABLE,
+                       retry=RetryPolicy())
+    """
+
+    def __init__(
+        self,
+        propagation: Propagation = Propagation.REQUIRED,
+        isolation_level: IsolationLevel | None = None,
+        retry: RetryPolicy | None = None,
+    ) -> None:
         self.propagation = propagation
+        self.isolation_level = isolation_level
+        self.retry = retry
 
     def __call__(
         self, function: Callable[P, Coroutine[Any, Any, R]]
     ) -> Callable[P, Coroutine[Any, Any, R]]:
         @wraps(function)
         async def decorator(*args: P.args, **kwargs: P.kwargs) -> R:
-            try:
-                if self.propagation == Propagation.REQUIRED:
-                    result = await self._run_required(
-                        function=function,
-                        args=args,
-                        kwargs=kwargs,
-                    )
-                elif self.propagation == Propagation.REQUIRED_NEW:
-                    result = await self._run_required_new(
-                        function=function,
-                        args=args,
-                        kwargs=kwargs,
-                    )
-                else:
-                    result = await self._run_required(
-                        function=function,
-                        args=args,
-                        kwargs=kwargs,
-                    )
-            except Exception as e:
-                await db_helper.session.rollback()
-                raise e
-
-            return result
+            if self.propagation == Propagation.REQUIRES_NEW:
+                return await self._run_retrying(function, args, kwargs)
+            if transaction_context.get() is not None:
+                if self.propagation == Propagation.NESTED:
+                    return await self._run_nested(function, args, kwargs)
+                # REQUIRED and READ_ONLY join the current transaction
+                if (
+                    self.propagation == Propagation.READ_ONLY
+                    and transaction_context.get() != Propagation.READ_ONLY
+                ):
+                    _warn_writable(function)
+                return await function(*args, **kwargs)
+            if self.propagation == Propagation.READ_ONLY:
+                return await self._run_read_only(function, args, kwargs)
+            if self.isolation_level is not None or self.retry is not None:
+                return await self._run_retrying(function, args, kwargs)
+            return await self._run_required(function, args, kwargs)
 
         return decorator
 
@@ -56,17 +151,141 @@ class Transactional:
         args: P.args,
         kwargs: P.kwargs,
     ) -> R:
-        result = await function(*args, **kwargs)
-        await db_helper.session.commit()
+        session = db_helper.session
+        token = transaction_context.set(self.propagation)
+        try:
+            with use_route(Route.PRIMARY):
+                if self.isolation_level is not None:
+                    # The session is fresh, the level applies to its transaction
+                    await session.connection(
+                        execution_options={
+                            "isolation_level": self.isolation_level.value,  # type: ignore[typeddict-item]
+                        },
+                    )
+                result = await function(*args, **kwargs)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            transaction_context.reset(token)
         return result
 
-    async def _run_required_new(
+    async def _run_nested(
+        self,
+        function: Callable[P, Coroutine[Any, Any, R]],
+        args: P.args,
+        kwargs: P.kwargs,
+    ) -> R:
+        # Released on return, rolled back to on an exception
+        async with db_helper.session.begin_nested():
+            with use_route(Route.PRIMARY):
+                return await function(*args, **kwargs)
+
+    async def _run_requires_new(
         self,
         function: Callable[P, Coroutine[Any, Any, R]],
         args: P.args,
         kwargs: P.kwargs,
     ) -> R:
-        db_helper.session.begin()
-        result = await function(*args, **kwargs)
-        await db_helper.session.commit()
+        # Repositories use the scoped session, a new scope gives them a new one
+        context = db_helper.set_session_context(next(_session_ids))
+        token = transaction_context.set(None)
+        try:
+            return await self._run_required(function, args, kwargs)
+        finally:
+            await db_helper.remove_session()
+            transaction_context.reset(token)
+            db_helper.reset_session_context(context)
+
+    async def _run_retrying(
+        self,
+        function: Callable[P, Coroutine[Any, Any, R]],
+        args: P.args,
+        kwargs: P.kwargs,
+    ) -> R:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self._run_requires_new(function, args, kwargs)
+            except DBAPIError as e:
+                sqlstate = _sqlstate(e)
+                if self.retry is None or sqlstate not in RETRYABLE_SQLSTATES:
+                    raise
+                operation = function.__qualname__
+                delay = self.retry.delay(attempt)
+                if (
+                    attempt >= self.retry.max_attempts
+                    or time.monotonic() - started + delay > self.retry.deadline
+                ):
+                    TRANSACTION_RETRIES_EXHAUSTED.inc(
+                        operation=operation,
+                        sqlstate=sqlstate,
+                    )
+                    raise
+                TRANSACTION_RETRIES.inc(operation=operation, sqlstate=sqlstate)
+            await asyncio.sleep(delay)
+
+    async def _run_read_only(
+        self,
+        function: Callable[P, Coroutine[Any, Any, R]],
+        args: P.args,
+        kwargs: P.kwargs,
+    ) -> R:
+        session = db_helper.session
+        if db_helper.in_transaction():
+            # Opened by a read outside of a Transactional method, not ours to end
+            _warn_writable(function)
+            token = transaction_context.set(self.propagation)
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                transaction_context.reset(token)
+
+        isolation = (
+            f"ISOLATION LEVEL {self.isolation_level} "
+            if self.isolation_level is not None
+            else ""
+        )
+        session.info[READ_ONLY_INFO_KEY] = f"{isolation}READ ONLY"
+        token = transaction_context.set(self.propagation)
+        try:
+            with use_route(route_context.get() or Route.REPLICA):
+                result = await function(*args, **kwargs)
+            # Nothing to write, releases the connection
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            transaction_context.reset(token)
+            session.info.pop(READ_ONLY_INFO_KEY, None)
         return result
+
+
+@event.listens_for(Session, "after_begin")
+def _set_read_only(
+    session: Session,
+    _: SessionTransaction,
+    connection: Connection,
+) -> None:
+    # Only the first statement of a transaction can set it
+    if characteristics := session.info.get(READ_ONLY_INFO_KEY):
+        connection.exec_driver_sql(f"SET TRANSACTION {characteristics}")
+
+
+def _warn_writable(function: Callable[..., Any]) -> None:
+    logger.warning(
+        "READ_ONLY %s joined a writable transaction, runs on it as is",
+        function.__qualname__,
+    )
+
+
+def _sqlstate(error: DBAPIError) -> str | None:
+    # The driver error, or the asyncpg exception it wraps
+    for candidate in (error.orig, getattr(error.orig, "__cause__", None)):
+        if sqlstate := getattr(candidate, "sqlstate", None):
+            return str(sqlstate)
+    return None
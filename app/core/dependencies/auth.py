@@ -1,22 +1,29 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.db import db_helper
+from app.core.dependencies.logging import Logging
 from app.core.exceptions.auth import CredentialsException
+from app.core.exceptions.token import TokenRevokedException, WrongTokenScopeException
 from app.core.security.jwt import JWTHelper
+from app.core.security.password import HashHelper
 from app.models import User
+from app.schemas.user import Principal
+from app.services.token import token_service
 from app.services.user import user_service
 
 
 class AuthService:
-    hasher = CryptContext(schemes=["bcrypt"])
+    hasher = HashHelper.hasher
     secret = settings.auth.secret_key
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
     @classmethod
     async def get_current_active_user(cls, token: str = Depends(oauth2_scheme)) -> User:
-        token_data = JWTHelper.decode(token)
+        token_data = await cls.verify_access_token(token)
+        # Pin the user's reads to the primary for a while after a write
+        db_helper.set_route_key(token_data["sub"])
         user = await cls._get_user(token_data["sub"])
         if user is None:
             raise CredentialsException
@@ -24,11 +31,42 @@ class AuthService:
         if user.is_deleted:
             raise HTTPException(status_code=400, detail="User is Deleted")
 
+        Logging.set_user(user.id)
         return user
 
+    @classmethod
+    async def get_current_principal(
+        cls,
+        token: str = Depends(oauth2_scheme),
+    ) -> Principal:
+        """Authenticated user as a plain row, for routes that don't need the User"""
+        token_data = await cls.verify_access_token(token)
+        db_helper.set_route_key(token_data["sub"])
+        principal = await user_service.get_principal_row(token_data["sub"])
+
+        if principal.is_deleted:
+            raise HTTPException(status_code=400, detail="User is Deleted")
+
+        Logging.set_user(principal.id)
+        return principal
+
+    @classmethod
+    async def verify_access_token(cls, token: str) -> dict[str, str]:
+        """
+        Decode a bearer token, refresh tokens and revoked tokens are rejected
+        :param token: encoded token
+        :return: Token claims
+        """
+        token_data = JWTHelper.decode(token)
+        if token_data.get("scope") != "access":
+            raise WrongTokenScopeException
+        if await token_service.is_revoked(token_service.token_id(token, token_data)):
+            raise TokenRevokedException
+        return token_data
+
     @classmethod
     async def _get_user(cls, email: str) -> User:
-        user: User = await user_service.get(email=email)
+        user: User = await user_service.get_principal(email)
 
         if user is None:
             raise CredentialsException
@@ -0,0 +1,19 @@
+import hmac
+
+from fastapi import Header
+
+from app.core.config import settings
+from app.core.exceptions.auth import InternalAccessDeniedException
+
+
+class InternalAccess:
+    def __init__(self, x_internal_token: str | None = Header(default=None)) -> None:
+        token = settings.monitoring.internal_token
+        if not token:
+            if not settings.debug:
+                raise InternalAccessDeniedException
+        elif x_internal_token is None or not hmac.compare_digest(
+            x_internal_token,
+            token,
+        ):
+            raise InternalAccessDeniedException
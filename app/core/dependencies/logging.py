@@ -1,9 +1,31 @@
-from fastapi import BackgroundTasks
+from typing import Any
+
+from app.core.access_log import AccessRecord, access_record_context
 
 
 class Logging:
-    def __init__(self, background_task: BackgroundTasks) -> None:
-        background_task.add_task(self._send_log)
+    """
+    Access and audit log of the request, e.g.
+        async def delete_user(..., log: Logging = Depends()):
+            log.audit("user.delete", user_id=pk)
+    The record itself is written by AccessLogMiddleware after the response.
+    """
+
+    def __init__(self) -> None:
+        self.record: AccessRecord | None = access_record_context.get()
+
+    def audit(self, action: str, **details: Any) -> None:
+        """
+        Mark the request as an audit event
+        :param action: event name, e.g. user.delete
+        :param details: JSON serializable event details
+        """
+        if self.record is not None:
+            self.record.action = action
+            self.record.details = details or None
 
-    async def _send_log(self) -> None:
-        pass
+    @staticmethod
+    def set_user(user_id: int) -> None:
+        record = access_record_context.get()
+        if record is not None:
+            record.user_id = user_id
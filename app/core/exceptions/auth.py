@@ -55,3 +55,16 @@ class WrongTimezoneException(CustomException):
     code = status.HTTP_400_BAD_REQUEST
     error_code = status.HTTP_400_BAD_REQUEST
     message = "Wrong timezone"
+
+
+class InternalAccessDeniedException(CustomException):
+    code = status.HTTP_403_FORBIDDEN
+    error_code = status.HTTP_403_FORBIDDEN
+    message = "Internal endpoints are not available"
+
+
+class PasswordHashingBusyException(CustomException):
+    code = status.HTTP_503_SERVICE_UNAVAILABLE
+    error_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    message_code = "password_hashing_busy"
+    message = "Too many sign in attempts at the moment, try again later"
@@ -0,0 +1,10 @@
+from fastapi import status
+
+from app.core.exceptions.base import CustomException
+
+
+class InvalidCursorException(CustomException):
+    code = status.HTTP_400_BAD_REQUEST
+    error_code = status.HTTP_400_BAD_REQUEST
+    message_code = "invalid_cursor"
+    message = "Pagination cursor is not valid"
@@ -19,3 +19,10 @@ class WrongTokenScopeException(CustomException):
     code = status.HTTP_400_BAD_REQUEST
     error_code = status.HTTP_400_BAD_REQUEST
     message = "Token scope is not correct"
+
+
+class TokenRevokedException(CustomException):
+    code = status.HTTP_401_UNAUTHORIZED
+    error_code = status.HTTP_401_UNAUTHORIZED
+    message_code = "token_revoked"
+    message = "Token has been revoked"
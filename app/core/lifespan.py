@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app.core.access_log import access_log
+from app.core.config import settings
+from app.core.db import db_helper
+from app.core.security.password import HashHelper
+from app.core.utils.background import wait_scheduled
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """
+    Startup: open pooled connections and start the access log flusher.
+    Shutdown runs once uvicorn stopped accepting connections and finished
+    the running requests (its --timeout-graceful-shutdown): wait for the
+    last log flush up to RUN__SHUTDOWN_TIMEOUT, then close every connection.
+    """
+    try:
+        await asyncio.wait_for(
+            db_helper.warm_up(
+                settings.db.warm_up_connections,
+                settings.db.warm_up_statements,
+            ),
+            settings.db.warm_up_timeout,
+        )
+    except Exception:
+        # Not fatal, connections are opened on demand
+        logger.exception("Database warm-up failed")
+    access_log.start()
+
+    yield
+
+    deadline = time.monotonic() + settings.run.shutdown_timeout
+    try:
+        await asyncio.wait_for(
+            access_log.close(),
+            max(deadline - time.monotonic(), 0),
+        )
+    except TimeoutError:
+        logger.warning("Access log flush didn't finish before shutdown")
+    try:
+        # Shared cache invalidations of the last requests
+        await asyncio.wait_for(wait_scheduled(), max(deadline - time.monotonic(), 0))
+    except TimeoutError:
+        logger.warning("Scheduled tasks didn't finish before shutdown")
+    HashHelper.executor.shutdown()
+    await db_helper.dispose()
@@ -0,0 +1,8 @@
+__all__ = (
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "registry",
+)
+
+from .registry import Counter, Gauge, Histogram, registry
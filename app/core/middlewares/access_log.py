@@ -0,0 +1,43 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.access_log import AccessRecord, access_log, access_record_context
+from app.core.db.query_counter import query_stats_context
+
+
+class AccessLogMiddleware:
+    """
+    Pushes an access record of every request to the access log pipeline.
+    Must run inside SQLAlchemyMiddleware to see the query statistics.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not access_log.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        record = AccessRecord(method=scope["method"], path=scope["path"])
+        token = access_record_context.set(record)
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                record.status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            record.duration_ms = (time.perf_counter() - start) * 1000
+            # The router stores the matched route in the scope
+            if (route := scope.get("route")) is not None:
+                record.path = route.path
+            if (stats := query_stats_context.get()) is not None:
+                record.queries = stats.count
+                record.db_ms = stats.duration * 1000
+            access_record_context.reset(token)
+            access_log.push(record)
@@ -1,8 +1,17 @@
-from uuid import uuid4
+from itertools import count
 
-from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.config import settings
 from app.core.db import db_helper
+from app.core.db.query_counter import (
+    QueryStats,
+    query_stats_context,
+    report_query_stats,
+)
+
+# Cheap unique scope keys for the scoped session, no uuid4 per request
+session_ids = count()
 
 
 class SQLAlchemyMiddleware:
@@ -10,13 +19,31 @@ class SQLAlchemyMiddleware:
         self.app = app
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
-        session_id = str(uuid4())
-        context = db_helper.set_session_context(session_id=session_id)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        stats_token = query_stats_context.set(stats)
 
+        async def send_with_timing(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and settings.monitoring.server_timing
+            ):
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", stats.server_timing()),
+                ]
+            await send(message)
+
+        # The session itself is created on first use by a repository,
+        # requests that never touch the database don't create or close one
+        context = db_helper.set_session_context(session_id=next(session_ids))
         try:
-            await self.app(scope, receive, send)
-        except Exception as e:
-            raise e
+            await self.app(scope, receive, send_with_timing)
         finally:
-            await db_helper.session.remove()
+            await db_helper.remove_session()
             db_helper.reset_session_context(context=context)
+            query_stats_context.reset(stats_token)
+            report_query_stats(stats, scope["method"], scope["path"])
@@ -1,3 +1,11 @@
-__all__ = ("ExceptionResponses",)
+__all__ = (
+    "CachedRoute",
+    "ExceptionResponses",
+    "ExportFormat",
+    "cache_response",
+    "stream_response",
+)
 
 from .base import ExceptionResponses
+from .cache import CachedRoute, cache_response
+from .stream import ExportFormat, stream_response
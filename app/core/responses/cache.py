@@ -0,0 +1,152 @@
+from collections.abc import Callable, Coroutine, Iterable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+from app.core.cache import CachedResponse, ResponseCache, response_cache
+from app.core.dependencies.auth import AuthService
+from app.core.exceptions.base import CustomException
+from app.core.metrics import Counter, registry
+
+EndpointType = TypeVar("EndpointType", bound=Callable[..., Any])
+Handler = Callable[[Request], Coroutine[Any, Any, Response]]
+
+CACHE_POLICY = "__response_cache__"
+
+RESPONSES_NOT_MODIFIED = registry.register(
+    Counter(
+        "http_responses_not_modified",
+        "Conditional requests answered with 304 by the response cache",
+    ),
+)
+
+
+@dataclass(slots=True, frozen=True)
+class CachePolicy:
+    ttl: float
+    tags: tuple[str, ...]
+    per_principal: bool
+
+
+def cache_response(
+    ttl: float = 60.0,
+    tags: Iterable[str] = (),
+    per_principal: bool = False,
+) -> Callable[[EndpointType], EndpointType]:
+    """
+    Cache the serialized response of a GET endpoint, the router must use
+    CachedRoute, e.g.
+        router = APIRouter(route_class=CachedRoute)
+
+        @router.get("/me/", response_model=UserSchema)
+        @cache_response(ttl=30, tags=[User.__tablename__], per_principal=True)
+        async def me(...): ...
+    A hit skips the dependencies and the endpoint, so routes with
+    authorization checks must be per_principal: the bearer token is then
+    authenticated before the cache is read (AuthService.get_current_principal:
+    access scope, revocation, deleted user), the key includes the user and
+    requests failing the checks aren't cached.
+    :param ttl: entry time to live in seconds
+    :param tags: invalidated by writes of BaseService, usually table names
+    :param per_principal: cache per authenticated user
+    """
+    policy = CachePolicy(ttl=ttl, tags=tuple(tags), per_principal=per_principal)
+
+    def decorator(endpoint: EndpointType) -> EndpointType:
+        setattr(endpoint, CACHE_POLICY, policy)
+        return endpoint
+
+    return decorator
+
+
+class CachedRoute(APIRoute):
+    """Route serving the endpoints marked with cache_response from the cache"""
+
+    cache: ResponseCache = response_cache
+
+    def get_route_handler(self) -> Handler:
+        handler = super().get_route_handler()
+        policy: CachePolicy | None = getattr(self.endpoint, CACHE_POLICY, None)
+        if policy is None or "GET" not in (self.methods or ()):
+            return handler
+
+        async def cached_handler(request: Request) -> Response:
+            return await self._serve(request, handler, policy)
+
+        return cached_handler
+
+    async def _serve(
+        self,
+        request: Request,
+        handler: Handler,
+        policy: CachePolicy,
+    ) -> Response:
+        principal = None
+        if policy.per_principal:
+            principal = await _principal(request)
+            if principal is None:
+                # Let the dependencies reject the request
+                return await handler(request)
+
+        # Tag versions are read before the endpoint, a write committed while
+        # it runs stores the entry under the old version where nobody finds it
+        key = await self.cache.key(
+            request.url.path,
+            "&".join(sorted(request.url.query.split("&"))),
+            principal,
+            policy.tags,
+        )
+        cached = await self.cache.get(key, policy.ttl)
+        if cached is not None:
+            response = Response(content=cached.body, media_type=cached.media_type)
+        else:
+            response = await handler(request)
+            if response.status_code != 200 or not hasattr(response, "body"):
+                return response
+            cached = CachedResponse.build(
+                bytes(response.body),
+                response.headers.get("content-type", "application/json"),
+            )
+            await self.cache.set(key, cached, policy.ttl)
+
+        headers = {
+            "etag": cached.etag,
+            # Clients revalidate every time, an invalidation is seen at once
+            "cache-control": "private, no-cache"
+            if policy.per_principal
+            else "public, no-cache",
+        }
+        if _matches(request.headers.get("if-none-match"), cached.etag):
+            RESPONSES_NOT_MODIFIED.inc()
+            return Response(
+                status_code=304,
+                headers=headers,
+                background=response.background,
+            )
+        response.headers.update(headers)
+        return response
+
+
+async def _principal(request: Request) -> str | None:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        principal = await AuthService.get_current_principal(token)
+    except (CustomException, HTTPException):
+        return None
+    return principal.email
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
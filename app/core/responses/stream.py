@@ -0,0 +1,98 @@
+import csv
+import io
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from enum import StrEnum
+from typing import Any
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+async def _ndjson_chunks(
+    rows: AsyncIterable[Any],
+    fields: Sequence[str],
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    chunk: list[bytes] = []
+    async for row in rows:
+        chunk.append(
+            orjson.dumps(
+                {field: getattr(row, field) for field in fields},
+                option=orjson.OPT_APPEND_NEWLINE,
+            ),
+        )
+        if len(chunk) >= chunk_size:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def _csv_chunks(
+    rows: AsyncIterable[Any],
+    fields: Sequence[str],
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    # Send the header right away, the first rows may take a while
+    yield buffer.getvalue().encode()
+
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    async for row in rows:
+        writer.writerow([getattr(row, field) for field in fields])
+        count += 1
+        if count >= chunk_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield buffer.getvalue().encode()
+
+
+def stream_response(
+    rows: AsyncIterable[Any],
+    fields: Sequence[str],
+    export_format: ExportFormat = ExportFormat.NDJSON,
+    chunk_size: int = 500,
+    filename: str | None = None,
+) -> StreamingResponse:
+    """
+    Stream rows as NDJSON or CSV, chunk_size rows per chunk
+    :param rows: async iterable of objects, e.g. BaseRepository.stream()
+    :param fields: attributes to export, in order
+    :param export_format: NDJSON or CSV
+    :param chunk_size: rows per chunk
+    :param filename: attachment filename, inline if not set
+    :return: Streaming response
+    """
+    chunks = (
+        _csv_chunks(rows, fields, chunk_size)
+        if export_format == ExportFormat.CSV
+        else _ndjson_chunks(rows, fields, chunk_size)
+    )
+    headers = (
+        {"Content-Disposition": f'attachment; filename="{filename}"'}
+        if filename
+        else None
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers,
+    )
@@ -1,13 +1,24 @@
-from datetime import UTC, datetime, timedelta
+import hashlib
+import time
+import uuid
 
 import jwt
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.exceptions.token import TokenExpiredException, TokenNotValidException
+from app.core.security.keyring import JWTKey, KeyRing
 from app.schemas.token import TokenPayloadEncode
 
 
 class JWTHelper:
+    # Keys are prepared once, verification picks them by the kid header
+    keyring = KeyRing.from_config(settings.auth)
+    # Claims of verified tokens by token digest, each kept until the token exp
+    verified: TTLCache[bytes, dict[str, str]] = TTLCache(
+        maxsize=settings.auth.token_cache_size,
+    )
+
     @staticmethod
     def access_token(email: str, exp: int | None = None) -> str:
         """
@@ -16,12 +27,10 @@ class JWTHelper:
         :param exp: token exp time, default value in env
         :return: Access token
         """
-        return JWTHelper.encode(
-            TokenPayloadEncode(
-                sub=email,
-                scope="access",
-                exp=exp if exp else settings.auth.access_token_time,
-            ),
+        return JWTHelper.encode_claims(
+            sub=email,
+            scope="access",
+            exp=exp if exp else settings.auth.access_token_time,
         )
 
     @staticmethod
@@ -32,36 +41,78 @@ class JWTHelper:
         :param exp: token exp time, default value in env
         :return: Refresh token
         """
-        return JWTHelper.encode(
-            TokenPayloadEncode(
-                sub=email,
-                scope="refresh",
-                exp=exp if exp else settings.auth.refresh_token_time,
-            ),
+        return JWTHelper.encode_claims(
+            sub=email,
+            scope="refresh",
+            exp=exp if exp else settings.auth.refresh_token_time,
+            jti=uuid.uuid4().hex,
         )
 
     @staticmethod
     def encode(payload: TokenPayloadEncode) -> str:
+        return JWTHelper.encode_claims(payload.sub, payload.scope, payload.exp)
+
+    @staticmethod
+    def encode_claims(sub: str, scope: str, exp: int, jti: str | None = None) -> str:
+        """
+        Encode a token without the pydantic payload round trip
+        :param sub: token subject (user email)
+        :param scope: token scope, access or refresh
+        :param exp: token exp time in seconds
+        :param jti: token id, used to revoke refresh tokens
+        :return: Token
+        """
+        now = int(time.time())
+        payload = {"sub": sub, "scope": scope, "exp": now + exp, "iat": now}
+        if jti is not None:
+            payload["jti"] = jti
+        signing = JWTHelper.keyring.signing
         return jwt.encode(
-            payload={
-                **payload.model_dump(exclude={"exp"}),
-                "exp": datetime.now(UTC) + timedelta(seconds=payload.exp),
-                "iat": datetime.now(UTC),
-            },
-            key=settings.auth.secret_key,
-            algorithm=settings.auth.algorithm,
+            payload=payload,
+            key=signing.signing_key,
+            algorithm=signing.algorithm,
+            headers={"kid": signing.kid} if signing.kid else None,
         )
 
     @staticmethod
     def decode(token: str, verify: bool = True) -> dict[str, str]:
+        """
+        Decode a token, verified tokens are cached until they expire.
+        A cached token is returned without verification, which also
+        satisfies verify=False, unverified decodes are never cached.
+        :param token: encoded token
+        :param verify: verify signature and expiration
+        :return: Token claims
+        """
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        claims = JWTHelper.verified.get(digest)
+        if claims is not None:
+            return dict(claims)
+
         try:
-            return jwt.decode(
+            key = JWTHelper._verifying_key(token) if verify else None
+            claims = jwt.decode(
                 token,
-                settings.auth.secret_key,
-                settings.auth.algorithm,
+                # PyJWT's default, the key isn't used without verification
+                key.verifying_key if key else "",
+                [key.algorithm] if key else None,
                 options={"verify_signature": verify, "verify_exp": verify},
             )
-        except jwt.exceptions.DecodeError:
-            raise TokenNotValidException from None
         except jwt.exceptions.ExpiredSignatureError:
             raise TokenExpiredException from None
+        except jwt.exceptions.InvalidTokenError:
+            # Also an alg header not matching the key of the kid
+            raise TokenNotValidException from None
+
+        ttl = float(claims.get("exp", 0)) - time.time()
+        if verify and ttl > 0:
+            JWTHelper.verified.set(digest, dict(claims), ttl=ttl)
+        return claims
+
+    @staticmethod
+    def _verifying_key(token: str) -> JWTKey:
+        """Key of the token kid, the token alg must be the key algorithm"""
+        key = JWTHelper.keyring.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise TokenNotValidException
+        return key
@@ -0,0 +1,114 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+
+from app.core.config import AuthConfig
+
+PRIVATE_KEY_SUFFIX = ".pem"
+PUBLIC_KEY_SUFFIX = ".pub"
+
+
+@dataclass(frozen=True, slots=True)
+class JWTKey:
+    kid: str | None
+    algorithm: str
+    # Prepared key objects, the signing key is None for verification only keys
+    verifying_key: Any
+    signing_key: Any = None
+    jwk: dict[str, Any] | None = field(default=None, compare=False)
+
+
+class KeyRing:
+    """
+    Keys verifying tokens by their kid header and the key signing new ones.
+    Asymmetric keys are published as a JWKS, so other services can verify
+    tokens without the signing key.
+    """
+
+    def __init__(self, keys: list[JWTKey], signing_kid: str | None) -> None:
+        self._keys: dict[str | None, JWTKey] = {}
+        for key in keys:
+            # A private key wins over the public key of the same kid
+            if key.kid not in self._keys or key.signing_key is not None:
+                self._keys[key.kid] = key
+        signing = self._keys.get(signing_kid)
+        if signing is None or signing.signing_key is None:
+            raise ValueError(f"No private key for the signing kid {signing_kid!r}")
+        self.signing = signing
+        self.jwks = {
+            "keys": [key.jwk for key in self._keys.values() if key.jwk is not None],
+        }
+
+    def get(self, kid: str | None) -> JWTKey | None:
+        return self._keys.get(kid)
+
+    @classmethod
+    def from_config(cls, config: AuthConfig) -> "KeyRing":
+        """
+        Keyring of the auth settings. HS* algorithms use the secret key,
+        EdDSA/ES256 load the keys_dir: <kid>.pem private keys (signing and
+        verification) and <kid>.pub public keys (verification only, e.g.
+        the keys rotated out but still used by unexpired tokens).
+        :param config: auth settings
+        :return: Keyring
+        """
+        signing_kid = config.signing_kid or None
+        if config.algorithm.startswith("HS"):
+            key = jwt.get_algorithm_by_name(config.algorithm).prepare_key(
+                config.secret_key,
+            )
+            return cls([JWTKey(signing_kid, config.algorithm, key, key)], signing_kid)
+
+        if not config.keys_dir:
+            raise ValueError(f"auth.keys_dir is required for {config.algorithm}")
+        keys = [
+            cls.load_key(path)
+            for path in sorted(Path(config.keys_dir).iterdir())
+            if path.suffix in {PRIVATE_KEY_SUFFIX, PUBLIC_KEY_SUFFIX}
+        ]
+        signing_kid = signing_kid or max(
+            (key.kid for key in keys if key.signing_key is not None and key.kid),
+            default=None,
+        )
+        return cls(keys, signing_kid)
+
+    @staticmethod
+    def load_key(path: Path) -> JWTKey:
+        """
+        Load an Ed25519 (EdDSA) or P-256 (ES256) PEM key, the kid is the file name
+        :param path: <kid>.pem private key or <kid>.pub public key
+        :return: Key
+        """
+        data = path.read_bytes()
+        signing_key = None
+        if path.suffix == PRIVATE_KEY_SUFFIX:
+            signing_key = load_pem_private_key(data, password=None)
+            verifying_key = signing_key.public_key()
+        else:
+            verifying_key = load_pem_public_key(data)
+
+        if isinstance(verifying_key, ed25519.Ed25519PublicKey):
+            algorithm = "EdDSA"
+        elif isinstance(verifying_key, ec.EllipticCurvePublicKey) and isinstance(
+            verifying_key.curve,
+            ec.SECP256R1,
+        ):
+            algorithm = "ES256"
+        else:
+            raise ValueError(f"{path} is not an Ed25519 or P-256 key")
+
+        jwk = jwt.get_algorithm_by_name(algorithm).to_jwk(verifying_key, as_dict=True)
+        return JWTKey(
+            kid=path.stem,
+            algorithm=algorithm,
+            verifying_key=verifying_key,
+            signing_key=signing_key,
+            jwk={**jwk, "kid": path.stem, "alg": algorithm, "use": "sig"},
+        )
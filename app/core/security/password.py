@@ -1,11 +1,64 @@
+from collections.abc import Callable
+from typing import TypeVar
+
 from passlib.context import CryptContext
 
-from app.core.config import settings
+from app.core.config import PasswordScheme, settings
+from app.core.exceptions.auth import PasswordHashingBusyException
+from app.core.metrics import Counter, Gauge, registry
+from app.core.utils.executor import BoundedExecutor, ExecutorOverloadedError
+
+R = TypeVar("R")
+
+HASHING_REJECTED = registry.register(
+    Counter(
+        "password_hashing_rejected",
+        "Password hashing calls rejected because the pool was full",
+    ),
+)
+
+
+def _crypt_context() -> CryptContext:
+    auth = settings.auth
+    return CryptContext(
+        schemes=[
+            auth.password_scheme.value,
+            *(
+                scheme.value
+                for scheme in PasswordScheme
+                if scheme != auth.password_scheme
+            ),
+        ],
+        # Only the configured scheme is current, the others verify and rehash
+        deprecated="auto",
+        # min/max equal to the cost flag any other cost for a rehash
+        bcrypt__rounds=auth.bcrypt_rounds,
+        bcrypt__min_rounds=auth.bcrypt_rounds,
+        bcrypt__max_rounds=auth.bcrypt_rounds,
+        argon2__type="ID",
+        argon2__memory_cost=auth.argon2_memory_cost,
+        argon2__rounds=auth.argon2_time_cost,
+        argon2__min_rounds=auth.argon2_time_cost,
+        argon2__max_rounds=auth.argon2_time_cost,
+        argon2__parallelism=auth.argon2_parallelism,
+    )
 
 
 class HashHelper:
-    hasher = CryptContext(schemes=["bcrypt"])
+    """
+    Password hashing for projects built on the boilerplate, the bundled
+    routes sign users in with Firebase and SOC tokens and store no password.
+    Request handlers use the async methods, they run in the hashing pool.
+    """
+
+    hasher = _crypt_context()
     secret = settings.auth.secret_key
+    # Hashing takes 100+ ms, it must never run on the event loop
+    executor = BoundedExecutor(
+        max_workers=settings.auth.hash_workers,
+        max_pending=settings.auth.hash_max_pending,
+        name="password-hash",
+    )
 
     @classmethod
     def verify_password(cls, password: str, encode_password: str) -> bool:
@@ -14,3 +67,57 @@ class HashHelper:
     @classmethod
     def get_password_hash(cls, password: str) -> str:
         return cls.hasher.hash(password)
+
+    @classmethod
+    async def verify_password_async(cls, password: str, encode_password: str) -> bool:
+        """
+        Verify a password in the hashing pool
+        :param password: plain password
+        :param encode_password: stored hash
+        :return: True if the password matches
+        """
+        return await cls._run(cls.hasher.verify, password, encode_password)
+
+    @classmethod
+    async def get_password_hash_async(cls, password: str) -> str:
+        """
+        Hash a password in the hashing pool
+        :param password: plain password
+        :return: Hash with the configured scheme and costs
+        """
+        return await cls._run(cls.hasher.hash, password)
+
+    @classmethod
+    async def verify_and_update(
+        cls,
+        password: str,
+        encode_password: str,
+    ) -> tuple[bool, str | None]:
+        """
+        Verify a password on login and rehash it if the stored hash uses
+        another scheme or other costs than configured, e.g.
+            valid, new_hash = await HashHelper.verify_and_update(password, hashed)
+            if valid and new_hash:
+                user.password = new_hash
+        :param password: plain password
+        :param encode_password: stored hash
+        :return: Verification result and the new hash to store (None if current)
+        """
+        return await cls._run(cls.hasher.verify_and_update, password, encode_password)
+
+    @classmethod
+    async def _run(cls, function: Callable[..., R], *args: str) -> R:
+        try:
+            return await cls.executor.run(function, *args)
+        except ExecutorOverloadedError:
+            HASHING_REJECTED.inc()
+            raise PasswordHashingBusyException from None
+
+
+registry.register(
+    Gauge(
+        "password_hashing_in_flight",
+        "Password hashing calls running or waiting in the pool",
+        callback=lambda: [((), HashHelper.executor.in_flight)],
+    ),
+)
@@ -0,0 +1,28 @@
+import asyncio
+from collections.abc import Coroutine
+from typing import Any
+
+# Strong references, the event loop keeps only weak ones to its tasks
+_tasks: set[asyncio.Task[Any]] = set()
+
+
+def run_soon(coroutine: Coroutine[Any, Any, Any]) -> None:
+    """
+    Run a coroutine from sync code (e.g. a session event) without waiting
+    for it. Without a running event loop it is run to completion at once.
+    :param coroutine: coroutine handling its own errors
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(coroutine)
+        return
+    task = loop.create_task(coroutine)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def wait_scheduled() -> None:
+    """Wait for the coroutines scheduled by run_soon, e.g. on shutdown"""
+    while _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
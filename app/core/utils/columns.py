@@ -0,0 +1,34 @@
+import datetime
+import decimal
+import uuid
+from typing import Any, Callable
+
+from sqlalchemy import ColumnElement
+from sqlalchemy.orm import QueryableAttribute
+
+_PARSERS: dict[type, Callable[[str], Any]] = {
+    datetime.datetime: datetime.datetime.fromisoformat,
+    datetime.date: datetime.date.fromisoformat,
+    datetime.time: datetime.time.fromisoformat,
+    uuid.UUID: uuid.UUID,
+    decimal.Decimal: decimal.Decimal,
+}
+
+
+def to_python(
+    column: ColumnElement[Any] | QueryableAttribute[Any],
+    value: Any,
+) -> Any:
+    """
+    Restore a JSON-decoded value to the python type of the column
+    :param column: column (or ORM attribute) the value belongs to
+    :param value: value as it came out of a JSON document
+    :return: Value with the column python type
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        parser = _PARSERS.get(column.type.python_type)
+    except NotImplementedError:
+        return value
+    return parser(value) if parser else value
@@ -0,0 +1,68 @@
+import base64
+import binascii
+import hashlib
+import hmac
+from typing import Any
+
+import orjson
+
+from app.core.config import settings
+from app.core.exceptions.pagination import InvalidCursorException
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class CursorHelper:
+    """Opaque, signed keyset pagination cursors."""
+
+    digest_size = 16
+
+    @staticmethod
+    def _sign(payload: bytes) -> bytes:
+        return hmac.new(
+            settings.auth.secret_key.encode(),
+            payload,
+            hashlib.sha256,
+        ).digest()[: CursorHelper.digest_size]
+
+    @staticmethod
+    def encode(keys: list[str], values: list[Any], desc: bool) -> str:
+        """
+        Encode cursor for keyset pagination
+        :param keys: names of the ordering columns, primary key last
+        :param values: values of the ordering columns of the last row
+        :param desc: ordering direction
+        :return: Signed cursor
+        """
+        payload = orjson.dumps({"k": keys, "v": values, "d": desc}, default=str)
+        return f"{_b64encode(payload)}.{_b64encode(CursorHelper._sign(payload))}"
+
+    @staticmethod
+    def decode(cursor: str, keys: list[str], desc: bool) -> list[Any]:
+        """
+        Decode and verify cursor
+        :param cursor: cursor returned with the previous page
+        :param keys: names of the ordering columns, primary key last
+        :param desc: ordering direction
+        :return: JSON values of the ordering columns
+        """
+        try:
+            encoded_payload, encoded_signature = cursor.split(".")
+            payload = _b64decode(encoded_payload)
+            signature = _b64decode(encoded_signature)
+        except (ValueError, binascii.Error):
+            raise InvalidCursorException from None
+
+        if not hmac.compare_digest(signature, CursorHelper._sign(payload)):
+            raise InvalidCursorException
+
+        data = orjson.loads(payload)
+        if data["k"] != keys or data["d"] != desc:
+            raise InvalidCursorException("Cursor does not match the requested order")
+        return data["v"]  # type: ignore[no-any-return]
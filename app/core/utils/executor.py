@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+R = TypeVar("R")
+
+
+class ExecutorOverloadedError(RuntimeError):
+    pass
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking CPU work that releases the GIL (bcrypt, argon2).
+    At most max_workers + max_pending calls are accepted, the rest is
+    rejected immediately instead of queueing behind the busy workers.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, name: str) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=name,
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._accepted = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._accepted
+
+    async def run(self, function: Callable[..., R], *args: Any) -> R:
+        """
+        Run function in the pool
+        :param function: blocking function
+        :param args: function arguments
+        :return: Function result
+        :raises ExecutorOverloadedError: all workers and queue slots are taken
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorOverloadedError
+        with self._lock:
+            self._accepted += 1
+
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # Released when the work is done, not when the caller stops waiting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _: Future[Any] | None) -> None:
+        with self._lock:
+            self._accepted -= 1
+        self._slots.release()
@@ -1,14 +1,16 @@
 import uvicorn
-from fastapi import Depends, FastAPI, Request
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 from starlette.responses import JSONResponse
 
 from app.api import router as api_router
+from app.api.v1.auth import jwks_route
 from app.api.v1.mock_auth import main_route
 from app.core.config import settings
-from app.core.dependencies.logging import Logging
 from app.core.exceptions.base import CustomException
+from app.core.lifespan import lifespan
+from app.core.middlewares.access_log import AccessLogMiddleware
 from app.core.middlewares.sqlalchemy import SQLAlchemyMiddleware
 
 
@@ -23,11 +25,14 @@ def set_cors(fastapi_app: FastAPI) -> None:
 
 
 def set_middlewares(fastapi_app: FastAPI) -> None:
+    # Added first - runs inside SQLAlchemyMiddleware and sees its query stats
+    fastapi_app.add_middleware(AccessLogMiddleware)
     fastapi_app.add_middleware(SQLAlchemyMiddleware)
 
 
 def set_routers(fastapi_app: FastAPI) -> None:
     fastapi_app.include_router(api_router)
+    fastapi_app.include_router(jwks_route)
     if settings.debug:
         fastapi_app.include_router(main_route)
 
@@ -54,7 +59,7 @@ def init_app() -> FastAPI:
         redoc_url="/redoc" if settings.debug else None,
         default_response_class=ORJSONResponse,
         debug=settings.debug,
-        dependencies=[Depends(Logging)],
+        lifespan=lifespan,
     )
     set_routers(fastapi_app)
     set_cors(fastapi_app)
@@ -71,4 +76,5 @@ if __name__ == "__main__":
         host=settings.run.host,
         port=settings.run.port,
         reload=settings.debug,
+        timeout_graceful_shutdown=settings.run.shutdown_timeout,
     )
@@ -1,10 +1,14 @@
 __all__ = (
+    "AccessLogEntry",
     "Base",
+    "RevokedToken",
     "User",
     "db_helper",
 )
 
 from app.core.db.db_helper import db_helper
 
+from .access_log import AccessLogEntry
 from .base import Base
+from .revoked_token import RevokedToken
 from .user import User
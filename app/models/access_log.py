@@ -0,0 +1,29 @@
+import datetime
+from typing import Any
+
+from sqlalchemy import BigInteger, DateTime, SmallInteger
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class AccessLogEntry(Base):
+    """Table of the postgres access log sink, written with COPY."""
+
+    __tablename__ = "access_log"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        index=True,
+    )
+    method: Mapped[str]
+    path: Mapped[str]
+    status: Mapped[int] = mapped_column(SmallInteger)
+    duration_ms: Mapped[float]
+    user_id: Mapped[int | None] = mapped_column(index=True)
+    queries: Mapped[int]
+    db_ms: Mapped[float]
+    action: Mapped[str | None]
+    details: Mapped[dict[str, Any] | None] = mapped_column(JSONB)
@@ -0,0 +1,28 @@
+import datetime
+from uuid import UUID
+
+from sqlalchemy import BigInteger, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_token"
+
+    # Monotonic id, workers load the rows added since the last id they saw
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    jti: Mapped[UUID] = mapped_column(unique=True)
+    sub: Mapped[str]
+    # Token exp, the row is useless afterwards and gets purged
+    expires_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        index=True,
+    )
+    revoked_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        return f"RevokedToken <{self.jti}>"
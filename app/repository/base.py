@@ -1,102 +1,405 @@
 import datetime
+from collections.abc import AsyncIterator, Callable, Hashable, Mapping, Sequence
+from itertools import batched
 from typing import Any, Generic, TypeVar
 from uuid import UUID
 
+import orjson
 from sqlalchemy import (
+    ARRAY,
     ColumnElement,
+    Integer,
+    Select,
+    any_,
     asc,
+    bindparam,
+    delete,
     desc,
     func,
+    insert,
+    inspect,
     select,
+    text,
+    tuple_,
+    update,
 )
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncScalarResult, AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, QueryableAttribute
 
+from app.core.cache import TTLCache
+from app.core.config import CountStrategy, settings
 from app.core.db import db_helper
+from app.core.db.explain import Explain
+from app.core.db.loading import LoadSpec, joins_collection, load_key, load_options
+from app.core.db.projection import Projection, ProjectionTarget, RowType, projection
+from app.core.db.statements import statement_cache
+from app.core.utils.columns import to_python
+from app.core.utils.cursor import CursorHelper
 from app.models import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 
+RELTUPLES_QUERY = text(
+    "SELECT c.reltuples::bigint FROM pg_class c "
+    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE c.relname = :name AND n.nspname = coalesce(:schema, current_schema())",
+)
+
+# Parameters of the page, filters are bound by their field names
+OFFSET_PARAM = "_offset"
+LIMIT_PARAM = "_limit"
+
+# Filtered fields and whether they are matched with IS NULL
+FilterShape = tuple[tuple[str, bool], ...]
+
+# Columns, expressions or mapped attributes to sort by
+OrderBy = Sequence[ColumnElement[Any] | QueryableAttribute[Any]]
+
 
 class BaseRepository(Generic[ModelType]):
     def __init__(self, model: type[ModelType]) -> None:
         self.model = model
+        self._count_cache: TTLCache[frozenset[tuple[str, Any]], int] = TTLCache(
+            maxsize=settings.pagination.count_cache_size,
+            ttl=settings.pagination.count_cache_ttl,
+        )
 
     async def get(
         self,
-        select_load: list[ColumnElement | dict[str, ColumnElement]] | None = None,
+        select_load: Sequence[LoadSpec] | None = None,
         session: AsyncSession | None = None,
         **kwargs: Any,
     ) -> ModelType | None:
-        query = select(self.model).where(
+        shape = self._filter_shape(kwargs)
+
+        def build() -> Select:  # type: ignore[type-arg]
+            query = self._filtered(shape)
+            if select_load:
+                query = self._select_load(query, select_load)
+            return query
+
+        query = self._statement(("get", shape, load_key(select_load)), build)
+        params = self._params(kwargs)
+        session_ = session or db_helper.session
+        if joins_collection(select_load):
+            # Rows repeat the record for every item of a joined collection
+            return (await session_.scalars(query, params)).unique().first()
+        return await session_.scalar(query, params)
+
+    async def get_many(
+        self,
+        field: str,
+        values: Sequence[Any],
+        select_load: Sequence[LoadSpec] | None = None,
+    ) -> Sequence[ModelType]:
+        """
+        Get the records whose field is one of the values. The values are one
+        array parameter (WHERE field = ANY($1)), so the statement is the same
+        for any number of them and is prepared once.
+        :param field: Field to match, e.g. id
+        :param values: Values of the field
+        :param select_load: Optional list of relationships to load
+        :return: The records found, in no particular order
+        """
+        if not values:
+            return []
+
+        def build() -> Select:  # type: ignore[type-arg]
+            column = getattr(self.model, field)
+            query = select(self.model).where(
+                column == any_(bindparam("values", type_=ARRAY(column.type))),
+            )
+            if select_load:
+                query = self._select_load(query, select_load)
+            return query
+
+        query = self._statement(("get_many", field, load_key(select_load)), build)
+        result = await db_helper.session.scalars(query, {"values": list(values)})
+        if joins_collection(select_load):
+            result = result.unique()
+        return result.all()
+
+    async def get_row(
+        self,
+        target: ProjectionTarget,
+        **kwargs: Any,
+    ) -> Any | None:
+        """
+        Get the columns of a record as a plain row object, the entity isn't
+        built nor added to the session, e.g.
+            await user_repository.get_row([User.id, User.is_deleted], email=email)
+        :param target: columns, a dataclass or a pydantic model
+        :param kwargs: Fields to filter the records
+        :return: The row if found
+        """
+        project = projection(self.model, target)
+        shape = self._filter_shape(kwargs)
+        stmt = self._statement(
+            ("get_row", project, shape),
+            lambda: self._where(select(*project.columns), shape, core=True).limit(1),
+        )
+        rows = project.rows(await db_helper.session.execute(stmt, self._params(kwargs)))
+        return rows[0] if rows else None
+
+    async def list_keyset(
+        self,
+        order_by: Sequence[InstrumentedAttribute[Any]] | None = None,
+        order_desc: bool = True,
+        limit: int = 15,
+        cursor: str | None = None,
+        select_load: Sequence[LoadSpec] | None = None,
+        **kwargs: str | int | datetime.datetime | UUID,
+    ) -> tuple[list[ModelType], str | None]:
+        """
+        List records with keyset (cursor) pagination.
+        Rows are ordered by order_by columns plus the primary key, the next page
+        starts right after the last row of the previous one, so the cost of a
+        page doesn't depend on its depth. Ordering columns must be NOT NULL.
+        :param order_by: Columns to sort by, the primary key is appended
+        :param order_desc: Sort direction for all the ordering columns
+        :param limit: Page size
+        :param cursor: Cursor returned with the previous page
+        :param select_load: Optional list of relationships to load
+        :param kwargs: Fields to filter the records
+        :return: The page and the cursor of the next page, None on the last page
+        """
+        columns = self._keyset_columns(order_by)
+        keys = [column.key for column in columns]
+
+        stmt = select(self.model).where(
             *(getattr(self.model, key) == value for key, value in kwargs.items()),
         )
+        if cursor:
+            values = [
+                to_python(column, value)
+                for column, value in zip(
+                    columns,
+                    CursorHelper.decode(cursor, keys, order_desc),
+                    strict=True,
+                )
+            ]
+            keyset = tuple_(*columns)
+            stmt = stmt.where(
+                keyset < tuple_(*values) if order_desc else keyset > tuple_(*values)
+            )
+
         if select_load:
-            options = []
-            for column in select_load:
-                if isinstance(column, dict):
-                    options.append(
-                        selectinload(column["related"]).options(
-                            selectinload(column["sub_related"]),
-                        ),
-                    )
-                else:
-                    options.append(selectinload(column))
-            query = query.options(
-                *options,
+            stmt = self._select_load(stmt, select_load)
+
+        sort_type = desc if order_desc else asc
+        stmt = stmt.order_by(*(sort_type(column) for column in columns))
+        # One extra row tells whether the next page exists
+        stmt = stmt.limit(limit + 1)
+
+        scalars = await db_helper.session.scalars(stmt)
+        if joins_collection(select_load):
+            scalars = scalars.unique()
+        result = list(scalars.all())
+        if len(result) <= limit:
+            return result, None
+
+        result = result[:limit]
+        next_cursor = CursorHelper.encode(
+            keys,
+            [getattr(result[-1], key) for key in keys],
+            order_desc,
+        )
+        return result, next_cursor
+
+    async def stream(
+        self,
+        order_by: OrderBy | None = None,
+        order_desc: bool = True,
+        yield_per: int = 1000,
+        target: ProjectionTarget | None = None,
+        **kwargs: str | int | datetime.datetime | UUID,
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate over all matching records with a server-side cursor.
+        Rows are fetched yield_per at a time on a dedicated session and are
+        expunged once the next batch is requested, so memory stays constant
+        regardless of the result size.
+        :param order_by: Columns to sort by
+        :param order_desc: Sort direction
+        :param yield_per: Number of rows fetched per round trip
+        :param target: Columns, a dataclass or a pydantic model, plain row
+            objects are yielded instead of the records
+        :param kwargs: Fields to filter the records
+        :return: Async iterator of records
+        """
+        project = projection(self.model, target) if target is not None else None
+        if project is not None:
+            stmt = select(*project.columns).where(
+                *(
+                    inspect(self.model).columns[key] == value
+                    for key, value in kwargs.items()
+                ),
             )
-        if session:
-            return await session.scalar(query)
-        return await db_helper.session.scalar(query)
+        else:
+            stmt = select(self.model).where(
+                *(getattr(self.model, key) == value for key, value in kwargs.items()),
+            )
+        if order_by:
+            sort_type = desc if order_desc else asc
+            stmt = stmt.order_by(*(sort_type(column) for column in order_by))
+
+        async with db_helper.session_factory() as session:
+            if project is not None:
+                rows = await session.stream(
+                    stmt,
+                    execution_options={"yield_per": yield_per},
+                )
+                async for partition in rows.partitions():
+                    for row in project.rows(partition):
+                        yield row
+                return
+
+            result: AsyncScalarResult[Any] = await session.stream_scalars(
+                stmt,
+                execution_options={"yield_per": yield_per},
+            )
+            async for partition in result.partitions():
+                for record in partition:
+                    yield record
+                session.expunge_all()
 
     async def list(
         self,
-        order_by: list[ColumnElement] | None = None,
+        order_by: OrderBy | None = None,
         order_desc: bool = True,
         offset: int | None = None,
         limit: int | None = None,
-        select_load: list[ColumnElement] | None = None,
+        select_load: Sequence[LoadSpec] | None = None,
+        *,
+        count_strategy: CountStrategy | None = None,
         **kwargs: str | int | datetime.datetime | UUID,
-    ) -> tuple[list[ModelType], int]:
-        stmt = select(self.model)
-        stmt = stmt.where(
-            *(getattr(self.model, key) == value for key, value in kwargs.items()),
+    ) -> tuple[list[ModelType], int | None]:
+        """
+        List records with offset pagination.
+        How the total is computed depends on count_strategy:
+        exact - count(*) OVER () in the page query, one round trip;
+        none - no total, None is returned;
+        estimated - planner estimate, pg_class.reltuples or EXPLAIN rows;
+        cached - exact total kept in a TTL cache keyed by the filters.
+        :param order_by: Columns to sort by
+        :param order_desc: Sort direction of the first column
+        :param offset: Number of records to skip
+        :param limit: Page size
+        :param select_load: Optional list of relationships to load
+        :param count_strategy: Total count strategy, default value in settings
+        :param kwargs: Fields to filter the records
+        :return: The page and the total count
+        """
+        return await self._paginate(  # type: ignore[return-value]
+            None,
+            order_by=order_by,
+            order_desc=order_desc,
+            offset=offset,
+            limit=limit,
+            select_load=select_load,
+            count_strategy=count_strategy,
+            filters=kwargs,
         )
 
-        count_stmt = select(func.count()).select_from(stmt.subquery())
-
-        if select_load:
-            options = []
-            for column in select_load:
-                if isinstance(column, dict):
-                    options.append(
-                        selectinload(column["related"]).options(
-                            selectinload(column["sub_related"]),
-                        ),
-                    )
-                else:
-                    options.append(selectinload(column))
-
-            stmt = stmt.options(
-                *options,
-            )
+    async def list_rows(
+        self,
+        target: ProjectionTarget,
+        *,
+        order_by: OrderBy | None = None,
+        order_desc: bool = True,
+        offset: int | None = None,
+        limit: int | None = None,
+        count_strategy: CountStrategy | None = None,
+        **kwargs: str | int | datetime.datetime | UUID,
+    ) -> tuple[Sequence[Any], int | None]:
+        """
+        List the columns of records as plain row objects, as list does.
+        Rows skip the ORM: no entities, identity map or change tracking.
+        :param target: columns, a dataclass or a pydantic model
+        :param order_by: Columns to sort by
+        :param order_desc: Sort direction of the first column
+        :param offset: Number of records to skip
+        :param limit: Page size
+        :param count_strategy: Total count strategy, default value in settings
+        :param kwargs: Fields to filter the records
+        :return: The page and the total count
+        """
+        return await self._paginate(
+            projection(self.model, target),
+            order_by=order_by,
+            order_desc=order_desc,
+            offset=offset,
+            limit=limit,
+            select_load=None,
+            count_strategy=count_strategy,
+            filters=kwargs,
+        )
 
-        if limit and offset:
-            stmt = stmt.offset(offset).limit(limit)
+    async def _paginate(
+        self,
+        project: Projection[RowType] | None,
+        *,
+        order_by: OrderBy | None,
+        order_desc: bool,
+        offset: int | None,
+        limit: int | None,
+        select_load: Sequence[LoadSpec] | None,
+        count_strategy: CountStrategy | None,
+        filters: dict[str, Any],
+    ) -> tuple[Sequence[Any], int | None]:
+        strategy = count_strategy or settings.pagination.count_strategy
+        shape = self._filter_shape(filters)
+        filter_params = self._params(filters)
+        params = dict(filter_params)
+        if offset:
+            params[OFFSET_PARAM] = offset
+        if limit:
+            params[LIMIT_PARAM] = limit
 
-        if order_by:
-            sort_type = desc if order_desc else asc
-            stmt = stmt.order_by(
-                sort_type(order_by[0]), *(desc(o) for o in order_by[1:])
-            )
+        stmt = self._page_statement(
+            shape,
+            project,
+            select_load,
+            order_by,
+            order_desc=order_desc,
+            offset=bool(offset),
+            limit=bool(limit),
+        )
+        unique = joins_collection(select_load)
 
-        result = (await db_helper.session.scalars(stmt)).all()
+        cache_key = frozenset(filters.items())
+        if strategy == CountStrategy.CACHED:
+            count = self._count_cache.get(cache_key)
+            if count is not None:
+                return await self._fetch_page(stmt, params, project, unique), count
 
-        # Count
-        count_result = await db_helper.session.execute(count_stmt)
-        count = count_result.scalar()
+        if strategy in (CountStrategy.EXACT, CountStrategy.CACHED):
+            result, count = await self._fetch_page_with_total(
+                self._page_statement(
+                    shape,
+                    project,
+                    select_load,
+                    order_by,
+                    order_desc=order_desc,
+                    offset=bool(offset),
+                    limit=bool(limit),
+                    with_total=True,
+                ),
+                project,
+                params,
+                filter_params,
+                offset,
+                unique=unique,
+            )
+            if strategy == CountStrategy.CACHED:
+                self._count_cache.set(cache_key, count)
+            return result, count
 
-        return result, count
+        result = await self._fetch_page(stmt, params, project, unique)
+        if strategy == CountStrategy.ESTIMATED:
+            return result, await self._estimate_count(shape, filter_params)
+        return result, None
 
     async def create(self, **kwargs: str | int | UUID | datetime.datetime) -> Base:
         obj = self.model(**kwargs)
@@ -118,16 +421,15 @@ class BaseRepository(Generic[ModelType]):
         return instance
 
     async def delete(self, **kwargs: str | int | UUID | datetime.datetime) -> None:
-        query = select(self.model).where(
-            *(getattr(self.model, key) == value for key, value in kwargs.items()),
-        )
-        record = (await db_helper.session.scalars(query)).first()
+        shape = self._filter_shape(kwargs)
+        query = self._statement(("filtered", shape), lambda: self._filtered(shape))
+        record = (await db_helper.session.scalars(query, self._params(kwargs))).first()
         if record:
             await db_helper.session.delete(record)
         else:
             raise ValueError(
                 f"Not found record with params "
-                f"{(f"{key} = {value}" for key, value in kwargs.items())}",
+                f"{(f'{key} = {value}' for key, value in kwargs.items())}",
             )
 
     async def update(
@@ -143,10 +445,11 @@ class BaseRepository(Generic[ModelType]):
         :return: The updated model instance
         """
 
-        query = select(self.model).where(
-            *(getattr(self.model, key) == value for key, value in kwargs.items()),
-        )
-        instance = (await db_helper.session.scalars(query)).first()
+        shape = self._filter_shape(kwargs)
+        query = self._statement(("filtered", shape), lambda: self._filtered(shape))
+        instance = (
+            await db_helper.session.scalars(query, self._params(kwargs))
+        ).first()
 
         # Apply updates
         for key, value in updates.items():
@@ -158,13 +461,337 @@ class BaseRepository(Generic[ModelType]):
                 )
         return instance
 
+    async def bulk_create(
+        self,
+        values: Sequence[dict[str, Any]],
+        returning: bool = False,
+        batch_size: int = 1000,
+    ) -> Sequence[ModelType]:
+        """
+        Insert many records with set-based INSERT statements.
+        Rows skip the unit of work, they are sent in batches of batch_size
+        through asyncpg executemany (multi-row VALUES with RETURNING).
+        :param values: Column values of the records
+        :param returning: Return the inserted records
+        :param batch_size: Number of rows per statement
+        :return: The inserted records if returning, otherwise an empty list
+        """
+        stmt = insert(self.model)
+        return await self._execute_many(stmt, values, returning, batch_size)
+
+    async def bulk_upsert(
+        self,
+        values: Sequence[dict[str, Any]],
+        conflict_columns: Sequence[InstrumentedAttribute],  # type: ignore[type-arg]
+        update_columns: Sequence[str] | None = None,
+        returning: bool = False,
+        batch_size: int = 1000,
+    ) -> Sequence[ModelType]:
+        """
+        Insert many records, update the existing ones (INSERT ... ON CONFLICT).
+        :param values: Column values of the records, of the records with the
+            same conflict columns only the last one is written
+        :param conflict_columns: Columns of the unique index, e.g. [User.email]
+        :param update_columns: Columns to update on conflict, default all the
+            given columns except the conflict ones. Empty - DO NOTHING
+        :param returning: Return the inserted and updated records
+        :param batch_size: Number of rows per statement
+        :return: The upserted records if returning, otherwise an empty list
+        """
+        if not values:
+            return []
+
+        index_elements = [column.key for column in conflict_columns]
+        # A statement can't update a row twice, the last values of a key win
+        values = self._last_per_key(values, index_elements)
+        if update_columns is None:
+            update_columns = [key for key in values[0] if key not in index_elements]
+
+        stmt = pg_insert(self.model)
+        if not update_columns:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        else:
+            set_ = {key: stmt.excluded[key] for key in update_columns}
+            # Set onupdate columns (e.g. event_date) as an ORM update would
+            for column in self.model.__table__.columns:  # type: ignore[attr-defined]
+                onupdate = column.onupdate
+                if (
+                    onupdate is not None
+                    and onupdate.is_clause_element
+                    and column.key not in set_
+                ):
+                    set_[column.key] = onupdate.arg
+            stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+        return await self._execute_many(stmt, values, returning, batch_size)
+
+    async def bulk_update(
+        self,
+        values: Sequence[dict[str, Any]],
+        batch_size: int = 1000,
+    ) -> None:
+        """
+        Update many records by primary key with one executemany UPDATE per batch.
+        Every dictionary must contain the primary key and the columns to update.
+        :param values: Primary keys and new column values of the records
+        :param batch_size: Number of rows per statement
+        """
+        stmt = update(self.model)
+        for batch in batched(values, batch_size):
+            await db_helper.session.execute(stmt, list(batch))
+
+    async def delete_where(
+        self,
+        returning: bool = False,
+        **kwargs: Any,
+    ) -> Sequence[ModelType]:
+        """
+        Delete records matching the filters with a single DELETE statement.
+        Sequence values are matched with IN.
+        :param returning: Return the deleted records
+        :param kwargs: Fields to filter the records, at least one is required
+        :return: The deleted records if returning, otherwise an empty list
+        """
+        if not kwargs:
+            raise ValueError("delete_where requires at least one filter")
+
+        stmt = delete(self.model).where(
+            *(
+                getattr(self.model, key).in_(value)
+                if isinstance(value, list | tuple | set | frozenset)
+                else getattr(self.model, key) == value
+                for key, value in kwargs.items()
+            ),
+        )
+        if returning:
+            return (await db_helper.session.scalars(stmt.returning(self.model))).all()
+        await db_helper.session.execute(stmt)
+        return []
+
+    async def _execute_many(
+        self,
+        stmt: Any,
+        values: Sequence[dict[str, Any]],
+        returning: bool,
+        batch_size: int,
+    ) -> Sequence[ModelType]:
+        if returning:
+            stmt = stmt.returning(self.model)
+        result: list[ModelType] = []
+        for batch in batched(values, batch_size):
+            if returning:
+                result.extend(
+                    await db_helper.session.scalars(
+                        stmt,
+                        list(batch),
+                        execution_options={"populate_existing": True},
+                    ),
+                )
+            else:
+                await db_helper.session.execute(stmt, list(batch))
+        return result
+
+    async def _fetch_page(
+        self,
+        stmt: Select,  # type: ignore[type-arg]
+        params: dict[str, Any],
+        project: Projection[RowType] | None,
+        unique: bool = False,
+    ) -> Sequence[Any]:
+        if project is not None:
+            return project.rows(await db_helper.session.execute(stmt, params))
+        scalars = await db_helper.session.scalars(stmt, params)
+        return (scalars.unique() if unique else scalars).all()
+
+    async def _fetch_page_with_total(
+        self,
+        stmt: Select,  # type: ignore[type-arg]
+        project: Projection[RowType] | None,
+        params: dict[str, Any],
+        filters: dict[str, Any],
+        offset: int | None,
+        *,
+        unique: bool = False,
+    ) -> tuple[Sequence[Any], int]:
+        result = await db_helper.session.execute(stmt, params)
+        rows = (result.unique() if unique else result).all()
+        if rows:
+            if project is not None:
+                factory = project.factory
+                return [factory(*row[:-1]) for row in rows], rows[0][-1]
+            return [row[0] for row in rows], rows[0][1]
+        if not offset:
+            return [], 0
+        # Page past the end, the window has no rows to report the total on
+        shape = self._filter_shape(filters)
+        count_stmt = self._statement(
+            ("total", shape),
+            lambda: select(func.count()).select_from(self._filtered(shape).subquery()),
+        )
+        return [], (await db_helper.session.execute(count_stmt, filters)).scalar_one()
+
+    async def _estimate_count(
+        self,
+        shape: FilterShape,
+        filters: dict[str, Any],
+    ) -> int:
+        if not shape:
+            table = self.model.__table__
+            estimate = (
+                await db_helper.session.execute(
+                    RELTUPLES_QUERY,
+                    {"name": table.name, "schema": table.schema},  # type: ignore[attr-defined]
+                )
+            ).scalar()
+            # reltuples is -1 (or 0) until the table is vacuumed or analyzed
+            if estimate is not None and estimate > 0:
+                return int(estimate)
+
+        plan: Any = (
+            await db_helper.session.execute(Explain(self._filtered(shape)), filters)
+        ).scalar_one()
+        if isinstance(plan, str | bytes):
+            plan = orjson.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def _page_statement(
+        self,
+        shape: FilterShape,
+        project: Projection[Any] | None,
+        select_load: Sequence[LoadSpec] | None,
+        order_by: OrderBy | None,
+        *,
+        order_desc: bool,
+        offset: bool,
+        limit: bool,
+        with_total: bool = False,
+    ) -> Select:  # type: ignore[type-arg]
+        def build() -> Select:  # type: ignore[type-arg]
+            if project is not None:
+                stmt = self._where(select(*project.columns), shape, core=True)
+            else:
+                stmt = self._filtered(shape)
+            if select_load:
+                stmt = self._select_load(stmt, select_load)
+
+            if offset:
+                stmt = stmt.offset(bindparam(OFFSET_PARAM, type_=Integer))
+            if limit:
+                stmt = stmt.limit(bindparam(LIMIT_PARAM, type_=Integer))
+
+            if order_by:
+                sort_type = desc if order_desc else asc
+                stmt = stmt.order_by(
+                    sort_type(order_by[0]), *(desc(o) for o in order_by[1:])
+                )
+            if with_total:
+                stmt = stmt.add_columns(func.count().over().label("total_count"))
+            return stmt
+
+        return self._statement(
+            (
+                "list",
+                shape,
+                project or (),
+                load_key(select_load),
+                self._columns_key(order_by),
+                order_desc,
+                offset,
+                limit,
+                with_total,
+            ),
+            build,
+        )
+
+    def _statement(
+        self,
+        key: tuple[Hashable, ...],
+        build: Callable[[], Any],
+    ) -> Any:
+        # Statements with expressions the key can't describe are built every time
+        if any(part is None for part in key):
+            return build()
+        return statement_cache.get((self.model, *key), build)
+
+    def _filtered(self, shape: FilterShape) -> Select:  # type: ignore[type-arg]
+        return self._where(select(self.model), shape)
+
+    def _where(self, stmt: Any, shape: FilterShape, core: bool = False) -> Any:
+        # Table columns keep the statement free of the ORM, for projections
+        columns = inspect(self.model).columns if core else None
+        clauses = []
+        for key, is_null in shape:
+            column = columns[key] if columns is not None else getattr(self.model, key)
+            clauses.append(column.is_(None) if is_null else column == bindparam(key))
+        return stmt.where(*clauses)
+
+    @staticmethod
+    def _filter_shape(filters: Mapping[str, Any]) -> FilterShape:
+        # NULL can't be compared with =, IS NULL is part of the statement
+        return tuple(sorted((key, value is None) for key, value in filters.items()))
+
+    @staticmethod
+    def _params(filters: Mapping[str, Any]) -> dict[str, Any]:
+        return {key: value for key, value in filters.items() if value is not None}
+
+    @staticmethod
+    def _last_per_key(
+        values: Sequence[dict[str, Any]],
+        keys: Sequence[str],
+    ) -> Sequence[dict[str, Any]]:
+        rows: dict[tuple[Any, ...], dict[str, Any]] = {}
+        # NULL never conflicts, such rows are always inserted
+        unkeyed = []
+        for row in values:
+            key = tuple(row.get(name) for name in keys)
+            if None in key:
+                unkeyed.append(row)
+            else:
+                rows[key] = row
+        return [*rows.values(), *unkeyed]
+
+    @staticmethod
+    def _columns_key(
+        columns: Sequence[Any] | None,
+    ) -> tuple[tuple[Any, str], ...] | None:
+        """Key of mapped attributes, None for other expressions"""
+        key = []
+        for column in columns or ():
+            if (
+                not isinstance(column, QueryableAttribute) or column._extra_criteria  # noqa: SLF001
+            ):
+                return None
+            key.append((column.parent, column.key))
+        return tuple(key)
+
+    def _keyset_columns(
+        self,
+        order_by: Sequence[InstrumentedAttribute[Any]] | None,
+    ) -> Sequence[InstrumentedAttribute[Any]]:
+        mapper = inspect(self.model)
+        columns = list(order_by or [])
+        keys = {column.key for column in columns}
+        for pk_column in mapper.primary_key:
+            key = mapper.get_property_by_column(pk_column).key
+            if key not in keys:
+                columns.append(getattr(self.model, key))
+        return columns
+
+    @staticmethod
+    def _select_load(
+        stmt: Select,  # type: ignore[type-arg]
+        select_load: Sequence[LoadSpec],
+    ) -> Select:  # type: ignore[type-arg]
+        return stmt.options(*load_options(select_load))
+
     async def count(
         self,
-        by_field: ColumnElement,
+        by_field: ColumnElement[Any] | QueryableAttribute[Any],
         **kwargs: str | int | datetime.datetime | UUID,
     ) -> int:
-        stmt = select(func.count(by_field)).where(
-            *(getattr(self.model, key) == value for key, value in kwargs.items()),
+        shape = self._filter_shape(kwargs)
+        stmt = self._statement(
+            ("count", shape, self._columns_key([by_field])),
+            lambda: self._where(select(func.count(by_field)), shape),
         )
-        result = await db_helper.session.execute(stmt)
-        return result.scalar()
+        result = await db_helper.session.execute(stmt, self._params(kwargs))
+        return result.scalar_one()  # type: ignore[no-any-return]
@@ -0,0 +1,61 @@
+import datetime
+from collections.abc import Sequence
+from uuid import UUID
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.db import db_helper
+from app.models import RevokedToken
+from app.repository.base import BaseRepository
+
+
+class RevokedTokenRepository(BaseRepository[RevokedToken]):
+    def __init__(self) -> None:
+        super().__init__(RevokedToken)
+
+    async def revoke(self, jti: UUID, sub: str, expires_at: datetime.datetime) -> bool:
+        """
+        Revoke a token in the current transaction
+        :param jti: token id
+        :param sub: token subject
+        :param expires_at: token exp
+        :return: False if the token was already revoked
+        """
+        stmt = (
+            pg_insert(RevokedToken)
+            .values(jti=jti, sub=sub, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+            .returning(RevokedToken.id)
+        )
+        return (await db_helper.session.execute(stmt)).scalar() is not None
+
+    async def is_revoked(self, jti: UUID) -> bool:
+        query = select(exists().where(RevokedToken.jti == jti))
+        return bool(await db_helper.session.scalar(query))
+
+    async def revoked_since(self, last_id: int) -> Sequence[tuple[int, UUID]]:
+        """
+        Ids and jtis of the unexpired tokens revoked after last_id,
+        read on a dedicated session outside of the request transaction
+        :param last_id: the last id already loaded, 0 for all
+        :return: (id, jti) rows ordered by id
+        """
+        query = (
+            select(RevokedToken.id, RevokedToken.jti)
+            .where(RevokedToken.id > last_id, RevokedToken.expires_at > func.now())
+            .order_by(RevokedToken.id)
+        )
+        async with db_helper.session_factory() as session:
+            return (await session.execute(query)).tuples().all()
+
+    async def purge_expired(self) -> int:
+        async with db_helper.session_factory() as session:
+            result = await session.execute(
+                delete(RevokedToken).where(RevokedToken.expires_at <= func.now()),
+            )
+            await session.commit()
+        return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+revoked_token_repository = RevokedTokenRepository()
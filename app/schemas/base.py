@@ -35,3 +35,4 @@ class EventDate(BaseModel):
 class PaginationGetter(BaseModel):
     offset: int = Field(ge=0, default=0)
     limit: int = Field(ge=1, le=250, default=15)
+    cursor: str | None = None
@@ -12,6 +12,7 @@ class TokenPayloadDecode(BaseModel):
     scope: str
     exp: int
     iat: int
+    jti: str | None = None
 
 
 class AccessRefreshToken(BaseModel):
@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+from pydantic import BaseModel, ConfigDict
+
+
+class UserSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    email: str
+    avatar: str | None
+    timezone: str
+
+
+@dataclass(slots=True)
+class Principal:
+    """Authenticated user as a plain row, not part of the session"""
+
+    id: int
+    email: str
+    is_deleted: bool
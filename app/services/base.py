@@ -1,13 +1,30 @@
+import asyncio
+import copy
 import datetime
-from typing import Any, Generic, Type, TypeVar
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, ClassVar, Generic, Type, TypeVar
 from uuid import UUID
 
-from sqlalchemy import ColumnElement
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import InstrumentedAttribute, Session, make_transient_to_detached
 
+from app.core.cache import SingleFlight, response_cache
+from app.core.config import CountStrategy
+from app.core.db import db_helper
+from app.core.db.loader import DataLoader, loaders
+from app.core.db.loading import LoadSpec, load_key
+from app.core.db.projection import ProjectionTarget
+from app.core.db.routing import (
+    PINNED_INFO_KEY,
+    Route,
+    route_context,
+    route_key_context,
+)
 from app.core.db.transactional import Propagation, Transactional
 from app.core.exceptions.entity import RecordNotFound
+from app.core.metrics import Counter, registry
 from app.models import Base
-from app.repository.base import BaseRepository
+from app.repository.base import BaseRepository, OrderBy
 from app.schemas.base import CrudSchema, PaginationGetter
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -15,15 +32,36 @@ RepositoryType = TypeVar("RepositoryType", bound=BaseRepository)  # type: ignore
 CreateSchemaType = TypeVar("CreateSchemaType", bound=CrudSchema)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=CrudSchema)
 
+# Response cache tags written in a session, invalidated on commit
+CHANGED_TAGS = "changed_response_tags"
+
+SERVICE_GETS = registry.register(
+    Counter(
+        "service_get_calls",
+        "BaseService.get calls of coalescing services, by who ran the query",
+        ("model", "result"),
+    ),
+)
+
+# Filters and whether the caller must read from the primary
+ReadKey = tuple[Any, ...]
+
 
 class BaseService(Generic[ModelType, RepositoryType]):
+    # Concurrent identical get calls share one query, each caller gets
+    # its own copy of the row. Opt in for services of hot records.
+    coalesce_gets: ClassVar[bool] = False
+
     def __init__(self, model: Type[ModelType], repository: RepositoryType) -> None:
         self.model = model
         self.repository = repository
+        # Cached responses with these tags are invalidated by the writes
+        self.cache_tags: tuple[str, ...] = (model.__tablename__,)
+        self._reads: SingleFlight[ReadKey, dict[str, Any] | None] = SingleFlight()
 
     async def get(
         self,
-        select_load: list[ColumnElement] | None = None,
+        select_load: Sequence[LoadSpec] | None = None,
         **kwargs: str | int | datetime.datetime | UUID,
     ) -> ModelType:
         """
@@ -33,27 +71,244 @@ class BaseService(Generic[ModelType, RepositoryType]):
         :param kwargs: Additional fields to filter the object.
         :return: The object if found.
         """
-        obj = await self.repository.get(select_load, **kwargs)  # type: ignore
+        if self.coalesce_gets and not select_load:
+            obj = await self._get_coalesced(kwargs)
+        else:
+            obj = await self.repository.get(select_load, **kwargs)  # type: ignore
         if obj is None:
             raise RecordNotFound
         return obj
 
+    async def load(
+        self,
+        value: Any,
+        by: str = "id",
+        select_load: Sequence[LoadSpec] | None = None,
+    ) -> ModelType:
+        """
+        Get an object by a unique field through the data loader of the
+        request: loads started together share one query and loaded objects
+        are reused until the session commits, e.g.
+            users = await asyncio.gather(*(user_service.load(i) for i in ids))
+        Loads awaited one after another in a loop are not batched.
+        If the object is not found, a RecordNotFound exception is raised.
+        :param value: Value of the field, of the type of the column.
+        :param by: Unique field, the primary key by default.
+        :param select_load: Optional list of relationships to load.
+        :return: The object if found.
+        """
+        obj = await self._loader(by, select_load).load(value)
+        if obj is None:
+            raise RecordNotFound
+        return obj  # type: ignore[no-any-return]
+
+    async def load_many(
+        self,
+        values: Sequence[Any],
+        by: str = "id",
+        select_load: Sequence[LoadSpec] | None = None,
+    ) -> list[ModelType | None]:
+        """
+        Get objects by a unique field with one query, as load does.
+        :param values: Values of the field.
+        :param by: Unique field, the primary key by default.
+        :param select_load: Optional list of relationships to load.
+        :return: The objects in the order of the values, None if not found.
+        """
+        return await self._loader(by, select_load).load_many(values)
+
+    async def load_all(
+        self,
+        value: Any,
+        by: str,
+        select_load: Sequence[LoadSpec] | None = None,
+    ) -> list[ModelType]:
+        """
+        Get all objects whose field equals the value, batched as load is,
+        e.g. the posts of every user of a page by the user_id foreign key.
+        :param value: Value of the field.
+        :param by: Field shared by the objects.
+        :param select_load: Optional list of relationships to load.
+        :return: The objects, empty if none.
+        """
+        return await self._loader(by, select_load, many=True).load(value) or []
+
+    def _loader(
+        self,
+        by: str,
+        select_load: Sequence[LoadSpec] | None,
+        many: bool = False,
+    ) -> DataLoader[Any, Any]:
+        loads = load_key(select_load)
+        if loads is None:
+            raise ValueError("Loads with criteria or of_type() can't be batched")
+
+        async def batch_load(values: list[Any]) -> dict[Any, Any]:
+            objs = await self.repository.get_many(by, values, select_load)
+            if not many:
+                return {getattr(obj, by): obj for obj in objs}
+            grouped: dict[Any, list[ModelType]] = {}
+            for obj in objs:
+                grouped.setdefault(getattr(obj, by), []).append(obj)
+            return grouped
+
+        return loaders().get(
+            (self.model, by, many, loads),
+            batch_load,
+            name=f"{self.model.__name__}.{by}",
+        )
+
+    async def get_row(
+        self,
+        target: ProjectionTarget,
+        **kwargs: str | int | datetime.datetime | UUID,
+    ) -> Any:
+        """
+        Get the columns of an object as a plain row object, for reads that
+        don't need the entity. The row isn't part of the session.
+        If the object is not found, a RecordNotFound exception is raised.
+        :param target: Columns, a dataclass or a pydantic model.
+        :param kwargs: Additional fields to filter the object.
+        :return: The row if found.
+        """
+        row = await self.repository.get_row(target, **kwargs)
+        if row is None:
+            raise RecordNotFound
+        return row
+
+    async def _get_coalesced(self, kwargs: dict[str, Any]) -> ModelType | None:
+        session = db_helper.session
+        if session.info.get(PINNED_INFO_KEY) or session.new or session.dirty:
+            # Reads of a writing session must see its own transaction
+            return await self.repository.get(**kwargs)  # type: ignore[no-any-return]
+
+        leading = False
+        leader: ModelType | None = None
+
+        async def load() -> dict[str, Any] | None:
+            nonlocal leading, leader
+            leading = True
+            leader = await self.repository.get(**kwargs)
+            if leader is None:
+                return None
+            # Loaded columns only, reading the others would query
+            loaded = inspect(leader).dict
+            return {
+                attribute.key: loaded[attribute.key]
+                for attribute in inspect(self.model).column_attrs
+                if attribute.key in loaded
+            }
+
+        try:
+            values = await self._reads.do(self._read_key(kwargs), load)
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if leading or task is None or task.cancelling():
+                raise
+            # The leading caller was cancelled, not this one
+            return await self.repository.get(**kwargs)  # type: ignore[no-any-return]
+
+        if leading:
+            SERVICE_GETS.inc(model=self.model.__name__, result="leader")
+            return leader
+        SERVICE_GETS.inc(model=self.model.__name__, result="coalesced")
+        if values is None:
+            return None
+        return await self._attach_copy(copy.deepcopy(values))
+
+    async def _attach_copy(self, values: dict[str, Any]) -> ModelType:
+        """
+        Add a row loaded elsewhere (another session or a cache) to the
+        current session without a query
+        :param values: column values, including the primary key
+        :return: The object of the current session
+        """
+        obj = self.model(**values)
+        make_transient_to_detached(obj)
+        return await db_helper.session.merge(obj, load=False)  # type: ignore[no-any-return]
+
+    @staticmethod
+    def _read_key(kwargs: dict[str, Any]) -> ReadKey:
+        router = db_helper.router
+        primary = route_context.get() == Route.PRIMARY or (
+            router is not None and router.is_pinned(route_key_context.get())
+        )
+        # A caller pinned to the primary must not get a replica read
+        return (primary, *sorted(kwargs.items()))
+
+    async def list_keyset(
+        self,
+        padding: PaginationGetter,
+        order_by: Sequence[InstrumentedAttribute[Any]] | None = None,
+        order_by_desc: bool = False,
+        select_load: Sequence[LoadSpec] | None = None,
+        **kwargs: str | int | datetime.datetime | UUID,
+    ) -> tuple[list[ModelType], str | None]:
+        """
+        List objects with keyset (cursor) pagination.
+        Unlike offset pagination deep pages cost the same as the first one
+        and rows inserted meanwhile don't shift the pages.
+        :param padding: Pagination object containing limit and cursor.
+        :param order_by: Optional list of columns to sort by.
+        :param order_by_desc: Boolean indicating if sorting should be descending.
+        :param select_load: Optional list of columns to load.
+        :param kwargs: Additional fields to filter the objects.
+        :return: A tuple containing a list of objects and the next page cursor.
+        """
+        return await self.repository.list_keyset(  # type: ignore[no-any-return]
+            order_by,
+            order_by_desc,
+            padding.limit,
+            padding.cursor,
+            select_load,
+            **kwargs,
+        )
+
+    def stream(
+        self,
+        order_by: OrderBy | None = None,
+        order_by_desc: bool = False,
+        yield_per: int = 1000,
+        target: ProjectionTarget | None = None,
+        **kwargs: str | int | datetime.datetime | UUID,
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate over all matching objects without loading them into memory.
+        :param order_by: Optional list of columns to sort by.
+        :param order_by_desc: Boolean indicating if sorting should be descending.
+        :param yield_per: Number of rows fetched per round trip.
+        :param target: Columns, a dataclass or a pydantic model to yield
+            plain row objects instead of the objects.
+        :param kwargs: Additional fields to filter the objects.
+        :return: Async iterator of objects.
+        """
+        return self.repository.stream(  # type: ignore[no-any-return]
+            order_by,
+            order_by_desc,
+            yield_per,
+            target,
+            **kwargs,
+        )
+
     async def list(
         self,
         padding: PaginationGetter,
-        order_by: list[ColumnElement] | None = None,
+        order_by: OrderBy | None = None,
         order_by_desc: bool = False,
-        select_load: list[ColumnElement] | None = None,
+        select_load: Sequence[LoadSpec] | None = None,
+        count_strategy: CountStrategy | None = None,
         **kwargs: str | int | datetime.datetime | UUID,
-    ) -> tuple[list[Type[ModelType]], int]:
+    ) -> tuple[list[Type[ModelType]], int | None]:
         """
         List objects with pagination and optional sorting.
         :param padding: Pagination object containing offset and limit.
         :param order_by: Optional list of columns to sort by.
         :param order_by_desc: Boolean indicating if sorting should be descending.
         :param select_load: Optional list of columns to load.
+        :param count_strategy: How to compute the total count, default in settings.
         :param kwargs: Additional fields to filter the objects.
-        :return: A tuple containing a list of objects and the total count.
+        :return: A tuple containing a list of objects and the total count
+            (None with the "none" count strategy).
         """
         objs, count = await self.repository.list(
             order_by,
@@ -61,14 +316,47 @@ class BaseService(Generic[ModelType, RepositoryType]):
             padding.offset,
             padding.limit,
             select_load,
+            count_strategy=count_strategy,
             **kwargs,
         )
         return objs, count
 
+    async def list_rows(
+        self,
+        padding: PaginationGetter,
+        target: ProjectionTarget,
+        order_by: OrderBy | None = None,
+        order_by_desc: bool = False,
+        count_strategy: CountStrategy | None = None,
+        **kwargs: str | int | datetime.datetime | UUID,
+    ) -> tuple[Sequence[Any], int | None]:
+        """
+        List the columns of objects as plain row objects with pagination,
+        for list endpoints: no entities are built or tracked by the session.
+        :param padding: Pagination object containing offset and limit.
+        :param target: Columns, a dataclass or a pydantic model.
+        :param order_by: Optional list of columns to sort by.
+        :param order_by_desc: Boolean indicating if sorting should be descending.
+        :param count_strategy: How to compute the total count, default in settings.
+        :param kwargs: Additional fields to filter the objects.
+        :return: A tuple containing a list of rows and the total count
+            (None with the "none" count strategy).
+        """
+        return await self.repository.list_rows(  # type: ignore[no-any-return]
+            target,
+            order_by=order_by,
+            order_desc=order_by_desc,
+            offset=padding.offset,
+            limit=padding.limit,
+            count_strategy=count_strategy,
+            **kwargs,
+        )
+
     @Transactional(Propagation.REQUIRED)
     async def create(self, create_schema: CreateSchemaType, **kwargs: Any) -> ModelType:
         obj = self.model(**create_schema.model_dump(), **kwargs)
         await self.repository.save(obj)
+        self._invalidate_responses()
         return obj
 
     @Transactional(Propagation.REQUIRED)
@@ -84,6 +372,7 @@ class BaseService(Generic[ModelType, RepositoryType]):
             ),
             id=obj.id,
         )
+        self._invalidate_responses()
         return obj
 
     @Transactional(Propagation.REQUIRED)
@@ -92,3 +381,21 @@ class BaseService(Generic[ModelType, RepositoryType]):
             await self.repository.delete(id=pk)
         except ValueError as e:
             raise RecordNotFound from e
+        self._invalidate_responses()
+
+    def _invalidate_responses(self) -> None:
+        # Invalidated after the commit, a request running meanwhile
+        # would cache the old state under the new tag versions
+        db_helper.session.info.setdefault(CHANGED_TAGS, set()).update(self.cache_tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_tags(session: Session) -> None:
+    tags = session.info.pop(CHANGED_TAGS, None)
+    if tags:
+        response_cache.invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tags(session: Session) -> None:
+    session.info.pop(CHANGED_TAGS, None)
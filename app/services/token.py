@@ -0,0 +1,142 @@
+import datetime
+import hashlib
+import logging
+import time
+from uuid import UUID
+
+from app.core.cache import BloomFilter, SingleFlight
+from app.core.config import settings
+from app.core.db.routing import Route, use_route
+from app.core.db.transactional import Propagation, Transactional
+from app.core.exceptions.token import TokenRevokedException
+from app.core.security.jwt import JWTHelper
+from app.models import RevokedToken
+from app.repository.revoked_token import (
+    RevokedTokenRepository,
+    revoked_token_repository,
+)
+from app.schemas.token import AccessRefreshToken
+
+from .base import BaseService
+
+logger = logging.getLogger(__name__)
+
+# Rows re-read on every sync, ids of concurrent transactions may commit
+# out of order
+SYNC_OVERLAP = 100
+
+
+class TokenService(BaseService[RevokedToken, RevokedTokenRepository]):
+    """
+    Refresh token rotation and revocation. Revoked jtis live in Postgres,
+    every worker keeps a Bloom filter of them, so a token that was never
+    revoked (the common case) is accepted without a query.
+    """
+
+    def __init__(
+        self, model: type[RevokedToken], repository: RevokedTokenRepository
+    ) -> None:
+        super().__init__(model, repository)
+        self._filter = BloomFilter(
+            settings.auth.revocation_filter_capacity,
+            settings.auth.revocation_filter_error_rate,
+        )
+        self._last_id = 0
+        self._synced_at = float("-inf")
+        self._rebuilt_at = float("-inf")
+        self._syncs: SingleFlight[str, None] = SingleFlight()
+
+    async def refresh(
+        self, refresh_token: str, claims: dict[str, str]
+    ) -> AccessRefreshToken:
+        """
+        Issue a new access token for a verified refresh token. With rotation
+        the refresh token is replaced and the presented one is revoked,
+        presenting it again (e.g. a stolen copy) fails.
+        :param refresh_token: encoded refresh token
+        :param claims: verified claims of the refresh token
+        :return: Access and refresh tokens
+        """
+        jti = self.token_id(refresh_token, claims)
+        if await self.is_revoked(jti):
+            raise TokenRevokedException
+
+        if settings.auth.rotate_refresh_tokens:
+            # The insert decides concurrent rotations of the same token
+            if not await self.revoke(jti, claims["sub"], int(claims["exp"])):
+                raise TokenRevokedException
+            refresh_token = JWTHelper.refresh_token(claims["sub"])
+
+        return AccessRefreshToken(
+            access_token=JWTHelper.access_token(claims["sub"]),
+            refresh_token=refresh_token,
+        )
+
+    async def is_revoked(self, jti: UUID) -> bool:
+        await self._sync_filter()
+        if jti.bytes not in self._filter:
+            return False
+        # Possibly a false positive of the filter
+        with use_route(Route.PRIMARY):
+            return await self.repository.is_revoked(jti)
+
+    @Transactional(Propagation.REQUIRED)
+    async def revoke(self, jti: UUID, sub: str, exp: int) -> bool:
+        """
+        Revoke a token
+        :param jti: token id
+        :param sub: token subject
+        :param exp: token exp timestamp
+        :return: False if the token was already revoked
+        """
+        revoked = await self.repository.revoke(
+            jti,
+            sub,
+            datetime.datetime.fromtimestamp(exp, datetime.UTC),
+        )
+        # Other workers pick it up on their next sync
+        self._filter.add(jti.bytes)
+        return revoked
+
+    @staticmethod
+    def token_id(token: str, claims: dict[str, str]) -> UUID:
+        """jti of the token, tokens issued without one are identified by digest"""
+        if jti := claims.get("jti"):
+            return UUID(jti)
+        return UUID(bytes=hashlib.blake2b(token.encode(), digest_size=16).digest())
+
+    async def _sync_filter(self) -> None:
+        if time.monotonic() - self._synced_at < settings.auth.revocation_sync_interval:
+            return
+        await self._syncs.do("sync", self._sync)
+
+    async def _sync(self) -> None:
+        now = time.monotonic()
+        if now - self._rebuilt_at >= settings.auth.revocation_rebuild_interval:
+            await self.repository.purge_expired()
+            rows = await self.repository.revoked_since(0)
+            bloom = BloomFilter(
+                max(settings.auth.revocation_filter_capacity, len(rows) * 2),
+                settings.auth.revocation_filter_error_rate,
+            )
+            self._rebuilt_at = now
+        else:
+            rows = await self.repository.revoked_since(
+                max(self._last_id - SYNC_OVERLAP, 0),
+            )
+            bloom = self._filter
+
+        for _, jti in rows:
+            if jti.bytes not in bloom:
+                bloom.add(jti.bytes)
+        if rows:
+            self._last_id = max(self._last_id, rows[-1][0])
+        if len(bloom) > bloom.capacity:
+            logger.warning("Revocation filter is over capacity, rebuilding")
+            self._rebuilt_at = float("-inf")
+
+        self._filter = bloom
+        self._synced_at = now
+
+
+token_service = TokenService(RevokedToken, revoked_token_repository)
@@ -1,11 +1,130 @@
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import ORMExecuteState, Session, object_session
+
+from app.core.cache import TieredCache, shared_cache
+from app.core.config import settings
+from app.core.db import db_helper
+from app.core.utils.columns import to_python
 from app.models import User
 from app.repository.user import UserRepository, user_repository
+from app.schemas.user import Principal
 
 from .base import BaseService
 
+# Emails of the users changed in a session, invalidated on commit
+CHANGED_PRINCIPALS = "changed_principals"
+# Set when a bulk statement changed users of unknown emails
+BULK_CHANGED_PRINCIPALS = "bulk_changed_principals"
+
+# Credentials of the social sign in, never cached
+SECRET_COLUMNS = frozenset(("soc_token", "firebase_token"))
+
+principal_cache = TieredCache(
+    "principal",
+    maxsize=settings.cache.principal_size,
+    ttl=settings.cache.principal_ttl,
+    shared=shared_cache,
+    shared_ttl=settings.cache.principal_shared_ttl,
+)
+
+PRINCIPAL_COLUMNS = tuple(
+    getattr(User, attribute.key)
+    for attribute in inspect(User).column_attrs
+    if attribute.key not in SECRET_COLUMNS
+)
+
 
 class UserService(BaseService[User, UserRepository]):
-    pass
+    coalesce_gets = True
+
+    async def get_principal(self, email: str) -> User:
+        """
+        Get the authenticated user, cached by email. The user is merged
+        into the current session without a query, its token columns aren't
+        loaded (SECRET_COLUMNS are never cached).
+        :param email: user email (token subject)
+        :return: The user
+        """
+        values = await self._cached_principal(email)
+        return await self._attach_copy(
+            {
+                column.key: to_python(column, values[column.key])
+                for column in PRINCIPAL_COLUMNS
+            },
+        )
+
+    async def get_principal_row(self, email: str) -> Principal:
+        """
+        Get the authenticated user as a plain row, for the checks that don't
+        need the User. Shares the cache of get_principal, nothing is added
+        to the session.
+        :param email: user email (token subject)
+        :return: The principal
+        """
+        values = await self._cached_principal(email)
+        return Principal(
+            id=values["id"],
+            email=values["email"],
+            is_deleted=values["is_deleted"],
+        )
+
+    async def _cached_principal(self, email: str) -> dict[str, Any]:
+        # Concurrent misses for an email share one query. A change is seen
+        # at once by this worker and after CACHE__PRINCIPAL_TTL by the others
+        return await principal_cache.get_or_load(
+            email,
+            lambda: self._load_principal(email),
+        )
+
+    async def _load_principal(self, email: str) -> dict[str, Any]:
+        row = await self.get_row(PRINCIPAL_COLUMNS, email=email)
+        return {column.key: getattr(row, column.key) for column in PRINCIPAL_COLUMNS}
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_principal(_: Any, __: Any, target: User) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    emails = session.info.setdefault(CHANGED_PRINCIPALS, set())
+    emails.add(target.email)
+    # The old email of a user whose email changed
+    emails.update(inspect(target).attrs.email.history.deleted or ())
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changed_principals(state: ORMExecuteState) -> None:
+    # bulk_upsert, bulk_update, delete_where, ... don't load the rows
+    if (state.is_insert or state.is_update or state.is_delete) and (
+        state.bind_mapper is not None and state.bind_mapper.class_ is User
+    ):
+        state.session.info[BULK_CHANGED_PRINCIPALS] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session: Session) -> None:
+    emails = session.info.pop(CHANGED_PRINCIPALS, None)
+    if session.info.pop(BULK_CHANGED_PRINCIPALS, False):
+        principal_cache.clear()
+    elif emails:
+        principal_cache.invalidate(*emails)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_principals(session: Session) -> None:
+    session.info.pop(CHANGED_PRINCIPALS, None)
+    session.info.pop(BULK_CHANGED_PRINCIPALS, None)
+
+
+def _invalidate_copied_principals(table: str) -> None:
+    if table == User.__tablename__:
+        principal_cache.clear()
+
+
+db_helper.copy_listeners.append(_invalidate_copied_principals)
 
 
 user_service = UserService(User, user_repository)
@@ -0,0 +1,30 @@
+"""
+Compare a saved benchmark report with a baseline report.
+
+    python -m benchmarks.compare benchmarks/results/load.json \
+        benchmarks/baseline/load.json [--tolerance 0.15]
+
+Exits with 1 if p95/p99 latency or throughput regressed beyond the tolerance.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from .report import finish, load_report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("report", type=Path)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    sys.exit(finish(load_report(args.report), None, args.baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Database fixtures of the benchmarks, run against the local Postgres of DB__URL"""
+
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from app.core.db import db_helper
+from app.core.middlewares.sqlalchemy import session_ids
+from app.models import User
+from app.repository.user import user_repository
+
+EMAIL = "bench-{}@example.com"
+
+
+@asynccontextmanager
+async def request_scope() -> AsyncIterator[None]:
+    """Scoped session of one request, as SQLAlchemyMiddleware sets it up"""
+    context = db_helper.set_session_context(next(session_ids))
+    try:
+        yield
+    finally:
+        await db_helper.remove_session()
+        db_helper.reset_session_context(context)
+
+
+async def seed_users(count: int) -> list[str]:
+    """
+    Create the benchmark users, existing ones are kept
+    :param count: number of users
+    :return: Emails of the users
+    """
+    emails = [EMAIL.format(index) for index in range(count)]
+    async with request_scope():
+        await user_repository.bulk_upsert(
+            [
+                {
+                    "name": f"Bench {index}",
+                    "email": email,
+                    "soc_type": "bench",
+                    "soc_token": "",
+                    "firebase_token": "",
+                    "timezone": "UTC",
+                    "is_deleted": False,
+                }
+                for index, email in enumerate(emails)
+            ],
+            conflict_columns=[User.email],
+            update_columns=[],
+        )
+        await db_helper.session.commit()
+    return emails
@@ -0,0 +1,269 @@
+"""
+Load generator for the API. Drives app.main:app in process through ASGI,
+a running server (--url) or uvicorn workers it starts itself (--serve).
+Every client sends a weighted mix of sign in and authenticated calls as
+the seeded users bench-N@example.com, latencies of the warm-up are dropped.
+The users sign in before the run, authenticated calls reuse their tokens.
+
+    python -m benchmarks.load [--concurrency 32] [--duration 30] [--warmup 3]
+        [--mix sign_in=1,me=8,refresh=1] [--users 1000]
+        [--url http://127.0.0.1:8000 | --serve --workers 4]
+        [--output benchmarks/results/load.json]
+        [--baseline benchmarks/baseline/load.json] [--tolerance 0.15]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+
+import httpx
+
+from app.core.config import settings
+from app.core.db import db_helper
+from app.core.security.jwt import JWTHelper
+from app.main import app
+
+from .fixtures import seed_users
+from .report import Summary, build_report, finish, summarize
+
+API = settings.api.prefix + settings.api.v1.prefix
+SIGN_IN = API + settings.api.v1.auth + "/sign_in/"
+ME = API + settings.api.v1.user + "/me/"
+REFRESH = API + settings.api.v1.user + "/refresh_token/"
+
+Scenario = Callable[[httpx.AsyncClient, str], Awaitable[httpx.Response]]
+
+
+# Access token of every user from its last sign in, reused as a client would
+access_tokens: dict[str, str] = {}
+
+
+async def sign_in(client: httpx.AsyncClient, email: str) -> httpx.Response:
+    response = await client.post(
+        SIGN_IN,
+        json={"email": email, "password": "bench"},
+    )
+    if response.status_code == 200:
+        access_tokens[email] = response.json()["access_token"]
+    return response
+
+
+async def me(client: httpx.AsyncClient, email: str) -> httpx.Response:
+    return await client.get(
+        ME,
+        headers={"Authorization": f"Bearer {access_tokens[email]}"},
+    )
+
+
+async def refresh(client: httpx.AsyncClient, email: str) -> httpx.Response:
+    # A new jti every time, rotation rejects a refresh token used twice
+    return await client.post(
+        REFRESH,
+        params={"refresh_token": JWTHelper.refresh_token(email)},
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {"sign_in": sign_in, "me": me, "refresh": refresh}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+@contextlib.asynccontextmanager
+async def in_process_client() -> AsyncIterator[httpx.AsyncClient]:
+    # The lifespan warms up the pool and disposes it, as under uvicorn
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://bench",
+        ) as client:
+            yield client
+
+
+@contextlib.asynccontextmanager
+async def http_client(url: str, concurrency: int) -> AsyncIterator[httpx.AsyncClient]:
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+    )
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        yield client
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_server(port: int, workers: int) -> AsyncIterator[str]:
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--no-access-log",
+            "--log-level",
+            "warning",
+        ],
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=url) as client:
+            for _ in range(100):
+                with contextlib.suppress(httpx.TransportError):
+                    await client.get("/.well-known/jwks.json")
+                    break
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn didn't start")
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def sign_in_all(
+    client: httpx.AsyncClient,
+    emails: list[str],
+    concurrency: int,
+) -> None:
+    """Sign every user in once before the run, see access_tokens"""
+    pending = iter(emails)
+
+    async def worker() -> None:
+        for email in pending:
+            response = await sign_in(client, email)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def generate(
+    client: httpx.AsyncClient,
+    emails: list[str],
+    *,
+    mix: dict[str, float],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+) -> dict[str, Summary]:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    names, weights = list(mix), list(mix.values())
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def worker(seed: int) -> None:
+        rng = random.Random(seed)  # noqa: S311
+        while (now := time.perf_counter()) < stop_at:
+            name = rng.choices(names, weights)[0]
+            response = await SCENARIOS[name](client, rng.choice(emails))
+            if now < measure_from:
+                continue
+            latencies[name].append(time.perf_counter() - now)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+
+    results = {
+        f"load.{name}": {**summarize(latencies[name], elapsed), "errors": errors[name]}
+        for name in names
+    }
+    results["load.all"] = {
+        **summarize(
+            [latency for values in latencies.values() for latency in values],
+            elapsed,
+        ),
+        "errors": sum(errors.values()),
+    }
+    return results
+
+
+async def run(args: argparse.Namespace) -> int:
+    emails = await seed_users(args.users)
+    # The in-process app opens its own connections in the lifespan
+    await db_helper.dispose()
+
+    async with contextlib.AsyncExitStack() as stack:
+        if args.serve:
+            url = await stack.enter_async_context(
+                uvicorn_server(args.port, args.workers),
+            )
+            client = await stack.enter_async_context(
+                http_client(url, args.concurrency),
+            )
+        elif args.url:
+            client = await stack.enter_async_context(
+                http_client(args.url, args.concurrency),
+            )
+        else:
+            client = await stack.enter_async_context(in_process_client())
+        await sign_in_all(client, emails, args.concurrency)
+        results = await generate(
+            client,
+            emails,
+            mix=args.mix,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup,
+        )
+
+    target = "serve" if args.serve else args.url or "asgi"
+    report = build_report(
+        "load",
+        {
+            "target": target,
+            "workers": args.workers if args.serve else None,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": args.mix,
+            "users": args.users,
+        },
+        results,
+    )
+    for name, summary in results.items():
+        if summary["errors"]:
+            print(f"{name}: {summary['errors']:.0f} error responses")
+    return finish(report, args.output, args.baseline, args.tolerance)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--mix", type=parse_mix, default="sign_in=1,me=8,refresh=1")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--serve", action="store_true", help="Start uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Micro-benchmarks of the hot paths: JWTHelper, HashHelper, response
+serialization and BaseRepository get/list/bulk against the local Postgres
+of DB__URL (skipped with --no-db). Every call is timed on its own.
+
+    python -m benchmarks.micro [--number 2000] [--no-db]
+        [--output benchmarks/results/micro.json]
+        [--baseline benchmarks/baseline/micro.json] [--tolerance 0.15]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from app.core.config import CountStrategy
+from app.core.db import db_helper
+from app.core.security.jwt import JWTHelper
+from app.core.security.password import HashHelper
+from app.models import User
+from app.repository.user import user_repository
+from app.schemas.user import Principal, UserSchema
+
+from .fixtures import request_scope, seed_users
+from .report import Summary, build_report, finish, summarize
+
+EMAIL = "user@example.com"
+PASSWORD = "correct horse battery staple"  # noqa: S105
+
+
+def run_sync(function: Callable[[int], object], number: int) -> Summary:
+    latencies = []
+    started = time.perf_counter()
+    for index in range(number):
+        start = time.perf_counter()
+        function(index)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_async(
+    function: Callable[[int], Awaitable[object]], number: int
+) -> Summary:
+    latencies = []
+    started = time.perf_counter()
+    for index in range(number):
+        start = time.perf_counter()
+        async with request_scope():
+            await function(index)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def bench_jwt(number: int) -> dict[str, Summary]:
+    token = JWTHelper.access_token(EMAIL)
+    # Distinct tokens, the first decode of each one is verified
+    fresh = [JWTHelper.access_token(EMAIL, exp=900 + index) for index in range(number)]
+    return {
+        "jwt.encode_access": run_sync(lambda _: JWTHelper.access_token(EMAIL), number),
+        "jwt.encode_refresh": run_sync(
+            lambda _: JWTHelper.refresh_token(EMAIL), number
+        ),
+        "jwt.decode_cached": run_sync(lambda _: JWTHelper.decode(token), number),
+        "jwt.decode_verify": run_sync(lambda i: JWTHelper.decode(fresh[i]), number),
+    }
+
+
+async def bench_password(number: int) -> dict[str, Summary]:
+    hashed = HashHelper.get_password_hash(PASSWORD)
+    # Hashing is slow by design, a few calls are enough
+    number = max(number // 100, 10)
+    return {
+        "password.verify": run_sync(
+            lambda _: HashHelper.verify_password(PASSWORD, hashed),
+            number,
+        ),
+        "password.verify_async": await run_async(
+            lambda _: HashHelper.verify_password_async(PASSWORD, hashed),
+            number,
+        ),
+    }
+
+
+def bench_serialization(number: int) -> dict[str, Summary]:
+    users = [
+        User(
+            id=index,
+            name=f"User {index}",
+            email=f"user-{index}@example.com",
+            avatar=None,
+            timezone="UTC",
+        )
+        for index in range(100)
+    ]
+    schemas = [UserSchema.model_validate(user) for user in users]
+    return {
+        "serialize.validate_100": run_sync(
+            lambda _: [UserSchema.model_validate(user) for user in users],
+            number,
+        ),
+        "serialize.orjson_100": run_sync(
+            lambda _: orjson.dumps([schema.model_dump() for schema in schemas]),
+            number,
+        ),
+        "serialize.response_100": run_sync(
+            lambda _: ORJSONResponse([schema.model_dump() for schema in schemas]),
+            number,
+        ),
+    }
+
+
+async def bench_repository(number: int, users: int) -> dict[str, Summary]:
+    emails = await seed_users(users)
+    async with request_scope():
+        first_id = (await user_repository.get(email=emails[0])).id  # type: ignore[union-attr]
+
+    async def bulk_create(index: int) -> None:
+        await user_repository.bulk_create(
+            [
+                {
+                    "name": "Bulk",
+                    "email": f"bulk-{index}-{row}@example.com",
+                    "soc_type": "bench",
+                    "soc_token": "",
+                    "firebase_token": "",
+                }
+                for row in range(100)
+            ],
+        )
+        # Keep the table as seeded
+        await db_helper.session.rollback()
+
+    return {
+        "repository.get_by_id": await run_async(
+            lambda i: user_repository.get(id=first_id + i % users),
+            number,
+        ),
+        "repository.get_by_email": await run_async(
+            lambda i: user_repository.get(email=emails[i % users]),
+            number,
+        ),
+        "repository.get_row_principal": await run_async(
+            lambda i: user_repository.get_row(Principal, email=emails[i % users]),
+            number,
+        ),
+        "repository.list_50_exact": await run_async(
+            lambda _: user_repository.list(
+                order_by=[User.id],
+                limit=50,
+                count_strategy=CountStrategy.EXACT,
+            ),
+            number,
+        ),
+        "repository.list_50_no_count": await run_async(
+            lambda _: user_repository.list(
+                order_by=[User.id],
+                limit=50,
+                count_strategy=CountStrategy.NONE,
+            ),
+            number,
+        ),
+        "repository.list_rows_50_no_count": await run_async(
+            lambda _: user_repository.list_rows(
+                UserSchema,
+                order_by=[User.id],
+                limit=50,
+                count_strategy=CountStrategy.NONE,
+            ),
+            number,
+        ),
+        "repository.count": await run_async(
+            lambda _: user_repository.count(User.id, is_deleted=False),
+            number,
+        ),
+        "repository.bulk_create_100": await run_async(
+            bulk_create,
+            max(number // 10, 10),
+        ),
+    }
+
+
+async def run(args: argparse.Namespace) -> int:
+    results = {
+        **bench_jwt(args.number),
+        **await bench_password(args.number),
+        **bench_serialization(args.number),
+    }
+    if args.db:
+        try:
+            results.update(await bench_repository(args.number, args.users))
+        finally:
+            await db_helper.dispose()
+    HashHelper.executor.shutdown()
+
+    report = build_report(
+        "micro",
+        {"number": args.number, "db": args.db, "users": args.users},
+        results,
+    )
+    return finish(report, args.output, args.baseline, args.tolerance)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--no-db", dest="db", action="store_false")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
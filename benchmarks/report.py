@@ -0,0 +1,147 @@
+"""
+Latency summaries, JSON reports and baseline comparison of the benchmarks.
+
+A report is a JSON object:
+    {"kind": "micro", "created_at": ..., "python": ..., "params": {...},
+     "results": {"<name>": {"count", "throughput", "mean_ms", "p50_ms",
+                            "p95_ms", "p99_ms", "max_ms"}}}
+"""
+
+import datetime
+import json
+import math
+import platform
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+Summary = dict[str, float]
+
+
+def percentile(ordered: Sequence[float], quantile: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(quantile * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies: Sequence[float], elapsed: float) -> Summary:
+    """
+    Summarize request or call latencies
+    :param latencies: latencies in seconds
+    :param elapsed: wall time of the run in seconds, for the throughput
+    :return: Count, throughput per second and latencies in milliseconds
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "count": count,
+        "throughput": count / elapsed if elapsed else 0.0,
+        "mean_ms": sum(ordered) / count * 1000 if count else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if count else 0.0,
+    }
+
+
+def build_report(
+    kind: str,
+    params: dict[str, Any],
+    results: dict[str, Summary],
+) -> dict[str, Any]:
+    return {
+        "kind": kind,
+        "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+
+
+def save_report(report: dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def load_report(path: Path) -> dict[str, Any]:
+    return json.loads(path.read_text())  # type: ignore[no-any-return]
+
+
+def compare(
+    current: dict[str, Any],
+    baseline: dict[str, Any],
+    tolerance: float = 0.15,
+) -> list[str]:
+    """
+    Compare a report with a baseline report of the same kind
+    :param current: report of this run
+    :param baseline: stored report
+    :param tolerance: allowed relative change, 0.15 - 15% slower p95/p99
+        or 15% lower throughput
+    :return: Regressions, empty if the run is within the tolerance
+    """
+    regressions = []
+    for name, summary in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if base[key] and summary[key] > base[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {key} {base[key]:.3f} -> {summary[key]:.3f}",
+                )
+        if base["throughput"] and summary["throughput"] < base["throughput"] * (
+            1 - tolerance
+        ):
+            regressions.append(
+                f"{name}: throughput {base['throughput']:,.0f} -> "
+                f"{summary['throughput']:,.0f}/s",
+            )
+    return regressions
+
+
+def print_results(
+    results: dict[str, Summary],
+    baseline: dict[str, Any] | None = None,
+) -> None:
+    print(
+        f"{'benchmark':<32}{'count':>9}{'ops/s':>12}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'vs base':>10}",
+    )
+    for name, summary in results.items():
+        change = ""
+        base = (baseline or {}).get("results", {}).get(name)
+        if base and base["p95_ms"]:
+            change = f"{summary['p95_ms'] / base['p95_ms'] - 1:+.0%}"
+        print(
+            f"{name:<32}{summary['count']:>9,.0f}{summary['throughput']:>12,.0f}"
+            f"{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}"
+            f"{summary['p99_ms']:>10.3f}{change:>10}",
+        )
+
+
+def finish(
+    report: dict[str, Any],
+    output: Path | None,
+    baseline_path: Path | None,
+    tolerance: float,
+) -> int:
+    """
+    Print, save and compare a report, the exit code of the benchmark commands
+    :return: 1 if the run regressed against the baseline, otherwise 0
+    """
+    baseline = load_report(baseline_path) if baseline_path else None
+    print_results(report["results"], baseline)
+    if output:
+        save_report(report, output)
+        print(f"Saved {output}")
+    if baseline is None:
+        return 0
+
+    regressions = compare(report, baseline, tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
@@ -0,0 +1,24 @@
+from collections.abc import Sequence
+
+from app.core.access_log import AccessLogPipeline, AccessLogSink, AccessRecord
+
+
+class MemorySink(AccessLogSink):
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    async def write(self, records: Sequence[AccessRecord]) -> None:
+        self.batches.append([record.path for record in records])
+
+
+class TestAccessLogPipeline:
+    async def test_drop_oldest_and_batches(self) -> None:
+        sink = MemorySink()
+        pipeline = AccessLogPipeline([sink], buffer_size=5, batch_size=2)
+        for index in range(7):
+            pipeline.push(AccessRecord(method="GET", path=f"/{index}"))
+
+        assert pipeline.dropped == 2
+        await pipeline.close()
+        assert sink.batches == [["/2", "/3"], ["/4", "/5"], ["/6"]]
+        assert len(pipeline) == 0
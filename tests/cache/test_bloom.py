@@ -0,0 +1,15 @@
+import uuid
+
+from app.core.cache import BloomFilter
+
+
+class TestBloomFilter:
+    def test_membership(self) -> None:
+        bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+        added = [uuid.uuid4().bytes for _ in range(10_000)]
+        for item in added:
+            bloom.add(item)
+
+        assert all(item in bloom for item in added)
+        false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10_000))
+        assert false_positives < 300
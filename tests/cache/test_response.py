@@ -0,0 +1,136 @@
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.core.cache import ResponseCache, SharedCache
+from app.core.responses import CachedRoute, cache_response
+from app.core.security.jwt import JWTHelper
+from app.core.utils.background import wait_scheduled
+from app.core.utils.executor import ExecutorOverloadedError
+from app.schemas.user import Principal
+from app.services.token import token_service
+from app.services.user import user_service
+
+
+class TestResponseCache:
+    async def test_etag_and_invalidation(self, tmp_path: Path) -> None:
+        shared = SharedCache(str(tmp_path / "cache.sqlite3"))
+        worker = ResponseCache(shared=shared, tag_check_interval=0)
+        other_worker = ResponseCache(shared=shared, tag_check_interval=0)
+        calls = 0
+
+        class Route(CachedRoute):
+            cache = worker
+
+        router = APIRouter(route_class=Route)
+
+        @router.get("/items/")
+        @cache_response(tags=["item"])
+        async def items(limit: int = 10) -> list[int]:
+            nonlocal calls
+            calls += 1
+            return list(range(limit))
+
+        app = FastAPI()
+        app.include_router(router)
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/items/", params={"limit": 3})
+            assert first.json() == [0, 1, 2]
+            etag = first.headers["etag"]
+
+            second = await client.get("/items/", params={"limit": 3})
+            assert second.content == first.content
+            assert second.headers["etag"] == etag
+            assert calls == 1
+
+            not_modified = await client.get(
+                "/items/",
+                params={"limit": 3},
+                headers={"If-None-Match": f"W/{etag}"},
+            )
+            assert not_modified.status_code == 304
+            assert calls == 1
+
+            # Invalidated by another worker through the shared tag version
+            other_worker.invalidate(["item"])
+            await wait_scheduled()
+            third = await client.get(
+                "/items/",
+                params={"limit": 3},
+                headers={"If-None-Match": etag},
+            )
+            assert third.status_code == 304
+            assert calls == 2
+
+    async def test_invalidation_when_overloaded(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        shared = SharedCache(str(tmp_path / "cache.sqlite3"))
+        worker = ResponseCache(shared=shared, tag_check_interval=0)
+        other_worker = ResponseCache(shared=shared, tag_check_interval=0)
+        key = await other_worker.key("/items/", "", None, ["item"])
+
+        async def overloaded(*args: Any) -> None:
+            raise ExecutorOverloadedError
+
+        monkeypatch.setattr(shared._executor, "run", overloaded)  # noqa: SLF001
+        worker.invalidate(["item"])
+        await wait_scheduled()
+        monkeypatch.undo()
+        assert await other_worker.key("/items/", "", None, ["item"]) != key
+
+    async def test_per_principal(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        calls = 0
+        revoked: set[UUID] = set()
+
+        async def get_principal_row(email: str) -> Principal:
+            return Principal(id=1, email=email, is_deleted=email.startswith("x"))
+
+        async def is_revoked(jti: UUID) -> bool:
+            return jti in revoked
+
+        monkeypatch.setattr(user_service, "get_principal_row", get_principal_row)
+        monkeypatch.setattr(token_service, "is_revoked", is_revoked)
+
+        class Route(CachedRoute):
+            cache = ResponseCache()
+
+        router = APIRouter(route_class=Route)
+
+        @router.get("/me/")
+        @cache_response(per_principal=True)
+        async def me() -> dict[str, int]:
+            nonlocal calls
+            calls += 1
+            return {"calls": calls}
+
+        app = FastAPI()
+        app.include_router(router)
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+
+            async def get(token: str) -> None:
+                await client.get("/me/", headers={"Authorization": f"Bearer {token}"})
+
+            for email in ("a@example.com", "b@example.com", "a@example.com"):
+                await get(JWTHelper.access_token(email))
+            assert calls == 2
+
+            # Not cached without a valid access token of an active user
+            await client.get("/me/")
+            await get("invalid")
+            await get(JWTHelper.refresh_token("a@example.com"))
+            await get(JWTHelper.access_token("x@example.com"))
+            assert calls == 6
+
+            token = JWTHelper.access_token("a@example.com", exp=60)
+            revoked.add(token_service.token_id(token, JWTHelper.decode(token)))
+            await get(token)
+            assert calls == 7
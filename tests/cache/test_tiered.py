@@ -0,0 +1,47 @@
+import asyncio
+from pathlib import Path
+
+from app.core.cache import SharedCache, TieredCache
+from app.core.utils.background import wait_scheduled
+
+
+class TestTieredCache:
+    async def test_coalesced_load(self, tmp_path: Path) -> None:
+        shared = SharedCache(str(tmp_path / "cache.sqlite3"))
+        cache = TieredCache("test", shared=shared)
+        loads = 0
+
+        async def loader() -> dict[str, int]:
+            nonlocal loads
+            loads += 1
+            await asyncio.sleep(0.01)
+            return {"id": 1}
+
+        values = await asyncio.gather(
+            *(cache.get_or_load("a", loader) for _ in range(10)),
+        )
+        assert values == [{"id": 1}] * 10
+        assert loads == 1
+
+        # Another worker only sees the shared tier
+        other = TieredCache("test", shared=shared)
+        assert await other.get_or_load("a", loader) == {"id": 1}
+        assert loads == 1
+
+        cache.invalidate("a")
+        await wait_scheduled()
+        assert await shared.get("test:a") is None
+        assert await cache.get_or_load("a", loader) == {"id": 1}
+        assert loads == 2
+
+        # Bulk writes clear every key of the cache, of this cache only
+        await shared.set("other:a", b"{}", 60)
+        cache.clear()
+        await wait_scheduled()
+        assert await shared.get("test:a") is None
+        assert await shared.get("other:a") == b"{}"
+
+    async def test_file_mode(self, tmp_path: Path) -> None:
+        path = tmp_path / "cache.sqlite3"
+        await SharedCache(str(path)).set("a", b"1", 60)
+        assert path.stat().st_mode & 0o777 == 0o600
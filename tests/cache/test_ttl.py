@@ -0,0 +1,30 @@
+import pytest
+
+from app.core.cache import TTLCache
+from app.core.cache import ttl as ttl_module
+
+
+class TestTTLCache:
+    def test_expiry(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = 100.0
+        monkeypatch.setattr(ttl_module.time, "monotonic", lambda: now)
+        cache: TTLCache[str, int] = TTLCache(ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=30)
+
+        now = 109.9
+        assert cache.get("a") == 1
+        now = 110.0
+        assert cache.get("a") is None
+        assert len(cache) == 1
+        assert cache.get("b") == 2
+
+    def test_lru_eviction(self) -> None:
+        cache: TTLCache[str, int] = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
@@ -0,0 +1,63 @@
+from typing import Any
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.db.db_helper import DatabaseHelper
+from app.models import User
+from app.repository.base import BaseRepository
+
+
+class RecordingSession:
+    """Compiles the executed statements instead of running them"""
+
+    def __init__(self) -> None:
+        self.executed: list[tuple[str, Any]] = []
+
+    async def execute(self, stmt: Any, params: Any = None, **kwargs: Any) -> None:
+        sql = str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+        self.executed.append((sql, params))
+
+
+@pytest.fixture
+def session(monkeypatch: pytest.MonkeyPatch) -> RecordingSession:
+    recording = RecordingSession()
+    monkeypatch.setattr(DatabaseHelper, "session", property(lambda _: recording))
+    return recording
+
+
+class TestBulk:
+    async def test_upsert_duplicate_keys(self, session: RecordingSession) -> None:
+        await BaseRepository(User).bulk_upsert(
+            [
+                {"email": "a@example.com", "name": "First"},
+                {"email": None, "name": "No email"},
+                {"email": "b@example.com", "name": "Second"},
+                {"email": "a@example.com", "name": "Last"},
+            ],
+            conflict_columns=[User.email],
+            batch_size=2,
+        )
+        (sql, first), (_, second) = session.executed
+        assert "ON CONFLICT (email) DO UPDATE SET name = excluded.name" in sql
+        assert "event_date" in sql
+        assert first == [
+            {"email": "a@example.com", "name": "Last"},
+            {"email": "b@example.com", "name": "Second"},
+        ]
+        assert second == [{"email": None, "name": "No email"}]
+
+    async def test_update_batches(self, session: RecordingSession) -> None:
+        values = [{"id": pk, "name": f"User {pk}"} for pk in range(5)]
+        await BaseRepository(User).bulk_update(values, batch_size=2)
+        assert [len(params) for _, params in session.executed] == [2, 2, 1]
+
+    async def test_delete_where(self, session: RecordingSession) -> None:
+        repository = BaseRepository(User)
+        with pytest.raises(ValueError, match="at least one filter"):
+            await repository.delete_where()
+
+        await repository.delete_where(id=[1, 2], is_deleted=True)
+        ((sql, _),) = session.executed
+        assert 'DELETE FROM "user" WHERE "user".id IN' in sql
+        assert '"user".is_deleted = true' in sql
@@ -0,0 +1,72 @@
+from typing import Any
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import CountStrategy
+from app.core.db.explain import Explain
+from app.models import User
+from app.repository.base import BaseRepository
+
+
+class PageRepository(BaseRepository[User]):
+    """Records which queries a page would run instead of running them"""
+
+    def __init__(self) -> None:
+        super().__init__(User)
+        self.queries: list[str] = []
+
+    async def _fetch_page(self, *args: Any, **kwargs: Any) -> list[Any]:
+        self.queries.append("page")
+        return ["row"]
+
+    async def _fetch_page_with_total(
+        self, *args: Any, **kwargs: Any
+    ) -> tuple[list[Any], int]:
+        self.queries.append("page_with_total")
+        return ["row"], 42
+
+    async def _estimate_count(self, *args: Any, **kwargs: Any) -> int:
+        self.queries.append("estimate")
+        return 40
+
+
+class TestCountStrategies:
+    @pytest.mark.parametrize(
+        ("strategy", "count", "queries"),
+        [
+            (CountStrategy.EXACT, 42, ["page_with_total"]),
+            (CountStrategy.NONE, None, ["page"]),
+            (CountStrategy.ESTIMATED, 40, ["page", "estimate"]),
+        ],
+    )
+    async def test_strategies(
+        self,
+        strategy: CountStrategy,
+        count: int | None,
+        queries: list[str],
+    ) -> None:
+        repository = PageRepository()
+        _, total = await repository.list(limit=10, count_strategy=strategy)
+        assert total == count
+        assert repository.queries == queries
+
+    async def test_cached(self) -> None:
+        repository = PageRepository()
+        for _ in range(2):
+            _, total = await repository.list(
+                limit=10,
+                count_strategy=CountStrategy.CACHED,
+                email="a@example.com",
+            )
+            assert total == 42
+        # Other filters have their own total
+        await repository.list(count_strategy=CountStrategy.CACHED, email="b")
+        assert repository.queries == ["page_with_total", "page", "page_with_total"]
+
+    def test_explain(self) -> None:
+        sql = str(
+            Explain(select(User.id)).compile(dialect=postgresql.asyncpg.dialect()),
+        )
+        assert sql.startswith('EXPLAIN (FORMAT JSON) SELECT "user".id')
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from sqlalchemy import ForeignKey, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from app.core.db.loader import DataLoader
+from app.core.db.loading import Load, LoadStrategy, joins_collection, load_key
+from app.repository.base import BaseRepository
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Author(Base):
+    __tablename__ = "author"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    books: Mapped[list["Book"]] = relationship(back_populates="author")
+
+
+class Book(Base):
+    __tablename__ = "book"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("author.id"))
+    author: Mapped[Author] = relationship(back_populates="books")
+    chapters: Mapped[list["Chapter"]] = relationship()
+
+
+class Chapter(Base):
+    __tablename__ = "chapter"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    book_id: Mapped[int] = mapped_column(ForeignKey("book.id"))
+
+
+class TestDataLoader:
+    async def test_batches_one_tick(self) -> None:
+        batches = []
+
+        async def batch_load(keys: list[int]) -> dict[int, str]:
+            batches.append(keys)
+            return {key: f"value-{key}" for key in keys if key != 3}
+
+        loader = DataLoader(batch_load)
+        values = await asyncio.gather(*(loader.load(key) for key in (1, 2, 1, 3)))
+        assert values == ["value-1", "value-2", "value-1", None]
+        assert batches == [[1, 2, 3]]
+
+        # Cached for the lifetime of the loader
+        assert await loader.load_many([2, 4]) == ["value-2", "value-4"]
+        assert batches == [[1, 2, 3], [4]]
+
+        loader.clear()
+        await loader.load(1)
+        assert batches[-1] == [1]
+
+    async def test_failures_not_cached(self) -> None:
+        calls = 0
+
+        async def batch_load(keys: list[int]) -> dict[int, int]:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise RuntimeError("Connection lost")
+            return {key: key for key in keys}
+
+        loader = DataLoader(batch_load)
+        with pytest.raises(RuntimeError):
+            await loader.load(1)
+        assert await loader.load(1) == 1
+
+    async def test_cancelled_caller(self) -> None:
+        started = asyncio.Event()
+
+        async def batch_load(keys: list[int]) -> dict[int, int]:
+            started.set()
+            await asyncio.sleep(0.01)
+            return {key: key for key in keys}
+
+        loader = DataLoader(batch_load)
+        first = asyncio.create_task(loader.load(1))
+        second = asyncio.create_task(loader.load(1))
+        await started.wait()
+        first.cancel()
+        assert await second == 1
+
+
+class TestLoad:
+    def test_nested_strategies(self) -> None:
+        loads = [
+            Load(
+                Author.books,
+                Load(Book.chapters, strategy=LoadStrategy.JOINED),
+                strategy=LoadStrategy.SUBQUERY,
+            ),
+        ]
+        assert load_key(loads) == load_key(
+            [
+                Load(
+                    Author.books,
+                    Load(Book.chapters, strategy=LoadStrategy.JOINED),
+                    strategy=LoadStrategy.SUBQUERY,
+                ),
+            ],
+        )
+        assert load_key(loads) != load_key([Load(Author.books, Book.chapters)])
+        assert joins_collection(loads)
+        assert not joins_collection([Load(Book.author, strategy=LoadStrategy.JOINED)])
+        assert load_key([Author.books.and_(Book.id > 1)]) is None
+
+    def test_former_form(self) -> None:
+        assert load_key([{"related": Author.books, "sub_related": Book.chapters}]) == (
+            load_key([Load(Author.books, Book.chapters)])
+        )
+
+    def test_joined_options(self) -> None:
+        stmt = BaseRepository._select_load(  # noqa: SLF001
+            select(Book),
+            [Load(Book.author, Author.books, strategy=LoadStrategy.JOINED)],
+        )
+        assert "LEFT OUTER JOIN author" in str(stmt)
@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+
+import pytest
+from pydantic import BaseModel
+
+from app.core.db.projection import projection
+from app.models import User
+from app.schemas.user import Principal
+
+
+class Summary(BaseModel):
+    id: int
+    name: str
+
+
+@dataclass
+class Unknown:
+    id: int
+    nickname: str
+
+
+class TestProjection:
+    def test_columns(self) -> None:
+        project = projection(User, [User.id, User.email])
+        assert project is projection(User, [User.id, User.email])
+        assert [column.name for column in project.columns] == ["id", "email"]
+
+        row = project.rows([(1, "a@example.com")])[0]
+        assert (row.id, row.email) == (1, "a@example.com")
+        assert not hasattr(row, "__dict__")
+
+    def test_targets(self) -> None:
+        principal = projection(User, Principal).rows([(1, "a@example.com", False)])
+        assert principal == [Principal(id=1, email="a@example.com", is_deleted=False)]
+
+        summary = projection(User, Summary).rows([(2, "Name")])[0]
+        assert isinstance(summary, Summary)
+        assert summary.model_dump() == {"id": 2, "name": "Name"}
+
+    def test_invalid_targets(self) -> None:
+        with pytest.raises(ValueError, match="nickname"):
+            projection(User, Unknown)
+        with pytest.raises(TypeError):
+            projection(User, dict)
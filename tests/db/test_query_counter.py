@@ -0,0 +1,37 @@
+import pytest
+
+from app.core.db.query_counter import (
+    QueryStats,
+    assert_max_queries,
+    query_stats_context,
+)
+
+
+def record(statement: str, times: int = 1) -> None:
+    stats = query_stats_context.get()
+    assert stats is not None
+    for _ in range(times):
+        stats.record(statement, 0.001)
+
+
+class TestQueryCounter:
+    def test_assert_max_queries(self) -> None:
+        with assert_max_queries(2) as stats:
+            record("SELECT 1", times=2)
+        assert stats.count == 2
+        assert query_stats_context.get() is None
+
+        with (
+            pytest.raises(AssertionError, match="3x SELECT 1"),
+            assert_max_queries(2),
+        ):
+            record("SELECT 1", times=3)
+
+    def test_repeated(self) -> None:
+        stats = QueryStats()
+        for _ in range(5):
+            stats.record("SELECT * FROM post WHERE user_id = $1", 0.002)
+        stats.record("SELECT * FROM users", 0.001)
+
+        assert stats.repeated(5) == [("SELECT * FROM post WHERE user_id = $1", 5)]
+        assert stats.server_timing().startswith(b'db;dur=11.00;desc="6 queries"')
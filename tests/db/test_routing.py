@@ -0,0 +1,111 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+
+from app.core.db.routing import (
+    ReplicaNode,
+    ReplicaRouter,
+    Route,
+    RoutingSession,
+    route_key_context,
+    use_route,
+)
+from app.models import User
+
+URL = "postgresql+asyncpg://user:password@{}/db"
+
+
+class LagEngine:
+    """Answers the lag query of the health checks with lag, or fails"""
+
+    def __init__(self, lag: float | None) -> None:
+        self.lag = lag
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[Any]:
+        if self.lag is None:
+            raise ConnectionError("Replica is down")
+
+        async def execute(query: Any) -> Any:
+            return SimpleNamespace(scalar_one=lambda: self.lag)
+
+        yield SimpleNamespace(execute=execute)
+
+
+def routing_session(router: ReplicaRouter) -> Session:
+    session_class = type("RoutingSession", (RoutingSession,), {"router": router})
+    primary = create_async_engine(URL.format("primary"))
+    return session_class(bind=primary.sync_engine)  # type: ignore[no-any-return]
+
+
+def replicas(count: int) -> list[Any]:
+    return [
+        create_async_engine(URL.format(f"replica-{index}")) for index in range(count)
+    ]
+
+
+def host(session: Session, clause: Any = None) -> str | None:
+    """Host of the engine the session runs the statement on"""
+    bind = session.get_bind(clause=select(User) if clause is None else clause)
+    return bind.engine.url.host
+
+
+class TestRoutingSession:
+    def test_replica_per_session(self) -> None:
+        router = ReplicaRouter(replicas(2))
+        first, second = routing_session(router), routing_session(router)
+
+        assert [host(first) for _ in range(3)] == ["replica-0"] * 3
+        assert host(second) == "replica-1"
+
+        # An ejected replica is replaced
+        router.nodes[0].healthy = False
+        assert host(first) == "replica-1"
+
+    def test_primary_routes(self) -> None:
+        router = ReplicaRouter(replicas(1))
+        session = routing_session(router)
+        assert host(session, select(User).with_for_update()) == "primary"
+        with use_route(Route.PRIMARY):
+            assert host(session) == "primary"
+        router.nodes[0].healthy = False
+        assert host(session) == "primary"
+
+    def test_read_your_writes(self) -> None:
+        router = ReplicaRouter(replicas(1), read_your_writes_window=60)
+        token = route_key_context.set("user@example.com")
+        try:
+            writer = routing_session(router)
+            assert host(writer, insert(User)) == "primary"
+            assert host(writer) == "primary"
+            # The route key is pinned for the other sessions of the worker
+            assert host(routing_session(router)) == "primary"
+        finally:
+            route_key_context.reset(token)
+        assert host(routing_session(router)) == "replica-0"
+
+
+class TestHealthCheck:
+    async def test_eject_and_restore(self) -> None:
+        engine = LagEngine(lag=10)
+        router = ReplicaRouter([], max_lag=5)
+        node = ReplicaNode("replica-0", engine)  # type: ignore[arg-type]
+        router.nodes = [node]
+
+        await router.check(node)
+        assert (node.healthy, node.lag) == (False, 10)
+        assert router.choose() is None
+
+        engine.lag = None
+        await router.check(node)
+        assert not node.healthy
+
+        engine.lag = 0.5
+        await router.check(node)
+        assert node.healthy
+        assert router.choose() is node
@@ -0,0 +1,73 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.core.db.slow_query import FingerprintStats, SlowQueryLog, fingerprint
+
+
+class RecordingEngine:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[Any]:
+        async def exec_driver_sql(statement: str, parameters: Any = None) -> Any:
+            self.statements.append(statement)
+            return SimpleNamespace(scalar=lambda: [{"Plan": {}}])
+
+        async def rollback() -> None:
+            self.statements.append("ROLLBACK")
+
+        yield SimpleNamespace(exec_driver_sql=exec_driver_sql, rollback=rollback)
+
+
+class TestSlowQuery:
+    def test_fingerprint(self) -> None:
+        assert fingerprint(
+            "SELECT users.id FROM users "
+            "WHERE users.id IN ($1::INTEGER, $2::INTEGER, $3::INTEGER)\n"
+            "AND users.email = 'a@b.c' LIMIT 15",
+        ) == (
+            "SELECT users.id FROM users WHERE users.id IN (...) "
+            "AND users.email = ? LIMIT ?"
+        )
+        assert (
+            fingerprint(
+                "INSERT INTO users (email, age) VALUES ($1, $2), ($3, $4), ($5, $6)",
+            )
+            == "INSERT INTO users (email, age) VALUES (?, ?), ..."
+        )
+
+    def test_percentiles(self) -> None:
+        stats = FingerprintStats("SELECT ?", window=100)
+        for duration in range(1, 101):
+            stats.record(duration / 1000, is_slow=duration > 90)
+
+        report = stats.to_dict()
+        assert report["calls"] == 100
+        assert report["slow_calls"] == 10
+        assert (report["p50_ms"], report["p95_ms"], report["p99_ms"]) == (
+            51.0,
+            96.0,
+            100.0,
+        )
+
+    @pytest.mark.parametrize(
+        ("explain_analyze", "options"),
+        [(False, "FORMAT JSON"), (True, "ANALYZE, BUFFERS, FORMAT JSON")],
+    )
+    async def test_explain(self, explain_analyze: bool, options: str) -> None:
+        engine = RecordingEngine()
+        stats = FingerprintStats("SELECT ?", window=10)
+        log = SlowQueryLog(explain_analyze=explain_analyze)
+        await log._explain(engine, stats, "SELECT $1", (1,))  # type: ignore[arg-type]  # noqa: SLF001
+
+        assert engine.statements == [
+            "SET TRANSACTION READ ONLY",
+            f"EXPLAIN ({options}) SELECT $1",
+            "ROLLBACK",
+        ]
+        assert stats.plan == [{"Plan": {}}]
@@ -0,0 +1,156 @@
+import logging
+from collections.abc import AsyncGenerator
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.db import db_helper
+from app.core.db.transactional import (
+    Propagation,
+    RetryPolicy,
+    Transactional,
+    transaction_context,
+)
+
+
+async def insert(value: int) -> None:
+    await db_helper.session.execute(
+        text("INSERT INTO transactional_test VALUES (:value)"),
+        {"value": value},
+    )
+
+
+async def stored() -> list[int]:
+    async with db_helper.engine.connect() as connection:
+        result = await connection.execute(
+            text("SELECT value FROM transactional_test ORDER BY value"),
+        )
+        return list(result.scalars())
+
+
+@pytest.fixture
+async def request_session() -> AsyncGenerator[None, None]:
+    try:
+        async with db_helper.engine.begin() as connection:
+            await connection.execute(
+                text("CREATE TABLE transactional_test (value int)"),
+            )
+    except (OSError, DBAPIError) as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    context = db_helper.set_session_context(10**9)
+    yield
+    await db_helper.remove_session()
+    db_helper.reset_session_context(context)
+    async with db_helper.engine.begin() as connection:
+        await connection.execute(text("DROP TABLE transactional_test"))
+
+
+@Transactional(Propagation.REQUIRED)
+async def required(value: int) -> None:
+    await insert(value)
+
+
+@Transactional(Propagation.NESTED)
+async def nested_failing(value: int) -> None:
+    await insert(value)
+    raise ValueError
+
+
+@Transactional(Propagation.REQUIRES_NEW)
+async def requires_new(value: int) -> None:
+    await insert(value)
+
+
+@Transactional(Propagation.READ_ONLY)
+async def read_only(value: int) -> None:
+    await insert(value)
+
+
+@Transactional(Propagation.READ_ONLY)
+async def read_only_select() -> list[int]:
+    result = await db_helper.session.execute(
+        text("SELECT value FROM transactional_test"),
+    )
+    return list(result.scalars())
+
+
+@pytest.mark.usefixtures("request_session")
+class TestTransactional:
+    async def test_propagation(self) -> None:
+        @Transactional(Propagation.REQUIRED)
+        async def outer() -> None:
+            await required(1)
+            await required(2)
+            with pytest.raises(ValueError):
+                await nested_failing(3)
+            await requires_new(4)
+            # Committed on its own connection, the outer one isn't yet
+            assert await stored() == [4]
+
+        await outer()
+        assert await stored() == [1, 2, 4]
+
+    async def test_read_only(self) -> None:
+        with pytest.raises(DBAPIError, match="read-only transaction"):
+            await read_only(1)
+        assert not db_helper.in_transaction()
+
+        await required(2)
+        assert await read_only_select() == [2]
+        assert not db_helper.in_transaction()
+
+
+@Transactional(Propagation.READ_ONLY)
+async def read_only_noop() -> None:
+    pass
+
+
+class TestReadOnlyJoin:
+    async def test_warns_in_writable_transaction(
+        self,
+        caplog: pytest.LogCaptureFixture,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        caplog.set_level(logging.WARNING, "app.core.db.transactional")
+        for propagation in (Propagation.READ_ONLY, Propagation.REQUIRED):
+            token = transaction_context.set(propagation)
+            try:
+                await read_only_noop()
+            finally:
+                transaction_context.reset(token)
+        assert len(caplog.records) == 1
+
+        # Begun by a read outside of a Transactional method
+        monkeypatch.setattr(db_helper, "in_transaction", lambda: True)
+        await read_only_noop()
+        assert len(caplog.records) == 2
+        assert "read_only_noop" in caplog.records[-1].getMessage()
+
+
+class SerializationFailureError(Exception):
+    sqlstate = "40001"
+
+
+class TestRetry:
+    async def test_retries_serialization_failures(self) -> None:
+        attempts = 0
+
+        @Transactional(retry=RetryPolicy(max_attempts=3, base_delay=0.001))
+        async def conflicting() -> int:
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise DBAPIError("UPDATE", {}, SerializationFailureError())
+            return attempts
+
+        assert await conflicting() == 3
+
+        attempts = -10
+        with pytest.raises(DBAPIError):
+            await conflicting()
+        assert attempts == -7
+
+    def test_delay_is_bounded(self) -> None:
+        policy = RetryPolicy(base_delay=0.01, max_delay=0.05)
+        assert all(0 <= policy.delay(attempt) <= 0.05 for attempt in range(1, 20))
@@ -0,0 +1,25 @@
+from app.core.metrics.registry import Counter, Histogram, MetricsRegistry
+
+
+class TestMetricsRegistry:
+    def test_render(self) -> None:
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("requests", "Requests", ("route",)))
+        histogram = registry.register(
+            Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)),
+        )
+        counter.inc(route="/a")
+        counter.inc(2, route="/a")
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        lines = registry.render().splitlines()
+        assert "# TYPE requests counter" in lines
+        assert any(
+            line.startswith("requests_total{") and 'route="/a"' in line
+            for line in lines
+        )
+        assert counter.value(route="/a") == 3
+        buckets = [line.rsplit(" ", 1)[1] for line in lines if "_bucket" in line]
+        assert buckets == ["1", "2", "3"]
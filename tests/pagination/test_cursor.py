@@ -0,0 +1,32 @@
+import pytest
+
+from app.core.exceptions.pagination import InvalidCursorException
+from app.core.utils.cursor import CursorHelper
+
+
+class TestCursor:
+    def test_cursor_round_trip(self) -> None:
+        cursor = CursorHelper.encode(["created_date", "id"], ["2024-01-01", 5], True)
+        values = CursorHelper.decode(cursor, ["created_date", "id"], True)
+        assert values == ["2024-01-01", 5]
+
+    @pytest.mark.parametrize(
+        "keys, desc",
+        [
+            (["id"], True),
+            (["created_date", "id"], False),
+        ],
+    )
+    def test_cursor_wrong_order(self, keys: list[str], desc: bool) -> None:
+        cursor = CursorHelper.encode(["created_date", "id"], ["2024-01-01", 5], True)
+        with pytest.raises(InvalidCursorException):
+            CursorHelper.decode(cursor, keys, desc)
+
+    def test_cursor_tampered(self) -> None:
+        cursor = CursorHelper.encode(["id"], [5], True)
+        payload, signature = cursor.split(".")
+        forged = CursorHelper.encode(["id"], [500], True).split(".")[0]
+        with pytest.raises(InvalidCursorException):
+            CursorHelper.decode(f"{forged}.{signature}", ["id"], True)
+        with pytest.raises(InvalidCursorException):
+            CursorHelper.decode(payload, ["id"], True)
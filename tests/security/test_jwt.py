@@ -0,0 +1,29 @@
+import pytest
+
+from app.core.exceptions.token import TokenExpiredException, TokenNotValidException
+from app.core.security.jwt import JWTHelper
+
+
+class TestJWTHelper:
+    def test_decode_cache(self) -> None:
+        token = JWTHelper.access_token("user@example.com")
+        claims = JWTHelper.decode(token)
+        claims["sub"] = "changed"
+
+        assert JWTHelper.decode(token)["sub"] == "user@example.com"
+        assert JWTHelper.decode(token, verify=False)["scope"] == "access"
+
+    def test_unverified_not_cached(self) -> None:
+        token = JWTHelper.access_token("user@example.com")
+        header, payload, _ = token.split(".")
+        forged = f"{header}.{payload}.{'A' * 43}"
+
+        assert JWTHelper.decode(forged, verify=False)["sub"] == "user@example.com"
+        with pytest.raises(TokenNotValidException):
+            JWTHelper.decode(forged)
+
+    def test_expired(self) -> None:
+        token = JWTHelper.access_token("user@example.com", exp=-1)
+        with pytest.raises(TokenExpiredException):
+            JWTHelper.decode(token)
+        assert JWTHelper.decode(token, verify=False)["sub"] == "user@example.com"
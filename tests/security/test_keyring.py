@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from app.core.cache import TTLCache
+from app.core.config import AuthConfig
+from app.core.exceptions.token import TokenNotValidException
+from app.core.security.jwt import JWTHelper
+from app.core.security.keyring import KeyRing
+
+
+def write_key(
+    path: Path,
+    key: ed25519.Ed25519PrivateKey | ec.EllipticCurvePrivateKey,
+    public: bool = False,
+) -> None:
+    if public:
+        data = key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    else:
+        data = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    path.write_bytes(data)
+
+
+class TestKeyRing:
+    def test_rotation(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        old_key = ec.generate_private_key(ec.SECP256R1())
+        write_key(tmp_path / "2026-01.pem", old_key)
+        config = AuthConfig(algorithm="ES256", keys_dir=str(tmp_path))
+        monkeypatch.setattr(JWTHelper, "keyring", KeyRing.from_config(config))
+        monkeypatch.setattr(JWTHelper, "verified", TTLCache())
+        old_token = JWTHelper.access_token("user@example.com")
+
+        # Rotate: the old key stays for verification only
+        (tmp_path / "2026-01.pem").unlink()
+        write_key(tmp_path / "2026-01.pub", old_key, public=True)
+        write_key(tmp_path / "2026-02.pem", ed25519.Ed25519PrivateKey.generate())
+        keyring = KeyRing.from_config(config)
+        monkeypatch.setattr(JWTHelper, "keyring", keyring)
+        monkeypatch.setattr(JWTHelper, "verified", TTLCache())
+
+        new_token = JWTHelper.access_token("user@example.com")
+        assert keyring.signing.kid == "2026-02"
+        assert JWTHelper.decode(old_token)["sub"] == "user@example.com"
+        assert JWTHelper.decode(new_token)["sub"] == "user@example.com"
+        assert [(key["kid"], key["alg"]) for key in keyring.jwks["keys"]] == [
+            ("2026-01", "ES256"),
+            ("2026-02", "EdDSA"),
+        ]
+        assert all("d" not in key for key in keyring.jwks["keys"])
+
+        (tmp_path / "2026-01.pub").unlink()
+        monkeypatch.setattr(JWTHelper, "keyring", KeyRing.from_config(config))
+        monkeypatch.setattr(JWTHelper, "verified", TTLCache())
+        with pytest.raises(TokenNotValidException):
+            JWTHelper.decode(old_token)
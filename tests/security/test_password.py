@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core.exceptions.auth import PasswordHashingBusyException
+from app.core.security.password import HashHelper
+from app.core.utils.executor import BoundedExecutor
+
+
+class TestHashHelper:
+    async def test_rehash_on_login(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+        monkeypatch.setattr(
+            HashHelper,
+            "hasher",
+            CryptContext(
+                schemes=["argon2", "bcrypt"],
+                deprecated="auto",
+                argon2__type="ID",
+                argon2__memory_cost=1024,
+                argon2__rounds=1,
+            ),
+        )
+
+        assert await HashHelper.verify_and_update("wrong", old_hash) == (False, None)
+        valid, new_hash = await HashHelper.verify_and_update("secret", old_hash)
+        assert valid
+        assert new_hash is not None
+        assert new_hash.startswith("$argon2id$")
+        assert await HashHelper.verify_and_update("secret", new_hash) == (True, None)
+
+    async def test_reject_when_full(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        executor = BoundedExecutor(max_workers=1, max_pending=1, name="test")
+        monkeypatch.setattr(HashHelper, "executor", executor)
+        release = threading.Event()
+
+        running = [
+            asyncio.ensure_future(HashHelper._run(release.wait))  # noqa: SLF001
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordHashingBusyException):
+            await HashHelper.get_password_hash_async("secret")
+
+        release.set()
+        await asyncio.gather(*running)
+        assert executor.in_flight == 0
+        executor.shutdown()
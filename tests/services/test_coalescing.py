@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any
+
+from app.core.db import db_helper
+from app.models import User
+from app.services.base import BaseService
+
+
+class SlowRepository:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def get(self, select_load: Any = None, **kwargs: Any) -> User:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return User(id=1, name="User", email=kwargs["email"], is_deleted=False)
+
+
+class CoalescingService(BaseService[User, Any]):
+    coalesce_gets = True
+
+
+class TestCoalescedGet:
+    async def test_one_query_and_own_copies(self) -> None:
+        repository = SlowRepository()
+        service = CoalescingService(User, repository)
+
+        async def request(session_id: int) -> User:
+            context = db_helper.set_session_context(session_id)
+            try:
+                return await service.get(email="user@example.com")
+            finally:
+                await db_helper.remove_session()
+                db_helper.reset_session_context(context)
+
+        users = await asyncio.gather(*(request(index) for index in range(10)))
+        assert repository.calls == 1
+        assert len({id(user) for user in users}) == 10
+        assert {user.email for user in users} == {"user@example.com"}
@@ -0,0 +1,80 @@
+import datetime
+from typing import Any
+
+from sqlalchemy import create_engine, delete, inspect, update
+from sqlalchemy.orm import Session
+
+from app.core.db import db_helper
+from app.core.db.query_counter import assert_max_queries
+from app.models import User
+from app.services.user import principal_cache, user_service
+
+EMAIL = "user@example.com"
+
+
+class CountingLoader:
+    def __init__(self) -> None:
+        self.loads = 0
+
+    async def __call__(self) -> dict[str, Any]:
+        self.loads += 1
+        return {"id": 1, "email": EMAIL, "is_deleted": False}
+
+
+class TestPrincipalCache:
+    async def test_bulk_writes_invalidate(self) -> None:
+        engine = create_engine("sqlite://")
+        User.metadata.create_all(engine, tables=[User.__table__])  # type: ignore[list-item]
+        loader = CountingLoader()
+        principal_cache.clear()
+        await principal_cache.get_or_load(EMAIL, loader)
+
+        with Session(engine) as session:
+            session.execute(update(User).values(is_deleted=True))
+            session.rollback()
+        await principal_cache.get_or_load(EMAIL, loader)
+        assert loader.loads == 1
+
+        for statement in (update(User).values(is_deleted=True), delete(User)):
+            with Session(engine) as session:
+                session.execute(statement)
+                session.commit()
+            await principal_cache.get_or_load(EMAIL, loader)
+        assert loader.loads == 3
+
+        # COPY doesn't go through the session
+        for listener in db_helper.copy_listeners:
+            listener(User.__tablename__)
+        await principal_cache.get_or_load(EMAIL, loader)
+        assert loader.loads == 4
+
+    async def test_hit_runs_no_query(self) -> None:
+        created = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+        async def loader() -> dict[str, Any]:
+            return {
+                "id": 1,
+                "name": "User",
+                "email": EMAIL,
+                "avatar": None,
+                "soc_type": "google",
+                "timezone": "UTC",
+                "is_deleted": False,
+                # As it comes out of the shared tier
+                "created_date": created.isoformat(),
+                "event_date": created.isoformat(),
+            }
+
+        principal_cache.clear()
+        await principal_cache.get_or_load(EMAIL, loader)
+        context = db_helper.set_session_context(10**9 + 1)
+        try:
+            with assert_max_queries(0):
+                user = await user_service.get_principal(EMAIL)
+                principal = await user_service.get_principal_row(EMAIL)
+            assert (user.id, user.email, user.created_date) == (1, EMAIL, created)
+            assert principal.id == user.id
+            assert "soc_token" not in inspect(user).dict
+        finally:
+            await db_helper.remove_session()
+            db_helper.reset_session_context(context)